@@ -0,0 +1,230 @@
+import os
+import math
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+
+import metrics
+
+# Admission control for the expensive parts of a request: Tesseract OCR,
+# Ollama generations and letter rendering.  Each resource has a fixed number
+# of slots shared by every process using the same data.db (all gunicorn
+# workers, the Electron backend), kept as rows of the admission_slots table.
+# A request that finds no free slot polls for up to ADMISSION_WAIT_SECONDS and
+# then fails with Overloaded, which the app answers with 429 and Retry-After.
+#
+# Slots are leased: the holder's process renews them every few seconds, so
+# slots of a worker that was killed free up after ADMISSION_LEASE_SECONDS.
+# Waiters are not served in strict FIFO order.  A resource with 0 slots is
+# not limited.
+_CPUS = os.cpu_count() or 1
+OCR_SLOTS = int(os.environ.get('OCR_SLOTS', max(1, _CPUS // 2)))
+LLM_SLOTS = int(os.environ.get('LLM_SLOTS', 2))
+# background pre-generation only takes an LLM slot while fewer than this many
+# are in use, so the rest stay free for officers
+LLM_BACKGROUND_SLOTS = int(os.environ.get('LLM_BACKGROUND_SLOTS', max(1, LLM_SLOTS - 1)))
+LETTER_SLOTS = int(os.environ.get('LETTER_SLOTS', 2))
+ADMISSION_WAIT_SECONDS = float(os.environ.get('ADMISSION_WAIT_SECONDS', 10))
+ADMISSION_LEASE_SECONDS = float(os.environ.get('ADMISSION_LEASE_SECONDS', 60))
+
+SLOTS_TABLE = 'admission_slots'
+_POLL_MIN = 0.02
+_POLL_MAX = 0.25
+
+log = logging.getLogger(__name__)
+
+ADMISSIONS = metrics.Counter('ncrp_admission_total', 'Slot requests by resource and outcome.',
+                             ('resource', 'result'))
+ADMISSION_WAIT = metrics.Histogram('ncrp_admission_wait_seconds', 'Time spent waiting for a slot.',
+                                   ('resource',))
+
+
+class Overloaded(Exception):
+    """No slot of ``resource`` became free in time; retry after ``retry_after`` seconds."""
+
+    def __init__(self, resource, retry_after):
+        super().__init__(f'{resource} is busy, retry in {retry_after}s')
+        self.resource = resource
+        self.retry_after = retry_after
+
+
+class Slot:
+    """A held slot; release() is idempotent, so it can also be a close callback."""
+
+    def __init__(self, limiter, holder):
+        self._limiter = limiter
+        self.holder = holder
+        self.acquired = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._limiter._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class Limiter:
+    """Cross-process counting semaphore for one resource, stored in SQLite."""
+
+    def __init__(self, db_path, resource, slots, wait=ADMISSION_WAIT_SECONDS, lease=ADMISSION_LEASE_SECONDS):
+        self.db_path = db_path
+        self.resource = resource
+        self.slots = slots
+        self.wait = wait
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._held = set()
+        self._hold_avg = None
+        self._stats = {'admitted': 0, 'queued': 0, 'rejected': 0}
+        self._initialized = False
+        self._renewer_started = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        if not self._initialized:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {SLOTS_TABLE} (
+                    holder TEXT PRIMARY KEY,
+                    resource TEXT NOT NULL,
+                    pid INTEGER,
+                    acquired_at REAL,
+                    expires_at REAL
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{SLOTS_TABLE}_resource ON {SLOTS_TABLE}(resource)")
+            self._initialized = True
+        return conn
+
+    def _try_acquire(self, holder, limit):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(f"DELETE FROM {SLOTS_TABLE} WHERE resource = ? AND expires_at < ?", (self.resource, now))
+            used = conn.execute(f"SELECT COUNT(*) FROM {SLOTS_TABLE} WHERE resource = ?",
+                                (self.resource,)).fetchone()[0]
+            if used < limit:
+                conn.execute(f"INSERT INTO {SLOTS_TABLE} (holder, resource, pid, acquired_at, expires_at) "
+                             f"VALUES (?, ?, ?, ?, ?)", (holder, self.resource, os.getpid(), now, now + self.lease))
+            conn.execute("COMMIT")
+            return used < limit
+        except Exception:
+            # BEGIN IMMEDIATE itself fails with "database is locked"
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def acquire(self, wait=None, limit=None):
+        """Take a slot, waiting at most ``wait`` seconds (default: self.wait); raises Overloaded.
+
+        With ``limit`` the slot is only granted while fewer than ``limit`` slots
+        are in use, which keeps the others for callers without a limit."""
+        holder = uuid.uuid4().hex
+        if self.slots <= 0:
+            return Slot(self, None)
+        wait = self.wait if wait is None else wait
+        limit = self.slots if limit is None else min(limit, self.slots)
+        start = time.monotonic()
+        delay = _POLL_MIN
+        queued = False
+        while not self._try_acquire(holder, limit):
+            elapsed = time.monotonic() - start
+            if elapsed >= wait:
+                self._count('rejected')
+                ADMISSION_WAIT.observe(elapsed, resource=self.resource)
+                raise Overloaded(self.resource, self.retry_after())
+            queued = True
+            time.sleep(min(delay, wait - elapsed))
+            delay = min(delay * 2, _POLL_MAX)
+        ADMISSION_WAIT.observe(time.monotonic() - start, resource=self.resource)
+        self._count('queued' if queued else 'admitted')
+        with self._lock:
+            self._held.add(holder)
+        self._ensure_renewer()
+        return Slot(self, holder)
+
+    def _release(self, slot):
+        if slot.holder is None:
+            return
+        held = time.monotonic() - slot.acquired
+        with self._lock:
+            self._held.discard(slot.holder)
+            self._hold_avg = held if self._hold_avg is None else 0.8 * self._hold_avg + 0.2 * held
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(f"DELETE FROM {SLOTS_TABLE} WHERE holder = ?", (slot.holder,))
+            finally:
+                conn.close()
+        except Exception:
+            # the lease runs out on its own
+            log.exception('Releasing %s slot failed', self.resource)
+
+    def _count(self, result):
+        with self._lock:
+            self._stats[result] += 1
+        ADMISSIONS.inc(resource=self.resource, result=result)
+
+    def retry_after(self):
+        """Seconds a rejected client should wait: the recent average time a slot is held."""
+        with self._lock:
+            avg = self._hold_avg
+        return max(1, math.ceil(avg if avg is not None else self.wait))
+
+    def in_use(self):
+        conn = self._connect()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {SLOTS_TABLE} WHERE resource = ? AND expires_at >= ?",
+                                (self.resource, time.time())).fetchone()[0]
+        finally:
+            conn.close()
+
+    def full(self):
+        return self.slots > 0 and self.in_use() >= self.slots
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats, held_here=len(self._held))
+        out.update(resource=self.resource, slots=self.slots, in_use=self.in_use(),
+                   wait_seconds=self.wait, retry_after=self.retry_after())
+        return out
+
+    def _renew(self):
+        with self._lock:
+            held = list(self._held)
+        if not held:
+            return
+        conn = self._connect()
+        try:
+            conn.executemany(f"UPDATE {SLOTS_TABLE} SET expires_at = ? WHERE holder = ?",
+                             [(time.time() + self.lease, h) for h in held])
+        finally:
+            conn.close()
+
+    def _ensure_renewer(self):
+        with self._lock:
+            if self._renewer_started:
+                return
+            self._renewer_started = True
+
+        def _loop():
+            while True:
+                time.sleep(self.lease / 3)
+                try:
+                    self._renew()
+                except Exception:
+                    log.exception('Renewing %s slots failed', self.resource)
+
+        threading.Thread(target=_loop, name=f'admission-{self.resource}', daemon=True).start()
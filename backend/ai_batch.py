@@ -0,0 +1,187 @@
+import os
+import re
+import time
+import random
+import sqlite3
+import asyncio
+import hashlib
+import inspect
+
+from ncrp_script import AI_MODEL, COLUMNS, ai_prompt, parse_ai_content
+
+try:
+    from openai import AsyncOpenAI
+except Exception:
+    AsyncOpenAI = None
+
+# Batch AI parsing for the ncrp_script CLI (USE_AI=1).  Documents are sent
+# concurrently (bounded by a semaphore) with retry and exponential backoff,
+# and every completion that parses is cached in SQLite keyed on the model,
+# source and a hash of the text, so reruns over the same folder cost nothing.
+# Any OpenAI-compatible client can be passed in, e.g.
+# AsyncOpenAI(base_url="http://127.0.0.1:8001/v1") for a local fake server.
+_NCRP_BASE = os.environ.get('NCRP_DATA_PATH', r'C:\NCRP')
+AI_CACHE_PATH = os.environ.get('AI_CACHE_PATH', os.path.join(_NCRP_BASE, 'ai_cache.db'))
+AI_CONCURRENCY = int(os.environ.get('AI_CONCURRENCY', 4))
+AI_RETRIES = int(os.environ.get('AI_RETRIES', 3))
+
+
+def _parse_reply(content):
+    """``parse_ai_content`` that raises when the reply holds no JSON object
+    (e.g. truncated), instead of returning an all-NOT FOUND row."""
+    if not re.search(r"\{.*\}", content or "", re.DOTALL):
+        raise ValueError('no JSON object in reply')
+    return parse_ai_content(content)
+
+
+class ResponseCache:
+    """SQLite cache of chat completion contents."""
+
+    def __init__(self, path=AI_CACHE_PATH):
+        self.path = path
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ai_parse_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    content TEXT,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    created_at REAL
+                )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def key(model, source, text):
+        h = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return f"{model}:{source}:{h}"
+
+    def get(self, key):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(
+                "SELECT content, prompt_tokens, completion_tokens FROM ai_parse_cache WHERE key = ?",
+                (key,)).fetchone()
+        finally:
+            conn.close()
+
+    def put(self, key, model, content, prompt_tokens, completion_tokens):
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_parse_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, content, prompt_tokens, completion_tokens, time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class BatchAIParser:
+    """Parse many complaint texts with an OpenAI-compatible chat client.
+
+    ``client`` may be async (``AsyncOpenAI``) or sync (``OpenAI``); sync calls
+    run in worker threads.  ``cache`` may be None to disable caching."""
+
+    def __init__(self, client=None, model=AI_MODEL, concurrency=AI_CONCURRENCY,
+                 retries=AI_RETRIES, backoff=1.0, cache='default'):
+        self.client = client
+        self.model = model
+        self.concurrency = max(1, int(concurrency))
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.cache = ResponseCache() if cache == 'default' else cache
+
+    def _get_client(self):
+        if self.client is None:
+            if AsyncOpenAI is None:
+                raise RuntimeError('openai package not installed')
+            # retries are done here (AI_RETRIES); the SDK's own would multiply them
+            self.client = AsyncOpenAI(max_retries=0)
+        return self.client
+
+    async def _complete(self, prompt):
+        create = self._get_client().chat.completions.create
+        kwargs = dict(model=self.model, messages=[{"role": "user", "content": prompt}], temperature=0)
+        if (AsyncOpenAI is not None and isinstance(self.client, AsyncOpenAI)) or asyncio.iscoroutinefunction(create):
+            return await create(**kwargs)
+        res = await asyncio.to_thread(create, **kwargs)
+        if inspect.isawaitable(res):
+            # async client whose create() is wrapped by a plain decorator
+            res = await res
+        return res
+
+    async def _parse_one(self, sem, name, text, source):
+        report = {'name': name, 'cached': False, 'attempts': 0, 'wait_s': 0.0, 'latency_s': 0.0,
+                  'prompt_tokens': 0, 'completion_tokens': 0, 'error': None}
+        key = ResponseCache.key(self.model, source, text)
+        start = time.perf_counter()
+        row = None
+        hit = self.cache.get(key) if self.cache else None
+        if hit:
+            try:
+                row = _parse_reply(hit[0])
+                report['prompt_tokens'], report['completion_tokens'] = hit[1], hit[2]
+                report['cached'] = True
+            except Exception:
+                # stored before replies were checked; ask again
+                row = None
+        if row is None:
+            # created on the first miss only, so fully cached reruns need no API key
+            self._get_client()
+            queued = time.perf_counter()
+            async with sem:
+                # latency_s covers the API calls, wait_s the time queued for the semaphore
+                report['wait_s'] = round(time.perf_counter() - queued, 3)
+                start = time.perf_counter()
+                for attempt in range(self.retries + 1):
+                    report['attempts'] = attempt + 1
+                    try:
+                        res = await self._complete(ai_prompt(text, source))
+                        content = res.choices[0].message.content
+                        usage = getattr(res, 'usage', None)
+                        report['prompt_tokens'] = getattr(usage, 'prompt_tokens', 0) or 0
+                        report['completion_tokens'] = getattr(usage, 'completion_tokens', 0) or 0
+                        try:
+                            row = _parse_reply(content)
+                        except Exception as e:
+                            # truncated or non-JSON reply: retried, never cached
+                            raise ValueError(f'unparseable response: {e}') from e
+                        break
+                    except Exception as e:
+                        report['error'] = str(e)
+                        if attempt == self.retries:
+                            break
+                        # exponential backoff with jitter
+                        await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+            if row is not None:
+                report['error'] = None
+                if self.cache:
+                    self.cache.put(key, self.model, content, report['prompt_tokens'], report['completion_tokens'])
+        report['latency_s'] = round(time.perf_counter() - start, 3)
+
+        if row is None:
+            return {col: "NOT FOUND" for col in COLUMNS}, report
+        return row, report
+
+    async def parse_async(self, docs):
+        """``docs`` is a list of ``(name, text, source)``; returns ``(rows, reports)`` in input order."""
+        sem = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._parse_one(sem, *doc) for doc in docs))
+        return [r[0] for r in results], [r[1] for r in results]
+
+    def parse(self, docs):
+        return asyncio.run(self.parse_async(docs))
+
+
+def print_report(reports):
+    for r in reports:
+        status = 'cache' if r['cached'] else (f"error: {r['error']}" if r['error'] else f"{r['attempts']} attempt(s)")
+        print(f"  {r['name']}: {r['latency_s']:.2f}s (+{r['wait_s']:.2f}s queued), tokens {r['prompt_tokens']}+{r['completion_tokens']} ({status})")
+    total_in = sum(r['prompt_tokens'] for r in reports if not r['cached'])
+    total_out = sum(r['completion_tokens'] for r in reports if not r['cached'])
+    hits = sum(1 for r in reports if r['cached'])
+    print(f"  {len(reports)} documents, {hits} from cache, {total_in}+{total_out} tokens billed")
@@ -1,16 +1,35 @@
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, request, jsonify, send_from_directory, send_file, g, Response
 from flask_cors import CORS
 import os
 import shutil
 from werkzeug.utils import secure_filename
 import tempfile
+import uuid
 import traceback
+import time
+import json
+import zipfile
 import datetime
-import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
 app = Flask(__name__)
 CORS(app)
 
 import ncrp_script as ncrp
+import llm_client
+from mitigation_cache import MitigationCache
+from mitigation_jobs import MitigationWorker, init_jobs_table, JOBS_TABLE
+from blob_store import BlobStore, PENDING, UPLOADS
+from pending_gc import PendingSweeper
+from upload_compress import UploadCompressor
+from preview_cache import PreviewCache
+from request_profiler import RequestProfiler
+from admission import Limiter, Overloaded, OCR_SLOTS, LLM_SLOTS, LLM_BACKGROUND_SLOTS, LETTER_SLOTS
+from upload_stream import (UploadRequest, UploadSpool, UPLOAD_MAX_REQUEST_BYTES, fix_extension,
+                           sniff_type)
+from werkzeug.exceptions import RequestEntityTooLarge
+import mysql_sync
+import metrics
 import pandas as pd
 
 # Base data path: C:\NCRP (or NCRP_DATA_PATH env when set by Electron)
@@ -30,6 +49,87 @@ os.makedirs(PENDING_FOLDER, exist_ok=True)
 DATA_DB_PATH = os.path.join(BASE_DATA_PATH, 'data.db')
 DB_TABLE = 'ncrp_complaints'
 
+# Pending and approved files are stored once per content hash under
+# BLOB_FOLDER; the names in pending/ and uploads/ are rows in data.db (see
+# blob_store.py).  The flat folders above are still read for older files.
+BLOB_FOLDER = os.environ.get('NCRP_BLOB_STORE', os.path.join(BASE_DATA_PATH, 'blobs'))
+blob_store = BlobStore(BLOB_FOLDER, DATA_DB_PATH)
+
+# Multipart file parts are streamed into hashing spools with a per-file
+# limit (UPLOAD_MAX_FILE_MB); whole requests are capped at UPLOAD_MAX_REQUEST_MB.
+app.request_class = UploadRequest
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_REQUEST_BYTES
+
+
+# Pending uploads that are never saved or rejected are evicted after
+# PENDING_TTL_HOURS, oldest first once they exceed PENDING_QUOTA_MB; files
+# are leased for PENDING_LEASE_SECONDS after upload and while /api/verify
+# moves them, so the sweeper (every PENDING_GC_INTERVAL seconds) skips them.
+PENDING_TTL_HOURS = float(os.environ.get('PENDING_TTL_HOURS', 24))
+PENDING_QUOTA_MB = float(os.environ.get('PENDING_QUOTA_MB', 1024))
+PENDING_GC_INTERVAL = float(os.environ.get('PENDING_GC_INTERVAL', 600))
+PENDING_LEASE_SECONDS = float(os.environ.get('PENDING_LEASE_SECONDS', 600))
+pending_sweeper = PendingSweeper(blob_store, PENDING_TTL_HOURS * 3600,
+                                 int(PENDING_QUOTA_MB * 1024 * 1024) if PENDING_QUOTA_MB > 0 else None,
+                                 interval=PENDING_GC_INTERVAL, legacy_dir=PENDING_FOLDER)
+
+
+# Optional lossless re-encoding of approved PNG screenshots (UPLOAD_COMPRESS=1):
+# files are queued on approval and the archive is worked through every
+# UPLOAD_COMPRESS_INTERVAL seconds.  The uploaded hash stays on record.
+UPLOAD_COMPRESS = os.environ.get('UPLOAD_COMPRESS', '').lower() in ('1', 'true', 'yes')
+UPLOAD_COMPRESS_INTERVAL = float(os.environ.get('UPLOAD_COMPRESS_INTERVAL', 3600))
+upload_compressor = UploadCompressor(blob_store, interval=UPLOAD_COMPRESS_INTERVAL, legacy_dir=UPLOAD_FOLDER)
+
+
+# Downscaled WebP previews of uploads (first page for PDFs), cached on disk
+# up to PREVIEW_CACHE_MB with LRU eviction.  /api/complaints links the
+# PREVIEW_PX size; PREVIEW_SIZES lists the sizes /previews will render.
+PREVIEW_FOLDER = os.environ.get('NCRP_PREVIEW_CACHE', os.path.join(BASE_DATA_PATH, 'previews'))
+PREVIEW_CACHE_MB = float(os.environ.get('PREVIEW_CACHE_MB', 256))
+PREVIEW_PX = int(os.environ.get('PREVIEW_PX', 320))
+PREVIEW_SIZES = {PREVIEW_PX, 160, 640, 1280}
+preview_cache = PreviewCache(PREVIEW_FOLDER, DATA_DB_PATH, int(PREVIEW_CACHE_MB * 1024 * 1024))
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return jsonify({'error': e.description or 'upload too large'}), 413
+
+
+def _stored_path(area, name):
+    """Path of a pending/uploaded file: blob store first, then the legacy folder."""
+    if not name:
+        return None
+    path = blob_store.path_for(area, name)
+    if path:
+        return path
+    legacy = os.path.join(PENDING_FOLDER if area == PENDING else UPLOAD_FOLDER, name)
+    return legacy if os.path.isfile(legacy) else None
+
+# Letter generation: bank letters are rendered in a process pool with this
+# many workers; each letter may take at most LETTER_TIMEOUT seconds.  Every
+# request rendering letters holds one of LETTER_SLOTS, so by default the CPUs
+# are split between the slots.
+LETTER_WORKERS = int(os.environ.get('LETTER_WORKERS', max(1, (os.cpu_count() or 1) // max(1, LETTER_SLOTS))))
+LETTER_TIMEOUT = float(os.environ.get('LETTER_TIMEOUT', 60))
+# Bulk generation renders this many complaints at once.
+LETTER_BULK_WORKERS = int(os.environ.get('LETTER_BULK_WORKERS', LETTER_WORKERS))
+
+# OCR, LLM and letter work take a slot shared by all workers (admission.py);
+# requests that find none free within ADMISSION_WAIT_SECONDS get 429.
+ocr_slots = Limiter(DATA_DB_PATH, 'ocr', OCR_SLOTS)
+llm_slots = Limiter(DATA_DB_PATH, 'llm', LLM_SLOTS)
+letter_slots = Limiter(DATA_DB_PATH, 'letters', LETTER_SLOTS)
+
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    resp = jsonify({'error': str(e), 'resource': e.resource, 'retry_after': e.retry_after})
+    resp.status_code = 429
+    resp.headers['Retry-After'] = str(e.retry_after)
+    return resp
+
 
 def init_sqlite_db():
     """Create SQLite table if it doesn't exist."""
@@ -57,8 +157,32 @@ def init_sqlite_db():
     """)
     conn.commit()
     conn.close()
+    # updated_at + triggers, used by the MySQL sync high-water mark
+    if mysql_syncer is not None:
+        mysql_sync.ensure_change_tracking(DATA_DB_PATH, DB_TABLE)
+
+
+def _pdf_for_complaint(complaint_id):
+    """Return the uploaded PDF path for a complaint ID (via the index file), or None."""
+    try:
+        if os.path.exists(INDEX_FILE):
+            with open(INDEX_FILE, 'r', encoding='utf-8') as fh:
+                idx = json.load(fh) or {}
+            fname = idx.get(str(complaint_id))
+            if fname:
+                return _stored_path(UPLOADS, fname)
+    except Exception:
+        app.logger.exception('Error reading index file while generating letters')
+    return None
+
+
+def _letters_dir(complaint_id):
+    """Per-complaint output directory; allow override via LETTERS_PATH."""
+    output_base = os.environ.get('LETTERS_PATH', os.path.join(BASE_DATA_PATH, 'letters'))
+    output_dir = os.path.join(output_base, secure_filename(str(complaint_id)) or 'unknown')
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
 
-import json
 
 @app.route("/api/generate_letters", methods=["POST"])
 def generate_letter():
@@ -69,10 +193,13 @@ def generate_letter():
       - file (the excel/csv document)
     The complaint ID is used to locate the uploaded PDF (via the index file).
     Generated word documents are written under ``$BASE_DATA_PATH/letters/<cid>``
-    and the API responds with a JSON summary of the created filenames.  No
+    and the API responds with a JSON summary of the created filenames.  Only
+    letters whose bank rows changed since the previous run are rebuilt; the
+    response reports rebuilt/reused/deleted counts.  No
     files are returned to the client; this keeps the backend simple and allows
     the frontend to acknowledge success once the process completes.
     """
+    slot = None
     try:
         # complaint id may be sent via form or JSON
         complaint_id = None
@@ -90,38 +217,31 @@ def generate_letter():
         if not upload:
             return jsonify({'error': 'no file uploaded'}), 400
 
+        # look up PDF path corresponding to complaint_id
+        pdf_path = _pdf_for_complaint(complaint_id)
+        if not pdf_path:
+            return jsonify({'error': 'no PDF found for complaint_id'}), 404
+
+        slot = letter_slots.acquire()
+
         # save the uploaded spreadsheet to a temporary location
         fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(upload.filename)[1])
         os.close(fd)
         upload.save(temp_path)
 
-        # look up PDF path corresponding to complaint_id
-        pdf_path = None
-        try:
-            if os.path.exists(INDEX_FILE):
-                with open(INDEX_FILE, 'r', encoding='utf-8') as fh:
-                    idx = json.load(fh) or {}
-                fname = idx.get(str(complaint_id))
-                if fname:
-                    candidate = os.path.join(UPLOAD_FOLDER, fname)
-                    if os.path.exists(candidate):
-                        pdf_path = candidate
-        except Exception:
-            app.logger.exception('Error reading index file while generating letters')
-
-        if not pdf_path:
-            return jsonify({'error': 'no PDF found for complaint_id'}), 404
-
         # call generation function
         from generate_letters import generate_letters_from_files
 
-        # make a per-complaint output directory; allow override via LETTERS_PATH
-        output_base = os.environ.get('LETTERS_PATH', os.path.join(BASE_DATA_PATH, 'letters'))
-        os.makedirs(output_base, exist_ok=True)
-        output_dir = os.path.join(output_base, str(complaint_id))
-        os.makedirs(output_dir, exist_ok=True)
+        output_dir = _letters_dir(complaint_id)
 
-        generated_files = generate_letters_from_files(pdf_path, temp_path, output_dir=output_dir)
+        failures = []
+        stats = {}
+        with metrics.stage('letters'):
+            generated_files = generate_letters_from_files(pdf_path, temp_path, output_dir=output_dir,
+                                                          workers=LETTER_WORKERS, timeout=LETTER_TIMEOUT,
+                                                          failures=failures, incremental=True, stats=stats)
+        for f in failures:
+            app.logger.warning('Letter %s for %s failed: %s', f['file'], complaint_id, f['error'])
 
         # cleanup uploaded temp spreadsheet
         try:
@@ -130,14 +250,157 @@ def generate_letter():
             pass
 
         if not generated_files:
-            return jsonify({'error': 'no letters were generated (check template?)'}), 500
+            return jsonify({'error': 'no letters were generated (check template?)', 'failed': failures}), 500
 
         # don't send the files back; just return names so client can show ack
-        return jsonify({'generated': [os.path.basename(f) for f in generated_files]}), 200
+        return jsonify({'generated': [os.path.basename(f) for f in generated_files], 'failed': failures,
+                        'rebuilt': stats.get('rebuilt', 0), 'reused': stats.get('reused', 0),
+                        'deleted': stats.get('deleted', 0)}), 200
 
+    except (RequestEntityTooLarge, Overloaded):
+        raise
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
+    finally:
+        if slot is not None:
+            slot.release()
+
+class _ZipStream:
+    """Write-only file object that hands zipfile output to a generator.
+
+    zipfile supports unseekable outputs (it writes data descriptors), so the
+    archive can be streamed chunk by chunk without ever being held whole."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+@app.route("/api/generate_letters/bulk", methods=["POST"])
+def generate_letters_bulk():
+    """Generate letters for many complaints and stream them back as a ZIP.
+
+    Expects multipart/form-data with:
+      - files: transaction spreadsheets.  A workbook with several sheets is
+        keyed by sheet name (the acknowledgement number); any other file is
+        keyed by its file name without extension.
+      - complaint_ids (optional): comma-separated or repeated field limiting
+        which complaints are processed.
+    Complaints are rendered in a pool of LETTER_BULK_WORKERS processes and
+    each one's letters are added to the archive (``<cid>/<letter>.docx``) as
+    soon as it finishes.  ``summary.json`` at the end of the archive lists
+    per-complaint counts and errors.
+    """
+    tmp_dir = None
+    try:
+        wanted = [c.strip() for v in request.form.getlist('complaint_ids') for c in v.split(',') if c.strip()]
+        uploads = [f for f in request.files.getlist('files') if f] or \
+            [f for f in (request.files.get('file'),) if f]
+        if not uploads:
+            return jsonify({'error': 'no file uploaded'}), 400
+
+        tmp_dir = tempfile.mkdtemp(prefix='bulk_letters_')
+        sources = {}
+        for up in uploads:
+            name = secure_filename(up.filename or '') or 'upload.xlsx'
+            path = os.path.join(tmp_dir, name)
+            up.save(path)
+            stem, ext = os.path.splitext(name)
+            if ext.lower() in ('.xlsx', '.xls'):
+                # closed right away: an open handle stops rmtree on Windows
+                with pd.ExcelFile(path) as xf:
+                    sheets = xf.sheet_names
+                if len(sheets) > 1:
+                    for sheet in sheets:
+                        sources[str(sheet).strip()] = (path, sheet)
+                    continue
+            sources[stem] = (path, None)
+
+        summary = {}
+        jobs = {}
+        for cid in (wanted or sorted(sources)):
+            if cid not in sources:
+                summary[cid] = {'error': 'no transaction sheet for complaint_id'}
+                continue
+            pdf_path = _pdf_for_complaint(cid)
+            if not pdf_path:
+                summary[cid] = {'error': 'no PDF found for complaint_id'}
+                continue
+            excel_path, sheet = sources[cid]
+            jobs[cid] = (pdf_path, excel_path, _letters_dir(cid), sheet)
+
+        if not jobs:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return jsonify({'error': 'no complaints to process', 'summary': summary}), 404
+
+        from generate_letters import generate_letters_job
+
+        # held until the archive has been sent (or the client went away)
+        try:
+            slot = letter_slots.acquire()
+        except Overloaded:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        def stream():
+            zs = _ZipStream()
+            pool = ProcessPoolExecutor(max_workers=max(1, min(LETTER_BULK_WORKERS, len(jobs))))
+            try:
+                with zipfile.ZipFile(zs, 'w', zipfile.ZIP_DEFLATED) as zf:
+                    futures = {pool.submit(generate_letters_job, *args): cid for cid, args in jobs.items()}
+                    for fut in as_completed(futures):
+                        cid = futures[fut]
+                        try:
+                            files, failures, stats = fut.result()
+                        except Exception as e:
+                            app.logger.exception('Bulk letter generation failed for %s', cid)
+                            summary[cid] = {'error': str(e)}
+                            continue
+                        for path in files:
+                            with open(path, 'rb') as src, zf.open(f"{cid}/{os.path.basename(path)}", 'w') as dst:
+                                for chunk in iter(lambda: src.read(64 * 1024), b''):
+                                    dst.write(chunk)
+                                    data = zs.drain()
+                                    if data:
+                                        yield data
+                            yield zs.drain()
+                        summary[cid] = dict(stats, generated=[os.path.basename(f) for f in files], failed=failures)
+                    zf.writestr('summary.json', json.dumps(summary, indent=1))
+                yield zs.drain()
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        resp = app.response_class(stream(), mimetype='application/zip', headers={
+            'Content-Disposition': f'attachment; filename="letters_{ts}.zip"'})
+
+        def close():
+            # also runs when the client goes away before the stream starts
+            slot.release()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        resp.call_on_close(close)
+        return resp
+    except (RequestEntityTooLarge, Overloaded):
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return jsonify({'error': str(e)}), 500
     
 @app.route('/api/upload', methods=['POST'])
 def api_upload():
@@ -145,6 +408,7 @@ def api_upload():
     Files are saved to PENDING folder (not uploads) until approved via /api/verify.
     Returns extracted rows for verification by the frontend.
     """
+    slot = None
     try:
         files = request.files.getlist('files')
         # Fallback: some clients may send single file without 'files' name
@@ -157,41 +421,47 @@ def api_upload():
             app.logger.warning('api_upload called with no files; request.files keys: %s', list(request.files.keys()))
             return jsonify({'error': 'no files provided'}), 400
 
+        # files from one verification session are tagged with its id
+        session = request.form.get('session') or request.headers.get('X-Upload-Session') or uuid.uuid4().hex
+
+        # screenshots are OCRed: take an OCR slot before storing anything, so
+        # a 429 leaves nothing behind and the client can simply retry
+        if any(isinstance(f.stream, UploadSpool) and f.stream.kind in ('png', 'jpg') for f in files):
+            slot = ocr_slots.acquire()
+
         rows = []
         pending_files = []
         for f in files:
+            # The part was hashed and sniffed while the request streamed in
+            # (see upload_stream.py); other stream types are read here.
+            spool = f.stream if isinstance(f.stream, UploadSpool) else None
+            kind = spool.kind if spool else sniff_type(f.stream.read(16))
+            if not spool:
+                f.stream.seek(0)
+
             # Ensure we have a usable filename; if not, generate one
             raw_name = getattr(f, 'filename', '') or ''
             if raw_name:
-                filename = secure_filename(raw_name)
+                filename = secure_filename(raw_name) or 'upload'
             else:
-                # try to infer extension from content type
-                ext = ''
-                if f.content_type:
-                    if 'jpeg' in f.content_type:
-                        ext = '.jpg'
-                    elif 'png' in f.content_type:
-                        ext = '.png'
-                    elif 'pdf' in f.content_type:
-                        ext = '.pdf'
-                fd, tmpname = tempfile.mkstemp(suffix=ext, prefix='upload_')
-                os.close(fd)
-                filename = os.path.basename(tmpname)
-
-            # Save to PENDING folder (not uploads) - file will be moved on approval
-            dest = os.path.join(PENDING_FOLDER, filename)
-            # Avoid overwriting existing pending files
-            base, ext = os.path.splitext(filename)
-            counter = 1
-            while os.path.exists(dest):
-                filename = f"{base}_{counter}{ext}"
-                dest = os.path.join(PENDING_FOLDER, filename)
-                counter += 1
+                filename = f"upload_{spool.sha256[:12] if spool else datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            if kind is None:
+                rows.append({'Source': 'ERROR', 'Complaint ID': '', 'error': 'unsupported file type (expected PDF, image or Excel)', 'file': filename})
+                continue
+            # trust the content over the name (e.g. a PDF named scan.jpg)
+            filename = fix_extension(filename, kind)
 
+            # Store as pending (not uploads) - the name is switched to uploads
+            # on approval.  The store picks a free name if this one is taken.
             try:
-                f.save(dest)
+                with metrics.stage('upload_save'):
+                    filename, sha, size = blob_store.store(
+                        f.stream, PENDING, filename, original_name=raw_name,
+                        sha256=spool.sha256 if spool else None, size=spool.size if spool else None,
+                        session=session, lease=PENDING_LEASE_SECONDS)
+                dest = blob_store.path_for(PENDING, filename)
                 pending_files.append(filename)
-                app.logger.info('Saved pending file to %s (size=%s)', dest, os.path.getsize(dest))
+                app.logger.info('Saved pending file %s as blob %s (size=%s)', filename, sha[:12], size)
             except Exception as e:
                 app.logger.exception('Failed to save pending file %s: %s', filename, e)
                 rows.append({'Source': 'ERROR', 'Complaint ID': '', 'error': f'failed to save: {e}', 'file': filename})
@@ -199,7 +469,9 @@ def api_upload():
 
             # Process the pending file with extractor
             try:
-                result = ncrp.extract_ncrp(dest)
+                # small uploads are still in memory: parse them from there
+                with metrics.stage('extract'):
+                    result = ncrp.extract_ncrp(dest, data=spool.in_memory() if spool else None, sha=sha)
                 if result is None:
                     rows.append({'Source': 'ERROR', 'Complaint ID': '', 'error': 'no data extracted', 'file': filename, 'pending_file': filename})
                 else:
@@ -226,12 +498,18 @@ def api_upload():
                 rows.append({'Source': 'ERROR', 'Complaint ID': '', 'error': str(e), 'file': filename, 'pending_file': filename})
 
         # Always return a JSON body so frontend doesn't get an empty response
-        return jsonify({'rows': rows, 'files': pending_files}), 200
+        return jsonify({'rows': rows, 'files': pending_files, 'session': session}), 200
+    except (RequestEntityTooLarge, Overloaded):
+        raise
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
+    finally:
+        if slot is not None:
+            slot.release()
 
 
+@metrics.stage('sqlite_insert')
 def _save_row_to_sqlite(row):
     """Save a single row dict to SQLite data.db. Returns None on success, raises on error."""
     import sqlite3
@@ -315,18 +593,24 @@ def _save_row_to_sqlite(row):
 
 
 def _move_pending_to_uploads(pending_file, complaint_id):
-    """Move a file from pending folder to uploads folder, renaming by complaint_id.
-    Returns the final filename in uploads folder, or None if no file to move.
+    """Move a file from pending to uploads, renaming by complaint_id.
+    This only renames its row in the blob store; the bytes stay where they are.
+    Returns the final filename in uploads, or None if no file to move.
     """
     import json
-    if not pending_file:
+    if not pending_file or pending_file != os.path.basename(pending_file):
         return None
-    
-    src = os.path.join(PENDING_FOLDER, pending_file)
-    if not os.path.exists(src):
-        app.logger.warning('Pending file not found: %s', src)
-        return None
-    
+
+    if blob_store.lookup(PENDING, pending_file) is None:
+        # pending file saved before the blob store existed: adopt it first
+        src = os.path.join(PENDING_FOLDER, pending_file)
+        if not os.path.isfile(src):
+            app.logger.warning('Pending file not found: %s', pending_file)
+            return None
+        with open(src, 'rb') as fh:
+            pending_file = blob_store.store(fh, PENDING, pending_file)[0]
+        os.remove(src)
+
     # Determine final filename based on complaint_id
     _, ext = os.path.splitext(pending_file)
     if complaint_id:
@@ -334,18 +618,13 @@ def _move_pending_to_uploads(pending_file, complaint_id):
         final_name = f"{safe_id}{ext}"
     else:
         final_name = pending_file
-    
-    dest = os.path.join(UPLOAD_FOLDER, final_name)
-    # Avoid overwriting existing files
-    counter = 1
-    base = final_name.rsplit('.', 1)[0] if '.' in final_name else final_name
-    while os.path.exists(dest):
-        final_name = f"{base}_{counter}{ext}"
-        dest = os.path.join(UPLOAD_FOLDER, final_name)
-        counter += 1
-    
+
     try:
-        shutil.move(src, dest)
+        # the store picks a free name (base_1.ext, ...) if this one is taken
+        final_name = blob_store.move(PENDING, pending_file, UPLOADS, final_name)
+        if final_name is None:
+            app.logger.warning('Pending file not found: %s', pending_file)
+            return None
         app.logger.info('Moved pending file %s to uploads as %s', pending_file, final_name)
         
         # Update index mapping
@@ -390,10 +669,13 @@ def api_verify():
                 pending_file = row.get('pending_file')
                 if pending_file:
                     try:
-                        src = os.path.join(PENDING_FOLDER, pending_file)
-                        if os.path.exists(src):
-                            os.remove(src)
+                        if blob_store.remove(PENDING, pending_file):
                             app.logger.info('Deleted rejected pending file: %s', pending_file)
+                        elif pending_file == os.path.basename(pending_file):
+                            src = os.path.join(PENDING_FOLDER, pending_file)
+                            if os.path.exists(src):
+                                os.remove(src)
+                                app.logger.info('Deleted rejected pending file: %s', pending_file)
                     except Exception:
                         pass
             return jsonify({'status': 'rejected', 'message': 'Rows rejected by user'}), 200
@@ -403,7 +685,11 @@ def api_verify():
                 return jsonify({'error': 'no rows to save'}), 400
 
             init_sqlite_db()
+            # keep the pending sweeper away from these files until they are moved
+            blob_store.lease(PENDING, [r.get('pending_file') for r in rows if isinstance(r, dict)],
+                             PENDING_LEASE_SECONDS)
             saved = []
+            saved_ids = []
             failed = []
             skipped = []
 
@@ -433,49 +719,58 @@ def api_verify():
                     # Update row with final filename for DB storage
                     if final_filename:
                         row['saved_filename'] = final_filename
+                        upload_compressor.enqueue(final_filename)
                     
                     _save_row_to_sqlite(row)
                     saved.append({'index': idx, 'row': row})
+                    saved_ids.append(cid)
                 except Exception as e:
                     traceback.print_exc()
                     failed.append({'index': idx, 'row': row, 'error': str(e)})
 
+            # queue low-priority mitigation advice for the new complaints
+            try:
+                mitigation_worker.enqueue(saved_ids)
+            except Exception:
+                app.logger.exception('Failed to enqueue mitigation pre-generation')
+
             excel_info = None
             excel_errors = []
             # Attempt to also append saved rows to an Excel file for record-keeping
             try:
                 if saved:
-                    # Build DataFrame from saved rows using the canonical columns
-                    df_saved = pd.DataFrame([s['row'] for s in saved], columns=ncrp.COLUMNS)
-                    excel_path = getattr(ncrp, 'OUTPUT_FILE', 'ncrp_complaints.xlsx')
-                    # If file exists, read and concat; otherwise write new
-                    if os.path.exists(excel_path):
-                        try:
-                            df_existing = pd.read_excel(excel_path)
-                            df_out = pd.concat([df_existing, df_saved], ignore_index=True)
+                    with metrics.stage('excel_write'):
+                        # Build DataFrame from saved rows using the canonical columns
+                        df_saved = pd.DataFrame([s['row'] for s in saved], columns=ncrp.COLUMNS)
+                        excel_path = getattr(ncrp, 'OUTPUT_FILE', 'ncrp_complaints.xlsx')
+                        # If file exists, read and concat; otherwise write new
+                        if os.path.exists(excel_path):
+                            try:
+                                df_existing = pd.read_excel(excel_path)
+                                df_out = pd.concat([df_existing, df_saved], ignore_index=True)
+                                try:
+                                    df_out.to_excel(excel_path, index=False)
+                                    excel_info = {'path': excel_path, 'appended_rows': len(df_saved)}
+                                except PermissionError:
+                                    ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+                                    alt = f"{os.path.splitext(excel_path)[0]}_{ts}{os.path.splitext(excel_path)[1]}"
+                                    df_out.to_excel(alt, index=False)
+                                    excel_info = {'path': alt, 'appended_rows': len(df_saved), 'note': 'primary file locked; wrote to fallback'}
+                            except Exception:
+                                # If reading existing fails, try simple append by writing a new file with timestamp
+                                ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+                                alt = f"{os.path.splitext(excel_path)[0]}_{ts}{os.path.splitext(excel_path)[1]}"
+                                df_saved.to_excel(alt, index=False)
+                                excel_info = {'path': alt, 'appended_rows': len(df_saved), 'note': 'existing file unreadable; wrote new file'}
+                        else:
                             try:
-                                df_out.to_excel(excel_path, index=False)
+                                df_saved.to_excel(excel_path, index=False)
                                 excel_info = {'path': excel_path, 'appended_rows': len(df_saved)}
                             except PermissionError:
                                 ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
                                 alt = f"{os.path.splitext(excel_path)[0]}_{ts}{os.path.splitext(excel_path)[1]}"
-                                df_out.to_excel(alt, index=False)
+                                df_saved.to_excel(alt, index=False)
                                 excel_info = {'path': alt, 'appended_rows': len(df_saved), 'note': 'primary file locked; wrote to fallback'}
-                        except Exception:
-                            # If reading existing fails, try simple append by writing a new file with timestamp
-                            ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-                            alt = f"{os.path.splitext(excel_path)[0]}_{ts}{os.path.splitext(excel_path)[1]}"
-                            df_saved.to_excel(alt, index=False)
-                            excel_info = {'path': alt, 'appended_rows': len(df_saved), 'note': 'existing file unreadable; wrote new file'}
-                    else:
-                        try:
-                            df_saved.to_excel(excel_path, index=False)
-                            excel_info = {'path': excel_path, 'appended_rows': len(df_saved)}
-                        except PermissionError:
-                            ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-                            alt = f"{os.path.splitext(excel_path)[0]}_{ts}{os.path.splitext(excel_path)[1]}"
-                            df_saved.to_excel(alt, index=False)
-                            excel_info = {'path': alt, 'appended_rows': len(df_saved), 'note': 'primary file locked; wrote to fallback'}
             except Exception as e:
                 traceback.print_exc()
                 excel_errors.append(str(e))
@@ -499,8 +794,12 @@ def api_complaints():
         import sqlite3
         conn = sqlite3.connect(DATA_DB_PATH)
         conn.row_factory = sqlite3.Row
-        cur = conn.execute("SELECT * FROM {0} ORDER BY id DESC LIMIT 1000".format(DB_TABLE))
-        rows = [dict(row) for row in cur.fetchall()]
+        init_jobs_table(DATA_DB_PATH)
+        with metrics.stage('sqlite_query'):
+            cur = conn.execute(
+                "SELECT c.*, m.advice AS mitigation, m.status AS mitigation_status FROM {0} c "
+                "LEFT JOIN {1} m ON m.complaint_id = c.complaint_id ORDER BY c.id DESC LIMIT 1000".format(DB_TABLE, JOBS_TABLE))
+            rows = [dict(row) for row in cur.fetchall()]
         conn.close()
 
         # Convert SQL column names to frontend-friendly names
@@ -514,7 +813,10 @@ def api_complaints():
                     index_map = json.load(fh) or {}
         except Exception:
             index_map = {}
-        for r in rows:
+        saved_names = [r.get('saved_filename') or index_map.get(str(r.get('complaint_id'))) for r in rows]
+        stored = blob_store.lookup_many(UPLOADS, saved_names)
+        for r, saved_name in zip(rows, saved_names):
+            blob = stored.get(saved_name)
             mapped.append({
                 'id': r.get('complaint_id') or r.get('complaint_id'),
                 'complaintDate': r.get('complaint_date'),
@@ -529,7 +831,13 @@ def api_complaints():
                 'currentStatus': r.get('current_status'),
                 'processedDateTime': r.get('created_at'),
                 # include any saved filename / source file info if available in DB
-                'savedFilename': r.get('saved_filename') or r.get('file') or index_map.get(str(r.get('complaint_id'))) or None
+                'savedFilename': r.get('saved_filename') or r.get('file') or index_map.get(str(r.get('complaint_id'))) or None,
+                # small cached preview of the file (None for files stored before the blob store)
+                'previewUrl': f"/previews/{blob['sha256']}/{PREVIEW_PX}.webp"
+                if blob and PreviewCache.supported(blob['ext']) else None,
+                # pre-generated mitigation advice (None until the background job finishes)
+                'mitigation': r.get('mitigation'),
+                'mitigationStatus': r.get('mitigation_status')
             })
 
         return jsonify({'rows': mapped})
@@ -549,34 +857,54 @@ def api_config():
 
 @app.route('/uploads/<path:filename>', methods=['GET'])
 def serve_upload(filename):
-    """Serve uploaded files from the uploads folder."""
+    """Serve uploaded files (blob store, or the legacy uploads folder)."""
     try:
+        row = blob_store.lookup(UPLOADS, filename)
+        path = blob_store.blob_path(row['sha256'], row['ext']) if row else None
+        if path and os.path.exists(path):
+            resp = send_file(path, download_name=filename, as_attachment=False)
+            # hash of the file as uploaded, when the stored copy was re-encoded
+            if row['original_sha256']:
+                resp.headers['X-Original-SHA256'] = row['original_sha256']
+            return resp
         return send_from_directory(UPLOAD_FOLDER, filename, as_attachment=False)
     except Exception as e:
         app.logger.exception('Failed to serve upload %s: %s', filename, e)
         return jsonify({'error': 'file not found'}), 404
 
 
-OLLAMA_MODEL = "huggingface.co/QuantFactory/Meta-Llama-3-8B-Instruct-GGUF:latest"
-#OLLAMA_MODEL = "llama3"
-
+@app.route('/previews/<sha>/<int:px>.webp', methods=['GET'])
+def serve_preview(sha, px):
+    """Serve a cached WebP preview of an uploaded file, rendering it on first use.
 
-def ask_llm(prompt: str) -> str:
-    """Call Ollama safely and return text"""
+    The URL names the file content (SHA-256), so responses are immutable."""
+    if px not in PREVIEW_SIZES or len(sha) != 64 or not all(ch in '0123456789abcdef' for ch in sha):
+        return jsonify({'error': 'not found'}), 404
     try:
-        process = subprocess.run(
-            ["ollama", "run", OLLAMA_MODEL],
-            input=prompt,
-            text=True,
-            encoding="utf-8",
-            errors="ignore",
-            capture_output=True,
-            timeout=120
-        )
-        return process.stdout.strip()
-
+        source, ext = blob_store.blob_for(sha)
+        if source is None or not PreviewCache.supported(ext):
+            return jsonify({'error': 'not found'}), 404
+        path = preview_cache.get(sha, ext, px, source)
+        resp = send_file(path, mimetype='image/webp', etag=f'{sha}-{px}', max_age=31536000,
+                         conditional=True)
+        resp.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return resp
     except Exception as e:
-        return f"LLM Error: {e}"
+        app.logger.exception('Failed to render preview %s/%s: %s', sha, px, e)
+        return jsonify({'error': 'preview not available'}), 404
+
+
+OLLAMA_MODEL = llm_client.OLLAMA_MODEL
+
+
+def ask_llm(prompt: str, background=False) -> str:
+    """Call Ollama safely and return text (HTTP API, CLI as fallback).
+
+    ``background`` calls do not wait for an LLM slot and only get one while
+    fewer than LLM_BACKGROUND_SLOTS are in use; otherwise they raise Overloaded."""
+    slot = llm_slots.acquire(wait=0, limit=LLM_BACKGROUND_SLOTS) if background else llm_slots.acquire()
+    with slot, metrics.stage('llm'):
+        return llm_client.ask(prompt)
 
 
 def build_prompt(data: dict) -> str:
@@ -599,6 +927,53 @@ RULES:
 - i should not get this line "Here is a brief explanation of the risk and suggested mitigation measures:" and this one Let me know if you'd like me to improve anything!
 """ 
 
+# Cached advice keyed on normalised complaint fields (see mitigation_cache.py)
+MITIGATION_CACHE_TTL = float(os.environ.get('MITIGATION_CACHE_TTL', 7 * 24 * 3600))
+MITIGATION_CACHE_MAX = int(os.environ.get('MITIGATION_CACHE_MAX', 1000))
+mitigation_cache = MitigationCache(DATA_DB_PATH, model=OLLAMA_MODEL,
+                                   ttl=MITIGATION_CACHE_TTL, max_entries=MITIGATION_CACHE_MAX)
+
+
+def mitigation_advice(data: dict, background=False) -> str:
+    """Return mitigation advice for complaint fields, from cache when possible."""
+    return mitigation_cache.get_or_generate(data, lambda: ask_llm(build_prompt(data), background=background))
+
+
+def _complaint_prompt_fields(complaint_id):
+    """Prompt fields of a saved complaint (for background pre-generation)."""
+    import sqlite3
+    conn = sqlite3.connect(DATA_DB_PATH)
+    try:
+        row = conn.execute(
+            "SELECT cybercrime_type, platform, total_amount_lost, state, district FROM {0} WHERE complaint_id = ?".format(DB_TABLE),
+            (str(complaint_id),)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return {
+        "Cybercrime Type": row[0],
+        "Platform": row[1],
+        "Total Amount Lost": row[2],
+        "State": row[3],
+        "District": row[4],
+    }
+
+
+# Newly saved complaints get their advice generated in the background, one
+# (MITIGATION_PREGEN_THREADS) at a time and only while no interactive LLM
+# request is running here, and only in the LLM slots officers leave free
+# (LLM_BACKGROUND_SLOTS, see admission.py), so the complaints page can show
+# it without waiting.
+MITIGATION_PREGEN = os.environ.get('MITIGATION_PREGEN', '1').lower() in ('1', 'true', 'yes')
+MITIGATION_PREGEN_THREADS = int(os.environ.get('MITIGATION_PREGEN_THREADS', 1))
+mitigation_worker = MitigationWorker(DATA_DB_PATH, _complaint_prompt_fields,
+                                     lambda fields: mitigation_advice(fields, background=True),
+                                     threads=MITIGATION_PREGEN_THREADS,
+                                     is_busy=lambda: mitigation_cache.busy() or
+                                     llm_slots.in_use() >= LLM_BACKGROUND_SLOTS)
+
+
 @app.route("/api/input", methods=["GET"])
 def get_input_format():
     sample_data = {
@@ -609,8 +984,7 @@ def get_input_format():
         "District": "Chennai"
     }
 
-    prompt = build_prompt(sample_data)
-    response = ask_llm(prompt)  
+    response = mitigation_advice(sample_data)
 
     return jsonify({
         "status": "success",
@@ -625,8 +999,7 @@ def generate_mitigation():
     if not data:
         return jsonify({"error": "No JSON data received"}), 400
 
-    prompt = build_prompt(data)
-    response = ask_llm(prompt)
+    response = mitigation_advice(data)
 
     return jsonify({
         "status": "success",
@@ -634,6 +1007,301 @@ def generate_mitigation():
     })
 
 
+@app.route("/api/mitigation/stream", methods=["POST"])
+def stream_mitigation():
+    """Same input as /api/mitigation, answered as Server-Sent Events.
+
+    Each ``data:`` event carries ``{"token": "..."}``; the stream ends with an
+    ``event: done`` (or ``event: error``) message."""
+    data = request.get_json(silent=True)
+
+    if not data:
+        return jsonify({"error": "No JSON data received"}), 400
+
+    # only the request that generates the answer takes an LLM slot; it is
+    # taken now, while a 429 can still be sent, and held until the stream closes
+    tokens = mitigation_cache.stream(data, lambda: llm_client.ask_stream(build_prompt(data)),
+                                     acquire=llm_slots.acquire)
+
+    def events():
+        try:
+            for token in tokens:
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            app.logger.exception('Mitigation stream failed')
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    resp = app.response_class(events(), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    resp.call_on_close(tokens.close)
+    return resp
+
+
+
+@app.route("/api/mitigation/cache", methods=["GET"])
+def mitigation_cache_stats():
+    """Hit/miss counters and size of the mitigation advice cache."""
+    try:
+        return jsonify(mitigation_cache.stats())
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+# Incremental sync of data.db to MySQL (see mysql_sync.py).  Enabled when
+# MYSQL_SYNC_URL (or DB_USER) is set; runs every MYSQL_SYNC_INTERVAL seconds.
+_sync_url = mysql_sync.url_from_env()
+mysql_syncer = mysql_sync.MysqlSync(DATA_DB_PATH, _sync_url) if _sync_url is not None else None
+
+
+@app.route('/api/sync', methods=['GET', 'POST'])
+def mysql_sync_status():
+    """GET: watermark and pending rows of the MySQL sync; POST: sync now."""
+    if mysql_syncer is None:
+        return jsonify({'error': 'MySQL sync not configured (set MYSQL_SYNC_URL)'}), 404
+    try:
+        result = {}
+        if request.method == 'POST':
+            result['synced'] = mysql_syncer.run_once()
+        result.update(mysql_syncer.status())
+        return jsonify(result)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/pending', methods=['GET', 'POST'])
+def pending_stats():
+    """GET: pending upload count, size and sweeper totals; POST: sweep now."""
+    try:
+        result = {}
+        if request.method == 'POST':
+            result['sweep'] = pending_sweeper.run_once()
+        result.update(pending_sweeper.stats())
+        return jsonify(result)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/admission', methods=['GET'])
+def admission_stats():
+    """Slots, slots in use and admitted/queued/rejected counts per resource."""
+    try:
+        return jsonify({l.resource: l.stats() for l in (ocr_slots, llm_slots, letter_slots)})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/compression', methods=['GET', 'POST'])
+def compression_stats():
+    """GET: bytes saved by re-encoding approved files; POST: compress a batch of the archive now."""
+    try:
+        result = {}
+        if request.method == 'POST':
+            limit = request.args.get('limit', type=int)
+            result['run'] = upload_compressor.run_once(limit)
+        result.update(upload_compressor.stats())
+        return jsonify(result)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+# ---------------- metrics ----------------
+# Stage timings are recorded where the work happens (metrics.stage); request
+# latency is recorded here and queue/cache state is read when /metrics is
+# scraped.  See metrics.py for running under several gunicorn workers.
+HTTP_SECONDS = metrics.Histogram('ncrp_http_request_seconds', 'HTTP request latency.',
+                                 ('endpoint', 'method', 'status'))
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def _record_request_time(response):
+    start = g.pop('request_start', None)
+    # streamed responses are timed up to their first byte
+    if start is not None and request.endpoint != 'metrics_endpoint':
+        HTTP_SECONDS.observe(time.perf_counter() - start, endpoint=request.endpoint or 'unmatched',
+                             method=request.method, status=response.status_code)
+    return response
+
+
+def _mitigation_queue():
+    import sqlite3
+    init_jobs_table(DATA_DB_PATH)
+    conn = sqlite3.connect(DATA_DB_PATH)
+    try:
+        return dict(conn.execute(f"SELECT status, COUNT(*) FROM {JOBS_TABLE} GROUP BY status").fetchall())
+    finally:
+        conn.close()
+
+
+metrics.Gauge('ncrp_mitigation_jobs', 'Mitigation pre-generation jobs by status.', _mitigation_queue, ('status',))
+metrics.Gauge('ncrp_mitigation_cache_lookups_total', 'Mitigation cache lookups by result.',
+              lambda: {k: v for k, v in mitigation_cache.stats().items() if k in ('hits', 'misses', 'coalesced')},
+              ('result',), kind='counter')
+metrics.Gauge('ncrp_mitigation_inflight', 'LLM generations in flight in this process.',
+              lambda: mitigation_cache.stats()['inflight'])
+metrics.Gauge('ncrp_pending_files', 'Pending uploads awaiting verification.',
+              lambda: blob_store.area_summary(PENDING)['files'])
+metrics.Gauge('ncrp_pending_bytes', 'Size of pending uploads.', lambda: blob_store.area_summary(PENDING)['bytes'])
+metrics.Gauge('ncrp_compress_queue', 'Approved files waiting to be re-encoded.', upload_compressor.queued)
+metrics.Gauge('ncrp_admission_slots_in_use', 'Busy OCR/LLM/letter slots across all workers.',
+              lambda: {(l.resource,): l.in_use() for l in (ocr_slots, llm_slots, letter_slots)}, ('resource',))
+metrics.Gauge('ncrp_preview_cache_bytes', 'Size of the preview cache.', lambda: preview_cache.stats()['bytes'])
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape endpoint."""
+    try:
+        return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+# ---------------- request profiling ----------------
+# PROFILE_REQUESTS=1 lets an admin profile a single request by sending
+# X-Profile: <PROFILE_TOKEN>; runs are saved under PROFILE_FOLDER and listed
+# by /api/profiles (see request_profiler.py).
+PROFILE_FOLDER = os.path.join(BASE_DATA_PATH, 'profiles')
+request_profiler = RequestProfiler(PROFILE_FOLDER)
+
+
+@app.before_request
+def _start_profile():
+    if request_profiler.enabled and request_profiler.wanted(request):
+        g.profile = request_profiler.start()
+        if g.profile is None:
+            g.profile_skipped = True
+
+
+@app.after_request
+def _finish_profile(response):
+    handle = g.pop('profile', None)
+    if handle is not None:
+        try:
+            response.headers['X-Profile-Id'] = request_profiler.finish(
+                handle, request.endpoint, request.method, request.path, response.status_code)
+        except Exception:
+            app.logger.exception('Saving request profile failed')
+    elif g.pop('profile_skipped', False):
+        response.headers['X-Profile-Id'] = 'skipped: another request is being profiled'
+    return response
+
+
+@app.teardown_request
+def _abandon_profile(exc):
+    # the view raised past the error handlers: still stop the profiler
+    handle = g.pop('profile', None)
+    if handle is not None:
+        request_profiler.finish(handle, request.endpoint, request.method, request.path, 500)
+
+
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    """Saved request profiles, newest first (profiling admins only)."""
+    if not request_profiler.authorized(request):
+        return jsonify({'error': 'not found'}), 404
+    try:
+        return jsonify({'profiles': request_profiler.runs()})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/profiles/<path:filename>', methods=['GET'])
+def download_profile(filename):
+    """Download one profile file (<id>.pstats, <id>.collapsed or <id>.json)."""
+    if not request_profiler.authorized(request):
+        return jsonify({'error': 'not found'}), 404
+    return send_from_directory(PROFILE_FOLDER, filename, as_attachment=True)
+
+
+# ---------------- background work ----------------
+# The pending sweeper, PNG compressor, mitigation pre-generation, MySQL sync
+# and the Ollama preload are not started on import (scripts and benchmarks
+# import this module too) but by start_background(): from __main__ below and
+# from gunicorn's post_worker_init hook (gunicorn.conf.py).  Only the process
+# holding BACKGROUND_LOCK runs them; the other workers retry every
+# BACKGROUND_LOCK_RETRY seconds and take over when that process exits.  Jobs
+# queued by other workers are picked up by the leader's periodic passes.
+OLLAMA_PRELOAD = os.environ.get('OLLAMA_PRELOAD', '').lower() in ('1', 'true', 'yes')
+BACKGROUND_LOCK = os.path.join(BASE_DATA_PATH, 'background.lock')
+BACKGROUND_LOCK_RETRY = float(os.environ.get('BACKGROUND_LOCK_RETRY', 30))
+_background_started = False
+_background_lock = threading.Lock()
+_background_lock_file = None
+
+
+def _try_lock(path):
+    """Open ``path`` with an exclusive OS lock, or return None if another process has it."""
+    fh = open(path, 'a+b')
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        return None
+    return fh
+
+
+def _run_background():
+    if mysql_syncer is not None:
+        init_sqlite_db()
+        mysql_syncer.start(mysql_sync.SYNC_INTERVAL)
+    pending_sweeper.start()
+    if UPLOAD_COMPRESS:
+        upload_compressor.start()
+    if MITIGATION_PREGEN:
+        mitigation_worker.start()
+    # load the mitigation model now instead of on the first request
+    if OLLAMA_PRELOAD:
+        llm_client.warm_in_background()
+
+
+def start_background():
+    """Run the background threads here once this process holds BACKGROUND_LOCK."""
+    global _background_started
+
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+
+    def _elect():
+        global _background_lock_file
+        while True:
+            fh = _try_lock(BACKGROUND_LOCK)
+            if fh is not None:
+                # kept open (and locked) for the life of the process
+                _background_lock_file = fh
+                app.logger.info('Background jobs run in process %s', os.getpid())
+                _run_background()
+                return
+            time.sleep(BACKGROUND_LOCK_RETRY)
+
+    threading.Thread(target=_elect, name='background-leader', daemon=True).start()
+
+
 if __name__ == '__main__':
+    # letter rendering uses worker processes; required for the frozen exe
+    import multiprocessing
+    multiprocessing.freeze_support()
     print('Using SQLite database:', DATA_DB_PATH)
+    # with debug=True the reloader's parent only watches files; the child it
+    # starts (WERKZEUG_RUN_MAIN set) serves requests and runs the background
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background()
     app.run(host='0.0.0.0', port=5000, debug=True)
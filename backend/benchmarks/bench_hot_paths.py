@@ -0,0 +1,282 @@
+"""Benchmarks for the upload, verify and letter hot paths, with stored baselines.
+
+Cases (each at several input sizes, on inputs from synthetic.py):
+  extract_pdf       ncrp_script.extract_ncrp on acknowledgement PDFs (cold
+                    text store), size = transaction lines in the PDF
+  extract_image     ncrp_script.extract_ncrp on chat screenshots (OCR; skipped
+                    when Tesseract is not installed), size = chat messages
+  read_excel        ncrp_script.read_excel on NCRP exports, size = rows
+  api_verify        POST /api/verify action=save via the Flask test client,
+                    size = rows saved per request
+  generate_letters  generate_letters.generate_letters_from_files, size =
+                    transaction rows (12 banks, one worker)
+
+Everything runs in a temporary NCRP_DATA_PATH.  Timings are wall-clock
+seconds per call over --repeat calls after one warm-up call.
+
+Usage (from the backend folder):
+    python benchmarks/bench_hot_paths.py [--only extract_pdf read_excel] [--repeat 5]
+    python benchmarks/bench_hot_paths.py --save main        # store a baseline
+    python benchmarks/bench_hot_paths.py --compare main     # report against it
+Baselines are JSON files in benchmarks/baselines/.  With --compare the exit
+status is 1 when any case's median is slower than the baseline by more than
+--threshold (default 10%).
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+# keep the app, text store and Excel output away from real data
+WORK_DIR = tempfile.mkdtemp(prefix="ncrp_bench_")
+os.environ["NCRP_DATA_PATH"] = os.path.join(WORK_DIR, "data")
+os.environ["NCRP_TEXT_STORE"] = os.path.join(WORK_DIR, "text")
+os.environ["MITIGATION_PREGEN"] = "0"
+os.environ["PENDING_GC_INTERVAL"] = "0"
+os.environ.pop("UPLOAD_COMPRESS", None)
+os.environ.pop("MYSQL_SYNC_URL", None)
+
+import synthetic  # noqa: E402
+
+BASELINE_DIR = os.path.join(HERE, "baselines")
+
+
+class Case:
+    """A benchmark at several sizes.
+
+    ``setup(size, repeat, rng, work)`` prepares inputs (untimed) and returns
+    ``(run, prepare)``: ``run(i)`` is the timed call for iteration ``i`` and
+    ``prepare(i)``, when not None, runs untimed before it."""
+
+    def __init__(self, name, sizes, setup, available=None):
+        self.name = name
+        self.sizes = sizes
+        self.setup = setup
+        self.available = available
+
+
+def _setup_extract_pdf(size, repeat, rng, work):
+    import ncrp_script
+    # a distinct PDF per call so the text store never has the answer
+    paths = [os.path.join(work, "ack_%d.pdf" % i) for i in range(repeat + 1)]
+    for p in paths:
+        synthetic.ack_pdf(p, rng, txn_rows=size)
+    return (lambda i: ncrp_script.extract_ncrp(paths[i])), None
+
+
+def _setup_extract_image(size, repeat, rng, work):
+    import ncrp_script
+    path = os.path.join(work, "shot.png")
+    synthetic.screenshot(path, rng, messages=size)
+    return (lambda i: ncrp_script.extract_ncrp(path)), None
+
+
+def _tesseract_available():
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def _setup_read_excel(size, repeat, rng, work):
+    import ncrp_script
+    path = os.path.join(work, "export.xlsx")
+    synthetic.ncrp_export(path, rng, size)
+    return (lambda i: ncrp_script.read_excel(path)), None
+
+
+_client = None
+
+
+def _setup_api_verify(size, repeat, rng, work):
+    global _client
+    import ncrp_script
+    if _client is None:
+        import app
+        _client = app.app.test_client()
+    payloads = []
+    for _ in range(repeat + 1):
+        rows = []
+        for _ in range(size):
+            c = synthetic.complaint(rng)
+            rows.append({"Source": "PDF", "Complaint ID": c["ack"], "Complaint Date": c["complaint_date"],
+                         "Incident Date & Time": c["incident"], "Mobile": c["mobile"], "Email": c["email"],
+                         "Full Address": c["house"], "District": c["district"], "State": c["state"],
+                         "Cybercrime Type": c["sub"], "Platform": c["platform"],
+                         "Total Amount Lost": c["amount"], "Current Status": "Registered"})
+        payloads.append({"action": "save", "rows": rows})
+
+    def prepare(i):
+        # every call appends to the same workbook; start each one from an empty file
+        if os.path.exists(ncrp_script.OUTPUT_FILE):
+            os.remove(ncrp_script.OUTPUT_FILE)
+
+    def run(i):
+        resp = _client.post("/api/verify", json=payloads[i])
+        if resp.status_code != 200 or resp.get_json().get("saved_count") != size:
+            raise RuntimeError(f"verify failed: {resp.status_code} {resp.get_data(as_text=True)[:200]}")
+
+    return run, prepare
+
+
+def _setup_generate_letters(size, repeat, rng, work):
+    import generate_letters
+    pdf, sheet = os.path.join(work, "ack.pdf"), os.path.join(work, "txn.xlsx")
+    tpl, ifsc = os.path.join(work, "template.docx"), os.path.join(work, "ifsc.csv")
+    synthetic.ack_pdf(pdf, rng)
+    synthetic.transaction_sheet(sheet, rng, size)
+    synthetic.docx_template(tpl)
+    synthetic.ifsc_csv(ifsc)
+    out = os.path.join(work, "letters")
+
+    def prepare(i):
+        shutil.rmtree(out, ignore_errors=True)
+
+    def run(i):
+        failures = []
+        generate_letters.generate_letters_from_files(pdf, sheet, out, tpl, ifsc, failures=failures)
+        if failures:
+            raise RuntimeError(f"letters failed: {failures[:2]}")
+
+    return run, prepare
+
+
+CASES = [
+    Case("extract_pdf", [0, 200, 2000], _setup_extract_pdf),
+    Case("extract_image", [8, 24], _setup_extract_image, _tesseract_available),
+    Case("read_excel", [100, 1000, 10000], _setup_read_excel),
+    Case("api_verify", [1, 20, 100], _setup_api_verify),
+    Case("generate_letters", [50, 500, 5000], _setup_generate_letters),
+]
+
+
+def measure(case, size, repeat, seed):
+    work = tempfile.mkdtemp(dir=WORK_DIR)
+    # own input stream per case and size (api_verify needs unseen complaint IDs)
+    rng = random.Random(f"{seed}:{case.name}:{size}")
+    run, prepare = case.setup(size, repeat, rng, work)
+    times = []
+    for i in range(repeat + 1):
+        if prepare:
+            prepare(i)
+        start = time.perf_counter()
+        run(i)
+        elapsed = time.perf_counter() - start
+        if i:  # the first call is a warm-up (imports, template cache, ...)
+            times.append(elapsed)
+    shutil.rmtree(work, ignore_errors=True)
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "repeat": repeat,
+    }
+
+
+def environment():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                             text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        rev = None
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git": rev,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def baseline_path(name):
+    return name if name.endswith(".json") else os.path.join(BASELINE_DIR, name + ".json")
+
+
+def compare(results, baseline, threshold):
+    """Print current vs baseline medians; returns the number of regressions."""
+    base = baseline["results"]
+    print(f"\nCompared with baseline from {baseline['env'].get('date')} "
+          f"(git {baseline['env'].get('git')}, {baseline['env'].get('platform')})")
+    print(f"{'case':<28} {'baseline':>10} {'current':>10} {'change':>8}")
+    regressions = 0
+    for key, cur in results.items():
+        old = base.get(key)
+        if old is None:
+            print(f"{key:<28} {'-':>10} {cur['median']:>10.4f} {'new':>8}")
+            continue
+        change = cur["median"] / old["median"] - 1 if old["median"] else 0.0
+        # a change inside the noise of either run is not a regression
+        noise = max(old.get("stdev", 0), cur["stdev"]) / old["median"] if old["median"] else 0.0
+        status = ""
+        if change > max(threshold, noise):
+            status = "  SLOWER"
+            regressions += 1
+        elif change < -max(threshold, noise):
+            status = "  faster"
+        print(f"{key:<28} {old['median']:>10.4f} {cur['median']:>10.4f} {change:>+7.1%}{status}")
+    for key in base:
+        if key not in results:
+            print(f"{key:<28} {base[key]['median']:>10.4f} {'-':>10} {'not run':>8}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--only", nargs="+", metavar="CASE", help="cases to run (default: all)")
+    ap.add_argument("--sizes", type=int, nargs="+", help="override the sizes of every selected case")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--save", metavar="NAME", help="store the results as baseline NAME")
+    ap.add_argument("--compare", metavar="NAME", help="compare with baseline NAME (or a JSON path)")
+    ap.add_argument("--threshold", type=float, default=0.10, help="slowdown counted as a regression")
+    args = ap.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(baseline_path(args.compare), "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+
+    results = {}
+    try:
+        print(f"{'case':<28} {'median s':>10} {'min s':>10} {'stdev':>8}")
+        for case in CASES:
+            if args.only and case.name not in args.only:
+                continue
+            if case.available and not case.available():
+                print(f"{case.name:<28} skipped (not available here)")
+                continue
+            for size in args.sizes or case.sizes:
+                key = f"{case.name}[{size}]"
+                r = measure(case, size, args.repeat, args.seed)
+                results[key] = r
+                print(f"{key:<28} {r['median']:>10.4f} {r['min']:>10.4f} {r['stdev']:>8.4f}")
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.save), "w", encoding="utf-8") as fh:
+            json.dump({"env": environment(), "results": results}, fh, indent=2, sort_keys=True)
+        print(f"✔ baseline saved to {baseline_path(args.save)}")
+    if baseline is not None and compare(results, baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark ``insert_rows`` on large transaction tables.
+
+Compares the bulk XML row builder in ``generate_letters.insert_rows`` with the
+previous ``add_row()`` + per-cell ``text`` implementation.
+
+Usage (from the backend folder):
+    python benchmarks/bench_insert_rows.py [--rows 100 1000 10000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generate_letters as gl  # noqa: E402
+from bench_template_cache import make_template  # noqa: E402
+
+
+def legacy_insert_rows(doc, rows):
+    for t in doc.tables:
+        if "S.NO" in t.rows[0].cells[0].text.upper():
+            for r in rows:
+                cells = t.add_row().cells
+                for i in range(min(len(r), len(cells))):
+                    cells[i].text = str(r[i])
+            return True
+    return False
+
+
+def make_rows(n):
+    return [[i, "1", "ACC%08d" % i, "SBIN0001234", "UTR%010d" % i, "1000", "1000"] for i in range(1, n + 1)]
+
+
+def timed(fn, template, rows):
+    doc = gl.load_template(template)
+    start = time.perf_counter()
+    fn(doc, rows)
+    return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    args = ap.parse_args()
+
+    fd, template = tempfile.mkstemp(suffix=".docx")
+    os.close(fd)
+    make_template(template, paragraphs=5)
+    try:
+        print(f"{'rows':>7} {'add_row s':>10} {'bulk s':>8} {'speedup':>8}")
+        for n in args.rows:
+            rows = make_rows(n)
+            legacy = timed(legacy_insert_rows, template, rows)
+            bulk = timed(gl.insert_rows, template, rows)
+            print(f"{n:>7} {legacy:>10.3f} {bulk:>8.3f} {legacy / bulk:>7.1f}x")
+    finally:
+        os.remove(template)
+
+
+if __name__ == "__main__":
+    main()
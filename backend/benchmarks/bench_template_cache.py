@@ -0,0 +1,87 @@
+"""Letters-per-second benchmark for the parsed template cache.
+
+Renders N bank letters from a synthetic template, once re-parsing the DOCX for
+every bank (the old behaviour) and once cloning the cached template via
+``generate_letters.load_template``.
+
+Usage (from the backend folder):
+    python benchmarks/bench_template_cache.py [--banks 1 100] [--template PATH]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document  # noqa: E402
+
+import generate_letters as gl  # noqa: E402
+
+
+def make_template(path, paragraphs=40):
+    doc = Document()
+    doc.add_paragraph("To, The Nodal Officer, {{BANK_NAME}}")
+    doc.add_paragraph("Date: {{GETDATE}}    NCRP No: {{NCRPNO}}    CSR No: {{CSRNO}}")
+    for _ in range(paragraphs):
+        doc.add_paragraph("It is requested to freeze the below mentioned accounts " * 4)
+    doc.add_paragraph("{{Complaint Additional Info}}")
+    table = doc.add_table(rows=1, cols=7)
+    for i, h in enumerate(["S.NO", "LAYER", "SUSPECT/BENEFICIARY DETAILS", "SUSPECT/IFSC_CODE",
+                           "TXN_ID / UTR_NO", "DISPUTED AMOUNT", "TXN AMOUNT"]):
+        table.rows[0].cells[i].text = h
+    doc.sections[0].header.paragraphs[0].text = "Cyber Crime Police Station  CSR {{CSRNO}}"
+    doc.sections[0].footer.paragraphs[0].text = "NCRP {{NCRPNO}}"
+    doc.save(path)
+
+
+def render(doc, bank_no):
+    rows = [[i, "1", "ACC%08d" % i, "SBIN0001234", "UTR%010d" % i, "1000", "1000"] for i in range(1, 6)]
+    gl.insert_rows(doc, rows)
+    gl.strong_replace(doc, {
+        "{{NCRPNO}}": "31234567890123",
+        "{{CSRNO}}": "12/2026",
+        "{{BANK_NAME}}": "Bank %d" % bank_no,
+        "{{GETDATE}}": "01-01-2026",
+        "{{Complaint Additional Info}}": "Victim received a call from a fraudster.",
+    })
+    doc.save(io.BytesIO())
+
+
+def run(template, banks, loader):
+    start = time.perf_counter()
+    for n in range(banks):
+        render(loader(template), n)
+    elapsed = time.perf_counter() - start
+    return banks / elapsed if elapsed else float("inf")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--banks", type=int, nargs="+", default=[1, 100])
+    ap.add_argument("--template", help="existing DOCX template (default: synthetic)")
+    args = ap.parse_args()
+
+    template = args.template
+    if not template:
+        fd, template = tempfile.mkstemp(suffix=".docx")
+        os.close(fd)
+        make_template(template)
+
+    try:
+        print(f"{'banks':>6} {'reparse l/s':>12} {'cached l/s':>12} {'speedup':>8}")
+        for banks in args.banks:
+            gl._TEMPLATE_CACHE.clear()
+            reparse = run(template, banks, Document)
+            gl._TEMPLATE_CACHE.clear()
+            cached = run(template, banks, gl.load_template)
+            print(f"{banks:>6} {reparse:>12.1f} {cached:>12.1f} {cached / reparse:>7.2f}x")
+    finally:
+        if not args.template:
+            os.remove(template)
+
+
+if __name__ == "__main__":
+    main()
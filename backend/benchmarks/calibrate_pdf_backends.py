@@ -0,0 +1,100 @@
+"""Calibrate the PDF text backends on a local corpus of acknowledgement PDFs.
+
+For every installed backend (see pdf_backends.py) this measures extraction
+speed and two quality scores over the corpus:
+  fields  - share of NCRP fields ncrp_script.extract_fields finds
+  layout  - share of letter placeholders generate_letters finds, with the
+            "Complaint Additional Info" block counted twice
+The fastest backend with the best fields score becomes the 'fields' default;
+the best layout score (fastest on ties) becomes the 'layout' default.  The
+choice is written to pdf_backends.CALIBRATION_FILE and can still be
+overridden with NCRP_PDF_BACKEND_FIELDS / NCRP_PDF_BACKEND_LAYOUT.
+
+Usage (from the backend folder):
+    python benchmarks/calibrate_pdf_backends.py CORPUS_DIR [--dry-run]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_backends  # noqa: E402
+import ncrp_script  # noqa: E402
+import generate_letters  # noqa: E402
+
+INFO_KEY = '{{Complaint Additional Info}}'
+
+
+def score_backend(backend, pdfs):
+    seconds = 0.0
+    pages = 0
+    fields_score = 0.0
+    layout_score = 0.0
+    for path in pdfs:
+        start = time.perf_counter()
+        texts = backend.pages(path)
+        seconds += time.perf_counter() - start
+        pages += len(texts)
+
+        flat = ncrp_script.clean(" ".join(t for t in texts if t))
+        row = ncrp_script.extract_fields(flat, "PDF")
+        found = [k for k in ncrp_script.COLUMNS if k != "Source" and row.get(k) != "NOT FOUND"]
+        fields_score += len(found) / (len(ncrp_script.COLUMNS) - 1)
+
+        data = generate_letters.extract_pdf_placeholders("".join(t + "\n" for t in texts if t))
+        weights = {k: 2 if k == INFO_KEY else 1 for k in data}
+        hit = sum(w for k, w in weights.items() if data[k] != 'N/A')
+        layout_score += hit / sum(weights.values())
+    n = len(pdfs)
+    return {
+        'version': backend.version(),
+        'seconds': round(seconds, 4),
+        'pages_per_second': round(pages / seconds, 1) if seconds else None,
+        'fields_score': round(fields_score / n, 4),
+        'layout_score': round(layout_score / n, 4),
+    }
+
+
+def choose(results):
+    best_fields = max(r['fields_score'] for r in results.values())
+    fields = min((n for n, r in results.items() if r['fields_score'] == best_fields),
+                 key=lambda n: results[n]['seconds'])
+    layout = min(results, key=lambda n: (-results[n]['layout_score'], results[n]['seconds']))
+    return {'fields': fields, 'layout': layout}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("corpus", help="folder with sample acknowledgement PDFs")
+    ap.add_argument("--dry-run", action="store_true", help="print the choice without saving it")
+    args = ap.parse_args()
+
+    pdfs = sorted(glob.glob(os.path.join(args.corpus, "**", "*.pdf"), recursive=True))
+    if not pdfs:
+        sys.exit(f"no PDFs found under {args.corpus}")
+
+    results = {}
+    for name, backend in pdf_backends.BACKENDS.items():
+        if not backend.available():
+            print(f"{name:<11} not installed, skipped")
+            continue
+        results[name] = score_backend(backend, pdfs)
+
+    print(f"{'backend':<11} {'pages/s':>9} {'fields':>7} {'layout':>7}")
+    for name, r in results.items():
+        print(f"{name:<11} {r['pages_per_second'] or 0:>9} {r['fields_score']:>7.2%} {r['layout_score']:>7.2%}")
+
+    choice = choose(results)
+    print(f"fields -> {choice['fields']}, layout -> {choice['layout']} ({len(pdfs)} PDFs)")
+    if not args.dry_run:
+        with open(pdf_backends.CALIBRATION_FILE, 'w', encoding='utf-8') as fh:
+            json.dump(dict(choice, corpus_size=len(pdfs), results=results), fh, indent=1)
+        print(f"saved to {pdf_backends.CALIBRATION_FILE}")
+
+
+if __name__ == "__main__":
+    main()
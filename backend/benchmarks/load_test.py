@@ -0,0 +1,325 @@
+"""Concurrent-officer load test for a running backend.
+
+Each simulated officer loops over a weighted mix of what the frontend does:
+  upload     POST /api/upload with a synthetic acknowledgement PDF, then
+  verify     POST /api/verify (save) with the rows the upload returned
+  complaints GET /api/complaints (complaints page)
+  analytics  GET /api/complaints (the analytics page loads the same list)
+  mitigation POST /api/mitigation with a complaint's fields (LLM)
+  letters    POST /api/generate_letters with a synthetic transaction sheet
+and the run reports throughput, error rate and p50/p95/p99 latency per step.
+
+Point it at a backend you started yourself (use OLLAMA_URL to send LLM calls
+to benchmarks/ollama_stub.py, which --ollama-stub starts here), or let it
+start one: --spawn N runs gunicorn with N workers like the Dockerfile does,
+on a temporary NCRP_DATA_PATH and with Ollama replaced by the stub.
+
+Usage (from the backend folder):
+    python benchmarks/load_test.py --spawn 2 --officers 8 --duration 60
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --ollama-stub 11435 --officers 4
+    python benchmarks/load_test.py --spawn 2 --mix upload=1,complaints=5 --json result.json
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import ollama_stub  # noqa: E402
+import synthetic  # noqa: E402
+
+DEFAULT_MIX = "upload=3,complaints=4,analytics=1,mitigation=2,letters=1"
+# methods that are safe to resend after the connection dropped
+IDEMPOTENT = ("GET", "HEAD")
+
+
+class Client:
+    """One keep-alive connection per officer."""
+
+    def __init__(self, url, timeout):
+        parts = urllib.parse.urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        """Return ``(status, parsed JSON or None)``; raises on connection errors."""
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers or {})
+                resp = self.conn.getresponse()
+                data = resp.read()
+                break
+            except (http.client.HTTPException, OSError) as e:
+                self.conn.close()
+                self.conn = None
+                # the server closed an idle keep-alive connection: retry once on a new one,
+                # but never resend a POST the server may already have acted on
+                stale = isinstance(e, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+                if attempt == 2 or not stale or method not in IDEMPOTENT:
+                    raise
+        try:
+            return resp.status, json.loads(data) if data else None
+        except ValueError:
+            return resp.status, None
+
+    def post_json(self, path, obj):
+        return self.request("POST", path, json.dumps(obj), {"Content-Type": "application/json"})
+
+    def post_files(self, path, fields, files):
+        boundary = uuid.uuid4().hex
+        buf = io.BytesIO()
+        for name, value in fields.items():
+            buf.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        for name, (filename, content) in files.items():
+            buf.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                      f'Content-Type: application/octet-stream\r\n\r\n'.encode())
+            buf.write(content)
+            buf.write(b"\r\n")
+        buf.write(f"--{boundary}--\r\n".encode())
+        return self.request("POST", path, buf.getvalue(),
+                            {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+
+class Recorder:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, step, seconds, ok, error=None):
+        with self.lock:
+            entry = self.samples.setdefault(step, {"times": [], "errors": 0, "examples": []})
+            entry["times"].append(seconds)
+            if not ok:
+                entry["errors"] += 1
+                if error and len(entry["examples"]) < 3:
+                    entry["examples"].append(error)
+
+
+def timed(recorder, step, fn, ok=lambda status, body: status == 200):
+    start = time.perf_counter()
+    try:
+        status, body = fn()
+    except Exception as e:
+        recorder.add(step, time.perf_counter() - start, False, f"{type(e).__name__}: {e}")
+        return None, None
+    good = ok(status, body)
+    recorder.add(step, time.perf_counter() - start, good,
+                 None if good else f"HTTP {status}: {str(body)[:120]}")
+    return status, body
+
+
+class Officer(threading.Thread):
+
+    def __init__(self, n, args, mix, recorder, shared, deadline):
+        super().__init__(name=f"officer-{n}", daemon=True)
+        self.rng = random.Random(f"{args.seed}:{n}")
+        self.client = Client(args.url, args.timeout)
+        self.args = args
+        self.mix = mix
+        self.recorder = recorder
+        self.shared = shared
+        self.deadline = deadline
+        self.session = uuid.uuid4().hex
+
+    def upload(self):
+        path = os.path.join(self.shared["tmp"], f"{self.name}.pdf")
+        synthetic.ack_pdf(path, self.rng, txn_rows=self.rng.choice([0, 0, 20, 100]))
+        with open(path, "rb") as fh:
+            pdf = fh.read()
+        status, body = timed(self.recorder, "upload", lambda: self.client.post_files(
+            "/api/upload", {"session": self.session}, {"file": ("acknowledgement.pdf", pdf)}),
+            ok=lambda s, b: s == 200 and b and b.get("rows") and b["rows"][0].get("Source") != "ERROR")
+        if status != 200 or not body or not body.get("rows"):
+            return
+        rows = [r for r in body["rows"] if r.get("Source") != "ERROR"]
+        if not rows:
+            return
+        status, body = timed(self.recorder, "verify", lambda: self.client.post_json(
+            "/api/verify", {"action": "save", "rows": rows}),
+            ok=lambda s, b: s == 200 and b and b.get("saved_count", 0) + b.get("skipped_count", 0) == len(rows))
+        if status == 200:
+            with self.shared["lock"]:
+                self.shared["saved"].extend(r.get("Complaint ID") for r in rows if r.get("Complaint ID"))
+
+    def complaints(self, step="complaints"):
+        timed(self.recorder, step, lambda: self.client.request("GET", "/api/complaints"))
+
+    def analytics(self):
+        self.complaints("analytics")
+
+    def _saved_id(self):
+        with self.shared["lock"]:
+            return self.rng.choice(self.shared["saved"]) if self.shared["saved"] else None
+
+    def mitigation(self):
+        c = synthetic.complaint(self.rng)
+        timed(self.recorder, "mitigation", lambda: self.client.post_json("/api/mitigation", {
+            "Cybercrime Type": c["sub"], "Platform": c["platform"], "Total Amount Lost": c["amount"],
+            "State": c["state"], "District": c["district"]}))
+
+    def letters(self):
+        cid = self._saved_id()
+        if cid is None:
+            return self.upload()
+        timed(self.recorder, "letters", lambda: self.client.post_files(
+            "/api/generate_letters", {"complaint_id": cid},
+            {"file": ("transactions.xlsx", self.shared["txn_sheet"])}))
+
+    def run(self):
+        steps, weights = zip(*self.mix.items())
+        while time.time() < self.deadline:
+            getattr(self, self.rng.choices(steps, weights)[0])()
+            if self.args.think:
+                time.sleep(self.rng.expovariate(1 / self.args.think))
+
+
+def percentile(sorted_times, p):
+    if not sorted_times:
+        return None
+    k = max(0, min(len(sorted_times) - 1, int(round(p / 100 * len(sorted_times) + 0.5)) - 1))
+    return sorted_times[k]
+
+
+def report(recorder, elapsed):
+    rows = {}
+    total = errors = 0
+    print(f"\n{'step':<12} {'reqs':>6} {'req/s':>7} {'err%':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for step, entry in sorted(recorder.samples.items()):
+        times = sorted(entry["times"])
+        n = len(times)
+        total += n
+        errors += entry["errors"]
+        rows[step] = {
+            "requests": n, "errors": entry["errors"], "rps": n / elapsed,
+            "error_rate": entry["errors"] / n if n else 0.0,
+            "p50": percentile(times, 50), "p95": percentile(times, 95), "p99": percentile(times, 99),
+            "max": times[-1] if times else None, "error_examples": entry["examples"],
+        }
+        r = rows[step]
+        print(f"{step:<12} {n:>6} {r['rps']:>7.2f} {100 * r['error_rate']:>5.1f}% {1000 * r['p50']:>8.1f} "
+              f"{1000 * r['p95']:>8.1f} {1000 * r['p99']:>8.1f} {1000 * r['max']:>8.1f}")
+    print(f"{'total':<12} {total:>6} {total / elapsed:>7.2f} {100 * errors / total if total else 0:>5.1f}%")
+    for step, r in rows.items():
+        for example in r["error_examples"]:
+            print(f"  {step} error: {example}")
+    return rows
+
+
+def wait_ready(url, timeout=60):
+    client = Client(url, 5)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if client.request("GET", "/api/config")[0] == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def spawn_backend(workers, port, ollama_port, data_dir):
+    """Start gunicorn on the backend like the Dockerfile, with the Ollama stub
+    and a synthetic letter template and IFSC list."""
+    os.makedirs(data_dir, exist_ok=True)
+    template, ifsc = os.path.join(data_dir, "template.docx"), os.path.join(data_dir, "ifsc.csv")
+    synthetic.docx_template(template)
+    synthetic.ifsc_csv(ifsc)
+    env = dict(os.environ, NCRP_DATA_PATH=data_dir, OLLAMA_URL=f"http://127.0.0.1:{ollama_port}",
+               NCRP_LETTER_TEMPLATE=template, NCRP_IFSC_CSV=ifsc,
+               OLLAMA_CLI_FALLBACK="0", MITIGATION_PREGEN="0", METRICS_DIR=os.path.join(data_dir, "metrics"))
+    cmd = [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", "app:app", "--workers", str(workers),
+           "--timeout", "300"]
+    return subprocess.Popen(cmd, cwd=os.path.dirname(HERE), env=env)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("upload", "complaints", "analytics", "mitigation", "letters"):
+            raise SystemExit(f"unknown step in --mix: {name}")
+        mix[name] = float(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--url", default="http://127.0.0.1:5000", help="backend to load (ignored with --spawn)")
+    ap.add_argument("--spawn", type=int, metavar="WORKERS", help="start gunicorn with this many workers")
+    ap.add_argument("--port", type=int, default=5055, help="port for --spawn")
+    ap.add_argument("--ollama-stub", type=int, metavar="PORT", help="start the Ollama stub on PORT")
+    ap.add_argument("--llm-delay", type=float, default=0.01, help="stub seconds per streamed token")
+    ap.add_argument("--officers", type=int, default=4, help="concurrent simulated officers")
+    ap.add_argument("--duration", type=float, default=30, help="seconds to run")
+    ap.add_argument("--think", type=float, default=0.5, help="mean pause between an officer's steps (s)")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help=f"step weights (default {DEFAULT_MIX})")
+    ap.add_argument("--txn-rows", type=int, default=300, help="rows in the letters transaction sheet")
+    ap.add_argument("--timeout", type=float, default=300, help="per-request timeout (s)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", metavar="FILE", help="also write the results as JSON")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="ncrp_load_")
+    stub = backend = None
+    try:
+        if args.ollama_stub or args.spawn:
+            stub = ollama_stub.serve(args.ollama_stub or 0, token_delay=args.llm_delay)
+            print(f"Ollama stub on http://127.0.0.1:{stub.server_port}")
+        if args.spawn:
+            args.url = f"http://127.0.0.1:{args.port}"
+            backend = spawn_backend(args.spawn, args.port, stub.server_port, os.path.join(tmp, "data"))
+        if not wait_ready(args.url):
+            raise SystemExit(f"backend at {args.url} did not answer /api/config")
+
+        sheet = os.path.join(tmp, "transactions.xlsx")
+        synthetic.transaction_sheet(sheet, random.Random(args.seed), args.txn_rows)
+        with open(sheet, "rb") as fh:
+            shared = {"lock": threading.Lock(), "saved": [], "tmp": tmp, "txn_sheet": fh.read()}
+
+        mix = parse_mix(args.mix)
+        print(f"{args.officers} officer(s) for {args.duration:.0f}s against {args.url}, mix {mix}")
+        recorder = Recorder()
+        start = time.time()
+        officers = [Officer(n, args, mix, recorder, shared, start + args.duration) for n in range(args.officers)]
+        for o in officers:
+            o.start()
+        for o in officers:
+            o.join()
+        elapsed = time.time() - start
+        rows = report(recorder, elapsed)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as fh:
+                json.dump({"url": args.url, "workers": args.spawn, "officers": args.officers,
+                           "duration_s": elapsed, "mix": mix, "steps": rows}, fh, indent=2)
+    finally:
+        if backend is not None:
+            backend.terminate()
+            try:
+                backend.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                backend.kill()
+        if stub is not None:
+            stub.shutdown()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Local stand-in for the Ollama HTTP API (POST /api/generate only).
+
+Streams a canned mitigation answer as NDJSON token chunks, or returns it in
+one JSON object when ``"stream": false``.  Point the backend at it with
+OLLAMA_URL=http://127.0.0.1:11435 to exercise llm_client, the SSE endpoint
+or load tests without a model.
+
+Usage (from the backend folder):
+    python benchmarks/ollama_stub.py [--port 11435] [--token-delay 0.02] [--load-delay 0]
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = (
+    "- Risk: funds moved through UPI mule accounts are withdrawn within hours.\n"
+    "- Ask the victim's bank to raise a chargeback and freeze beneficiary accounts.\n"
+    "- Report the UPI IDs and phone numbers on the NCRP portal.\n"
+    "- Advise the victim never to share OTPs or approve collect requests.\n"
+)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    token_delay = 0.0
+    load_delay = 0.0
+    calls = 0
+    lock = threading.Lock()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        req = json.loads(self.rfile.read(length) or b"{}")
+        with StubHandler.lock:
+            StubHandler.calls += 1
+        if not req.get("prompt"):
+            # warm-up request: load the model only
+            self._send_json(200, {"model": req.get("model"), "response": "", "done": True})
+            return
+        time.sleep(self.load_delay)
+        tokens = [w + " " for w in ANSWER.split(" ")]
+        if req.get("stream") is False:
+            self._send_json(200, {"model": req.get("model"), "response": "".join(tokens), "done": True})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for tok in tokens + [None]:
+            obj = {"model": req.get("model"), "response": tok or "", "done": tok is None}
+            line = (json.dumps(obj) + "\n").encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+            if tok is not None:
+                time.sleep(self.token_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def serve(port=11435, token_delay=0.0, load_delay=0.0):
+    """Start the stub in a background thread and return the server."""
+    StubHandler.token_delay = token_delay
+    StubHandler.load_delay = load_delay
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--port", type=int, default=11435)
+    ap.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed tokens")
+    ap.add_argument("--load-delay", type=float, default=0.0, help="seconds before the first token")
+    args = ap.parse_args()
+    server = serve(args.port, args.token_delay, args.load_delay)
+    print(f"Ollama stub listening on http://127.0.0.1:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
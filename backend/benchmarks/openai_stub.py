@@ -0,0 +1,103 @@
+"""Local fake of the OpenAI chat completions API (POST /v1/chat/completions).
+
+Answers every request with a fixed NCRP JSON object and a ``usage`` block so
+ai_batch can be exercised without network access or an API key.  Use with
+OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub, or pass
+``AsyncOpenAI(base_url=..., api_key="stub")`` to ai_batch.BatchAIParser.
+
+Usage (from the backend folder):
+    python benchmarks/openai_stub.py [--port 8001] [--latency 0.2] [--fail-every 0]
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROW = {
+    "Source": "PDF",
+    "Complaint ID": "31234567890123",
+    "Complaint Date": "01/01/2026",
+    "Incident Date & Time": "31/12/2025 10:00:00 AM",
+    "Mobile": "9876543210",
+    "Email": "victim@example.com",
+    "Full Address": "1 Main Street, Chennai",
+    "District": "Chennai",
+    "State": "Tamil Nadu",
+    "Cybercrime Type": "Online Financial Fraud - UPI Related Frauds",
+    "Platform": "UPI",
+    "Total Amount Lost": "15000",
+    "Current Status": "Registered",
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    fail_every = 0
+    calls = 0
+    lock = threading.Lock()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        req = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        with StubHandler.lock:
+            StubHandler.calls += 1
+            n = StubHandler.calls
+        time.sleep(self.latency)
+        if self.fail_every and n % self.fail_every == 0:
+            self._send_json(429, {"error": {"message": "rate limited", "type": "rate_limit"}})
+            return
+        prompt = "".join(m.get("content", "") for m in req.get("messages", []))
+        content = json.dumps(ROW)
+        self._send_json(200, {
+            "id": f"chatcmpl-stub-{n}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        })
+
+
+def serve(port=8001, latency=0.0, fail_every=0):
+    """Start the stub in a background thread and return the server."""
+    StubHandler.latency = latency
+    StubHandler.fail_every = fail_every
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--port", type=int, default=8001)
+    ap.add_argument("--latency", type=float, default=0.2, help="seconds per completion")
+    ap.add_argument("--fail-every", type=int, default=0, help="answer every Nth call with HTTP 429")
+    args = ap.parse_args()
+    server = serve(args.port, args.latency, args.fail_every)
+    print(f"OpenAI stub listening on http://127.0.0.1:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Synthetic NCRP documents for benchmarks, generated offline.
+
+Produces acknowledgement PDFs (text PDFs laid out like the NCRP portal's
+acknowledgement, with a transaction list to make them longer), chat
+screenshot PNGs, NCRP Excel exports, layered transaction sheets, an IFSC
+reference CSV and a DOCX letter template.  Output is deterministic for a
+given seed, so benchmark runs on different machines parse identical inputs.
+
+Usage (from the backend folder):
+    python benchmarks/synthetic.py OUT_DIR [--complaints 20] [--txn-rows 500] [--seed 1]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_template_cache import make_template  # noqa: E402
+
+BANKS = [
+    ("SBIN", "STATE BANK OF INDIA"), ("HDFC", "HDFC BANK"), ("ICIC", "ICICI BANK"),
+    ("UTIB", "AXIS BANK"), ("PUNB", "PUNJAB NATIONAL BANK"), ("BARB", "BANK OF BARODA"),
+    ("CNRB", "CANARA BANK"), ("UBIN", "UNION BANK OF INDIA"), ("KKBK", "KOTAK MAHINDRA BANK"),
+    ("IDIB", "INDIAN BANK"), ("YESB", "YES BANK"), ("IDFB", "IDFC FIRST BANK"),
+]
+NAMES = ["Ravi Kumar", "Priya Sharma", "Mohammed Irfan", "Lakshmi Devi", "Arjun Reddy", "Sunita Patil",
+         "Karthik Rao", "Anjali Singh", "Vikram Joshi", "Fatima Begum"]
+PLACES = [("Bengaluru Urban", "Karnataka"), ("Pune", "Maharashtra"), ("Lucknow", "Uttar Pradesh"),
+          ("Chennai", "Tamil Nadu"), ("Jaipur", "Rajasthan"), ("Patna", "Bihar"), ("Hyderabad", "Telangana")]
+CRIMES = [("Online Financial Fraud", "UPI Related Frauds"), ("Online Financial Fraud", "Internet Banking Related Fraud"),
+          ("Online Financial Fraud", "Debit/Credit Card Fraud"), ("Online Financial Fraud", "Fraud Call/Vishing")]
+PLATFORMS = ["WhatsApp", "Telegram", "Instagram", "Phone Call", "SMS", "Facebook"]
+STORIES = [
+    "victim received a call from a person claiming to be a bank official and shared the OTP",
+    "victim was added to a telegram task group promising returns on investment and paid several times",
+    "victim clicked a link received by SMS to update KYC and money was debited from the account",
+    "victim was asked to pay a registration fee for a part time job offered on WhatsApp",
+]
+
+
+def complaint(rng):
+    """One complaint's fields (the values an acknowledgement carries)."""
+    name = rng.choice(NAMES)
+    district, state = rng.choice(PLACES)
+    category, sub = rng.choice(CRIMES)
+    day, month = rng.randint(1, 28), rng.randint(1, 12)
+    return {
+        "ack": "3%013d" % rng.randrange(10 ** 13),
+        "csr": "%d/2026" % rng.randint(1, 999),
+        "name": name,
+        "mobile": "9%09d" % rng.randrange(10 ** 9),
+        "email": name.lower().replace(" ", ".") + "@example.com",
+        "district": district,
+        "state": state,
+        "category": category,
+        "sub": sub,
+        "platform": rng.choice(PLATFORMS),
+        "complaint_date": "%02d/%02d/2026" % (day, month),
+        "incident": "%02d/%02d/2026 %02d:%02d:%02d PM" % (max(day - 1, 1), month, rng.randint(1, 11),
+                                                         rng.randint(0, 59), rng.randint(0, 59)),
+        "amount": "%d,%03d.00" % (rng.randint(1, 499), rng.randint(0, 999)),
+        "story": rng.choice(STORIES),
+        "account": "%012d" % rng.randrange(10 ** 12),
+        "bank": rng.choice(BANKS)[1].title(),
+        "house": str(rng.randint(1, 400)),
+        "street": rng.choice(["MG Road", "Station Road", "Gandhi Nagar", "Temple Street"]).replace(" ", ""),
+        "town": rng.choice(["Ramnagar", "Shivpur", "Kothrud", "Alambagh"]),
+        "pincode": "%06d" % rng.randint(110001, 855999),
+    }
+
+
+def transactions(rng, rows, banks=None):
+    """Layered transaction rows: (layer, account, ifsc, utr, amount, disputed)."""
+    codes = [b[0] for b in BANKS[:banks or len(BANKS)]]
+    out = []
+    for i in range(rows):
+        amount = "%d.%02d" % (rng.randint(100, 99999), rng.randint(0, 99))
+        out.append((str(min(1 + i // max(rows // 4, 1), 4)), "%014d" % rng.randrange(10 ** 14),
+                    "%s0%06d" % (rng.choice(codes), rng.randrange(10 ** 6)), "UTR%012d" % rng.randrange(10 ** 12),
+                    amount, amount if rng.random() < 0.7 else "0"))
+    return out
+
+
+def ack_lines(c, txns=()):
+    lines = [
+        "National Cyber Crime Reporting Portal",
+        "Acknowledgement No : %s" % c["ack"],
+        "Acknowledgement Number : %s" % c["ack"],
+        "CSR No: %s" % c["csr"],
+        "Complaint Date : %s" % c["complaint_date"],
+        "Incident Date/Time : %s" % c["incident"],
+        "Category of complaint %s Sub Category of Complaint %s" % (c["category"], c["sub"]),
+        "Complainant Name: %s" % c["name"],
+        "Mobile : %s" % c["mobile"],
+        "Email : %s" % c["email"],
+        "House No : %s Street Name : %s Village/Town : %s" % (c["house"], c["street"], c["town"]),
+        "District : %s" % c["district"],
+        "State : %s" % c["state"],
+        "Pincode : %s" % c["pincode"],
+        "Platform : %s" % c["platform"],
+        "Complainant Account No %s %s" % (c["account"], c["bank"]),
+        "Complaint Additional Info %s" % c["story"],
+        "Total Fraudulent Amount reported by complainant : %s" % c["amount"],
+    ]
+    if txns:
+        lines.append("Transaction Details")
+        lines.append("S No. Layer Account No. IFSC Code Transaction Id / UTR Number Amount")
+        lines.extend("%d %s %s %s %s %s" % ((i + 1,) + t[:5]) for i, t in enumerate(txns))
+    return lines
+
+
+def write_pdf(path, lines, lines_per_page=55):
+    """Write ``lines`` as a plain text PDF (Helvetica, A4) with no dependencies."""
+    def esc(s):
+        return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    font_id = 3 + 2 * len(pages)
+    objs = ["<< /Type /Catalog /Pages 2 0 R >>",
+            "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join("%d 0 R" % (3 + 2 * i) for i in range(len(pages))),
+                                                        len(pages))]
+    for i, page in enumerate(pages):
+        content = "BT /F1 10 Tf 40 800 Td 14 TL " + " ".join("(%s) '" % esc(l) for l in page) + " ET"
+        objs.append("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+                    "/Resources << /Font << /F1 %d 0 R >> >> >>" % (4 + 2 * i, font_id))
+        objs.append("<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+    objs.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += ("%d 0 obj\n%s\nendobj\n" % (i, obj)).encode("latin-1")
+    xref = len(out)
+    out += ("xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)).encode()
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += ("trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)).encode()
+    with open(path, "wb") as fh:
+        fh.write(out)
+
+
+def ack_pdf(path, rng, txn_rows=0):
+    """Acknowledgement PDF for a random complaint; returns the complaint."""
+    c = complaint(rng)
+    write_pdf(path, ack_lines(c, transactions(rng, txn_rows)))
+    return c
+
+
+def screenshot(path, rng, messages=12, width=1080):
+    """Phone chat screenshot (PNG) with the complaint details in the bubbles."""
+    from PIL import Image, ImageDraw, ImageFont
+    c = complaint(rng)
+    font = ImageFont.load_default(size=34)
+    texts = ["Acknowledgement Number : %s" % c["ack"], "Complaint Date : %s" % c["complaint_date"],
+             "Mobile : %s" % c["mobile"], "Amount debited Rs %s" % c["amount"]]
+    while len(texts) < messages:
+        t = transactions(rng, 1)[0]
+        texts.append(rng.choice(["Sent Rs %s to %s" % (t[4], t[1]), "UTR %s" % t[3], "Please share the OTP",
+                                 "Pay the fee to %s" % t[2]]))
+    height = 200 + 110 * messages
+    img = Image.new("RGB", (width, height), (236, 229, 221))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, width, 140), fill=(7, 94, 84))
+    draw.text((40, 50), c["name"], font=font, fill="white")
+    y = 180
+    for i, text in enumerate(texts):
+        mine = i % 2 == 1
+        x0 = width - 860 if mine else 30
+        draw.rounded_rectangle((x0, y, x0 + 830, y + 80), 18, fill=(220, 248, 198) if mine else "white")
+        draw.text((x0 + 24, y + 20), text, font=font, fill="black")
+        y += 110
+    img.save(path, "PNG")
+    return c
+
+
+NCRP_EXPORT_HEADERS = ["S No.", "Complaint ID", "Complaint Date", "Incident Date & Time", "Mobile Number", "Email ID",
+                       "Full Address", "District & State", "Cybercrime Type", "Platform Involved", "Total Amount Loss",
+                       "Current Status"]
+
+
+def ncrp_export(path, rng, rows):
+    """NCRP portal complaint export (.xlsx) with ``rows`` complaints."""
+    import pandas as pd
+    data = []
+    for i in range(rows):
+        c = complaint(rng)
+        data.append([i + 1, c["ack"], c["complaint_date"], c["incident"], c["mobile"], c["email"],
+                     "%s %s %s" % (c["house"], c["street"], c["town"]), "%s, %s" % (c["district"], c["state"]),
+                     c["sub"], c["platform"], c["amount"], rng.choice(["Registered", "Under Process", "Closed"])])
+    pd.DataFrame(data, columns=NCRP_EXPORT_HEADERS).to_excel(path, index=False)
+
+
+TXN_HEADERS = ["S No.", "Acknowledgement No.", "Transaction Date", "Bank/ (Wallet /PG/PA)/ Merchant / Insurance",
+               "Action Taken", "Layer", "Account No./ (Wallet /PG/PA) Id", "IFSC Code", "Transaction Id / UTR Number",
+               "Transaction Amount", "Disputed Amount"]
+
+
+def transaction_sheet(path, rng, rows, banks=None):
+    """Layered transaction sheet in the portal's column layout (.xlsx or .csv)."""
+    import pandas as pd
+    ack = "3%013d" % rng.randrange(10 ** 13)
+    data = [[i + 1, ack, "01/01/2026", t[2][:4], "Money Transfer to", t[0], t[1], t[2], t[3], t[4], t[5]]
+            for i, t in enumerate(transactions(rng, rows, banks))]
+    df = pd.DataFrame(data, columns=TXN_HEADERS)
+    if path.lower().endswith(".csv"):
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+
+
+def ifsc_csv(path):
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("IFSC,BANK\n")
+        for code, bank in BANKS:
+            fh.write("%s0000001,%s\n" % (code, bank))
+
+
+def docx_template(path):
+    make_template(path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("out_dir")
+    ap.add_argument("--complaints", type=int, default=20, help="acknowledgement PDFs and screenshots to write")
+    ap.add_argument("--txn-rows", type=int, default=500, help="rows in the transaction sheet")
+    ap.add_argument("--export-rows", type=int, default=200, help="rows in the NCRP Excel export")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    os.makedirs(args.out_dir, exist_ok=True)
+    for i in range(args.complaints):
+        ack_pdf(os.path.join(args.out_dir, "ack_%03d.pdf" % i), rng, txn_rows=rng.choice([0, 0, 20, 100]))
+        screenshot(os.path.join(args.out_dir, "screenshot_%03d.png" % i), rng)
+    ncrp_export(os.path.join(args.out_dir, "ncrp_export.xlsx"), rng, args.export_rows)
+    transaction_sheet(os.path.join(args.out_dir, "transactions.xlsx"), rng, args.txn_rows)
+    ifsc_csv(os.path.join(args.out_dir, "ifsc.csv"))
+    docx_template(os.path.join(args.out_dir, "template.docx"))
+    print(f"✔ wrote {args.complaints} PDFs, {args.complaints} screenshots, an export, "
+          f"a transaction sheet, ifsc.csv and template.docx to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
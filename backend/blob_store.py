@@ -0,0 +1,404 @@
+import os
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+
+# Content-addressed storage for uploaded complaint files.  File bytes live
+# once per SHA-256 under hash-sharded folders:
+#   <root>/<ab>/<cd>/<sha256><ext>
+# and the names the app hands out (pending_file, saved_filename) are rows in
+# the stored_files table mapping (area, name) -> blob.  Identical uploads
+# share one blob, approving a pending file is a row update instead of a file
+# move, and picking a free name is an indexed query instead of probing the
+# folder with os.path.exists.  A blob is deleted when its last name goes.
+# Rows can be leased (lease_until) to keep evict() away from files that a
+# request is about to move, e.g. pending files during /api/verify.
+# When a blob is re-encoded to save space (see upload_compress.py) its rows
+# point at the new bytes and keep the hash and size of what was uploaded in
+# original_sha256 / original_size.
+
+FILES_TABLE = 'stored_files'
+PENDING = 'pending'
+UPLOADS = 'uploads'
+CHUNK_SIZE = 1 << 20
+
+
+class BlobStore:
+
+    def __init__(self, root, db_path):
+        self.root = root
+        self.db_path = db_path
+        self._tmp_dir = os.path.join(root, 'tmp')
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        if not self._initialized:
+            with self._init_lock:
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {FILES_TABLE} (
+                        area TEXT,
+                        name TEXT,
+                        sha256 TEXT,
+                        ext TEXT,
+                        size INTEGER,
+                        original_name TEXT,
+                        created_at REAL,
+                        session TEXT,
+                        lease_until REAL,
+                        original_sha256 TEXT,
+                        original_size INTEGER,
+                        optimized_at REAL,
+                        PRIMARY KEY (area, name)
+                    )
+                """)
+                cols = {r[1] for r in conn.execute(f"PRAGMA table_info({FILES_TABLE})")}
+                for col, typ in (('session', 'TEXT'), ('lease_until', 'REAL'), ('original_sha256', 'TEXT'),
+                                 ('original_size', 'INTEGER'), ('optimized_at', 'REAL')):
+                    if col not in cols:
+                        conn.execute(f"ALTER TABLE {FILES_TABLE} ADD COLUMN {col} {typ}")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{FILES_TABLE}_sha ON {FILES_TABLE}(sha256)")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{FILES_TABLE}_age ON {FILES_TABLE}(area, created_at)")
+                os.makedirs(self._tmp_dir, exist_ok=True)
+                self._initialized = True
+        return conn
+
+    def blob_path(self, sha, ext=''):
+        return os.path.join(self.root, sha[:2], sha[2:4], sha + (ext or '').lower())
+
+    # ---------------- writing ----------------
+    def _spool(self, stream, hashed=True):
+        """Copy ``stream`` to a temp file while hashing; returns (tmp_path, sha, size)."""
+        h = hashlib.sha256() if hashed else None
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self._tmp_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    if h is not None:
+                        h.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return tmp, h.hexdigest() if h is not None else None, size
+
+    @staticmethod
+    def _free_name(conn, area, name):
+        """``name`` or the first ``base_N.ext`` not yet used in ``area``."""
+        base, ext = os.path.splitext(name)
+        # one indexed range scan instead of a probe per candidate
+        taken = {r[0] for r in conn.execute(
+            f"SELECT name FROM {FILES_TABLE} WHERE area = ? AND name >= ? AND name < ?",
+            (area, base, base + '\uffff'))}
+        candidate, counter = name, 1
+        while candidate in taken:
+            candidate = f"{base}_{counter}{ext}"
+            counter += 1
+        return candidate
+
+    def store(self, stream, area, name, original_name=None, sha256=None, size=None, session=None, lease=0):
+        """Store the bytes of ``stream`` under a free variant of ``name``.
+
+        When the caller already knows ``sha256`` and ``size`` (hashed while
+        receiving) and the blob exists, ``stream`` is not read at all.
+        ``lease`` seconds protect the new row from evict().
+        Returns ``(name, sha256, size)`` with the name actually used."""
+        ext = os.path.splitext(name)[1].lower()
+        conn = self._connect()
+        if sha256 and size is not None and os.path.exists(self.blob_path(sha256, ext)):
+            tmp, sha = None, sha256
+        else:
+            tmp, sha, spooled = self._spool(stream, hashed=not sha256)
+            sha, size = sha or sha256, spooled
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                final = self._free_name(conn, area, name)
+                conn.execute(
+                    f"INSERT INTO {FILES_TABLE} (area, name, sha256, ext, size, original_name, created_at, session, lease_until) "
+                    f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (area, final, sha, ext, size, original_name or name, time.time(), session,
+                     time.time() + lease if lease else None))
+                # materialise the blob inside the transaction so a concurrent
+                # remove() of the same content cannot delete it under us
+                path = self.blob_path(sha, ext)
+                if tmp is None:
+                    if not os.path.exists(path):
+                        # removed since the check above; write it after all
+                        tmp = self._spool(stream, hashed=False)[0]
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        os.replace(tmp, path)
+                elif os.path.exists(path):
+                    os.unlink(tmp)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp, path)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+            if tmp and os.path.exists(tmp):
+                os.unlink(tmp)
+        return final, sha, size
+
+    # ---------------- reading ----------------
+    def lookup(self, area, name):
+        conn = self._connect()
+        try:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(f"SELECT * FROM {FILES_TABLE} WHERE area = ? AND name = ?", (area, name)).fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def path_for(self, area, name):
+        """Blob path for a stored name, or None if the name is unknown."""
+        row = self.lookup(area, name)
+        if row is None:
+            return None
+        path = self.blob_path(row['sha256'], row['ext'])
+        return path if os.path.exists(path) else None
+
+    def lookup_many(self, area, names):
+        """``{name: row}`` for the stored ``names`` in ``area`` (unknown names are left out)."""
+        names = [n for n in set(names) if n]
+        out = {}
+        conn = self._connect()
+        try:
+            conn.row_factory = sqlite3.Row
+            for i in range(0, len(names), 500):
+                chunk = names[i:i + 500]
+                marks = ', '.join('?' for _ in chunk)
+                for row in conn.execute(
+                        f"SELECT * FROM {FILES_TABLE} WHERE area = ? AND name IN ({marks})", [area] + chunk):
+                    out[row['name']] = dict(row)
+            return out
+        finally:
+            conn.close()
+
+    def blob_for(self, sha):
+        """``(path, ext)`` of a stored blob by hash, or ``(None, None)``."""
+        conn = self._connect()
+        try:
+            row = conn.execute(f"SELECT ext FROM {FILES_TABLE} WHERE sha256 = ? LIMIT 1", (sha,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None, None
+        path = self.blob_path(sha, row[0])
+        return (path, row[0]) if os.path.exists(path) else (None, None)
+
+    def unoptimized(self, area, exts, limit=None):
+        """Distinct ``(sha256, ext)`` blobs in ``area`` with one of ``exts`` not yet optimized."""
+        marks = ', '.join('?' for _ in exts)
+        conn = self._connect()
+        try:
+            return conn.execute(
+                f"SELECT DISTINCT sha256, ext FROM {FILES_TABLE} WHERE area = ? AND optimized_at IS NULL "
+                f"AND ext IN ({marks}) LIMIT ?", [area] + list(exts) + [limit or -1]).fetchall()
+        finally:
+            conn.close()
+
+    # ---------------- moving / deleting ----------------
+    def move(self, area, name, new_area, new_name):
+        """Rename a stored file (e.g. pending -> uploads); returns the name used, or None."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(f"SELECT 1 FROM {FILES_TABLE} WHERE area = ? AND name = ?", (area, name)).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return None
+                final = self._free_name(conn, new_area, new_name)
+                conn.execute(f"UPDATE {FILES_TABLE} SET area = ?, name = ?, lease_until = NULL WHERE area = ? AND name = ?",
+                             (new_area, final, area, name))
+                conn.execute("COMMIT")
+                return final
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def _delete_names(self, conn, area, names):
+        """Delete rows (inside the caller's transaction) and unreferenced blobs."""
+        blobs = set()
+        for name in names:
+            row = conn.execute(f"SELECT sha256, ext FROM {FILES_TABLE} WHERE area = ? AND name = ?",
+                               (area, name)).fetchone()
+            if row is None:
+                continue
+            conn.execute(f"DELETE FROM {FILES_TABLE} WHERE area = ? AND name = ?", (area, name))
+            blobs.add(row)
+        for sha, ext in blobs:
+            refs = conn.execute(f"SELECT 1 FROM {FILES_TABLE} WHERE sha256 = ? AND ext = ? LIMIT 1",
+                                (sha, ext)).fetchone()
+            if refs is None:
+                try:
+                    os.unlink(self.blob_path(sha, ext))
+                except FileNotFoundError:
+                    pass
+
+    def remove(self, area, name):
+        """Forget a stored name; the blob goes with its last name.  Returns True if it existed."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(f"SELECT 1 FROM {FILES_TABLE} WHERE area = ? AND name = ?",
+                                   (area, name)).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return False
+                self._delete_names(conn, area, [name])
+                conn.execute("COMMIT")
+                return True
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def replace_blob(self, area, sha, ext, data=None):
+        """Point ``area``'s names for blob ``sha`` at the re-encoded bytes ``data``.
+
+        The first hash and size are kept in original_sha256/original_size and
+        the rows are marked optimized; with ``data=None`` they are only marked.
+        The old blob is deleted once no name uses it.  Returns the number of
+        names updated."""
+        new_sha = hashlib.sha256(data).hexdigest() if data is not None else sha
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if data is None:
+                    cur = conn.execute(
+                        f"UPDATE {FILES_TABLE} SET optimized_at = ? WHERE area = ? AND sha256 = ? AND ext = ?",
+                        (time.time(), area, sha, ext))
+                else:
+                    # SET expressions read the old values, so the originals are kept
+                    # from the first re-encode only
+                    cur = conn.execute(
+                        f"UPDATE {FILES_TABLE} SET sha256 = ?, size = ?, "
+                        f"original_sha256 = COALESCE(original_sha256, sha256), "
+                        f"original_size = COALESCE(original_size, size), optimized_at = ? "
+                        f"WHERE area = ? AND sha256 = ? AND ext = ?",
+                        (new_sha, len(data), time.time(), area, sha, ext))
+                updated = cur.rowcount
+                if data is not None and updated:
+                    path = self.blob_path(new_sha, ext)
+                    if not os.path.exists(path):
+                        fd, tmp = tempfile.mkstemp(dir=self._tmp_dir, suffix='.part')
+                        with os.fdopen(fd, 'wb') as out:
+                            out.write(data)
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        os.replace(tmp, path)
+                    refs = conn.execute(f"SELECT 1 FROM {FILES_TABLE} WHERE sha256 = ? AND ext = ? LIMIT 1",
+                                        (sha, ext)).fetchone()
+                    if refs is None and new_sha != sha:
+                        try:
+                            os.unlink(self.blob_path(sha, ext))
+                        except FileNotFoundError:
+                            pass
+                conn.execute("COMMIT")
+                return updated
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def lease(self, area, names, seconds):
+        """Protect ``names`` from evict() for ``seconds``."""
+        names = [n for n in names if n]
+        if not names:
+            return
+        conn = self._connect()
+        try:
+            conn.executemany(f"UPDATE {FILES_TABLE} SET lease_until = ? WHERE area = ? AND name = ?",
+                             [(time.time() + seconds, area, n) for n in names])
+        finally:
+            conn.close()
+
+    def evict(self, area, created_before=None, max_bytes=None):
+        """Delete unleased files older than ``created_before``, then the oldest
+        ones until the area holds at most ``max_bytes``.
+
+        Returns a list of ``(name, size, reason)`` with reason 'ttl' or 'quota'."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    f"SELECT name, size, created_at, lease_until FROM {FILES_TABLE} WHERE area = ? ORDER BY created_at",
+                    (area,)).fetchall()
+                total = sum(r[1] or 0 for r in rows)
+                evicted = []
+                for name, size, created_at, lease_until in rows:
+                    if lease_until and lease_until > now:
+                        continue
+                    if created_before is not None and (created_at or 0) < created_before:
+                        reason = 'ttl'
+                    elif max_bytes is not None and total > max_bytes:
+                        reason = 'quota'
+                    else:
+                        continue
+                    evicted.append((name, size or 0, reason))
+                    total -= size or 0
+                self._delete_names(conn, area, [e[0] for e in evicted])
+                conn.execute("COMMIT")
+                return evicted
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def area_summary(self, area):
+        """Count, size, age, sessions and leases of the files in ``area``."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            files, size, oldest, sessions, leased = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(created_at), COUNT(DISTINCT session), "
+                f"COALESCE(SUM(lease_until > ?), 0) FROM {FILES_TABLE} WHERE area = ?", (now, area)).fetchone()
+        finally:
+            conn.close()
+        return {'files': files, 'bytes': size, 'sessions': sessions, 'leased': leased,
+                'oldest_age_s': round(now - oldest) if oldest else None}
+
+    def optimized_summary(self, area):
+        """Blobs in ``area`` that were re-encoded, with their original and current bytes."""
+        conn = self._connect()
+        try:
+            blobs, original, current = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(original_size), 0), COALESCE(SUM(size), 0) FROM "
+                f"(SELECT DISTINCT sha256, ext, original_size, size FROM {FILES_TABLE} "
+                f"WHERE area = ? AND original_sha256 IS NOT NULL)", (area,)).fetchone()
+        finally:
+            conn.close()
+        return {'blobs': blobs, 'original_bytes': original, 'bytes': current, 'saved_bytes': original - current}
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            out = {}
+            for area, names, size in conn.execute(
+                    f"SELECT area, COUNT(*), COALESCE(SUM(size), 0) FROM {FILES_TABLE} GROUP BY area"):
+                out[area] = {'files': names, 'bytes': size}
+            blobs, blob_bytes = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM "
+                f"(SELECT sha256, ext, MAX(size) AS size FROM {FILES_TABLE} GROUP BY sha256, ext)").fetchone()
+            out['blobs'] = {'files': blobs, 'bytes': blob_bytes}
+            return out
+        finally:
+            conn.close()
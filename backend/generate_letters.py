@@ -1,7 +1,19 @@
 import os
 import re
+import copy
+import hashlib
+import json
+import queue
+import contextlib
+import itertools
+import threading
+import weakref
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, CancelledError, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+import time
 import pandas as pd
-import pdfplumber
+import metrics
 from docx import Document
 from docx.enum.section import WD_ORIENT
 from collections import Counter
@@ -9,13 +21,19 @@ import string
 from datetime import datetime
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.shared import Pt
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.text.paragraph import Paragraph
+
+import pdf_backends
 
 # legacy defaults (can remain unset when imported from other code)
 PDF_PATH = None
 EXCEL_PATH = None
 
-TEMPLATE_PATH = r"C:\NCRP\Sample_Updated.docx"
-IFSC_CSV_PATH = r"C:\NCRP\IFSC_CODES_FOR_ANALYSIS.csv"
+TEMPLATE_PATH = os.environ.get('NCRP_LETTER_TEMPLATE', r"C:\NCRP\Sample_Updated.docx")
+IFSC_CSV_PATH = os.environ.get('NCRP_IFSC_CSV', r"C:\NCRP\IFSC_CODES_FOR_ANALYSIS.csv")
 OUTPUT_DIR = r"C:\NCRP\OUT2"
 
 # The module provides a legacy script that reads a PDF and an excel file to
@@ -36,15 +54,21 @@ def load_ifsc_csv(path):
         bank = str(r[bank_col]).strip().upper()
         IFSC_DICT[prefix] = bank
 
-def extract_pdf_text():
+def pdf_text(pdf_path):
+    """Return the text of ``pdf_path`` using the 'layout' PDF backend.
+
+    Page text already in the shared text store from that backend (an earlier
+    letter run, or upload extraction when the calibration rates its backend as
+    equivalent) is reused; see pdf_backends.page_texts."""
     text = ''
-    with pdfplumber.open(PDF_PATH) as pdf:
-        for page in pdf.pages:
-            t = page.extract_text()
-            if t:
-                text += t + '\n'
+    for t in pdf_backends.page_texts(pdf_path, 'layout'):
+        if t:
+            text += t + '\n'
     return text
 
+def extract_pdf_text():
+    return pdf_text(PDF_PATH)
+
 def extract_pdf_placeholders(text):
     data = {}
 
@@ -84,15 +108,37 @@ def get_full_bank_name(ifsc_code):
     bank = IFSC_DICT.get(prefix)
     return bank.title() if bank else (prefix + " BANK").title()
 
+def _iter_paragraphs(doc):
+    """Yield every paragraph of the body, tables, headers and footers once.
+
+    Walks the XML directly instead of python-docx's ``paragraphs``/``tables``/
+    ``sections`` accessors, which revisit merged cells and linked headers and
+    create header parts on documents that have none."""
+    for p in list(doc.element.body.iter(qn('w:p'))):
+        yield p, doc._body
+    for rel in doc.part.rels.values():
+        if rel.is_external or rel.reltype not in (RT.HEADER, RT.FOOTER):
+            continue
+        part = rel.target_part
+        for p in list(part.element.iter(qn('w:p'))):
+            yield p, part
+
+
 def strong_replace(doc, map_):
 
+    values = {k: str(v) for k, v in map_.items()}
+    if not values:
+        return doc
+    pattern = re.compile('|'.join(re.escape(k) for k in sorted(values, key=len, reverse=True)))
+    # paragraphs without the common placeholder prefix are skipped before
+    # building any python-docx objects for them
+    needle = '{{' if all(k.startswith('{{') for k in values) else None
+    complaint_value = values.get("{{Complaint Additional Info}}", "")
+
     def replace_in_paragraph(p):
 
         full_text = "".join([r.text for r in p.runs])
-        replaced = full_text
-
-        for k, v in map_.items():
-            replaced = replaced.replace(k, str(v))
+        replaced = pattern.sub(lambda m: values[m.group(0)], full_text)
 
         if replaced != full_text:
 
@@ -100,8 +146,6 @@ def strong_replace(doc, map_):
                 for i in range(len(p.runs) - 1, 0, -1):
                     p.runs[i].clear()
 
-                complaint_value = map_.get("{{Complaint Additional Info}}", "")
-
                 
                 if complaint_value and complaint_value in replaced:
 
@@ -121,58 +165,307 @@ def strong_replace(doc, map_):
                     
                     p.runs[0].text = replaced
 
-    for p in doc.paragraphs:
-        replace_in_paragraph(p)
+    for p, parent in _iter_paragraphs(doc):
+        if needle and needle not in "".join(t.text or "" for t in p.iter(qn('w:t'))):
+            continue
+        replace_in_paragraph(Paragraph(p, parent))
 
-    for t in doc.tables:
-        for row in t.rows:
-            for cell in row.cells:
-                for p in cell.paragraphs:
-                    replace_in_paragraph(p)
+    return doc
 
-    for section in doc.sections:
-        for p in section.header.paragraphs:
-            replace_in_paragraph(p)
+def _row_prototype(t):
+    """Return a detached ``w:tr`` to clone for each data row of table ``t``.
 
-    for section in doc.sections:
-        for p in section.footer.paragraphs:
-            replace_in_paragraph(p)
+    A data row already present under the header is reused so its cell, paragraph
+    and run formatting carries over; otherwise the row python-docx's
+    ``add_row`` would create is used.  Every cell is reduced to one paragraph
+    holding one run with an empty ``w:t``."""
+    tbl = t._tbl
+    if len(tbl.tr_lst) > 1:
+        tr = copy.deepcopy(tbl.tr_lst[-1])
+    else:
+        tr = t.add_row()._tr
+        tbl.remove(tr)
+    for tc in tr.tc_lst:
+        paragraphs = tc.findall(qn('w:p'))
+        if not paragraphs:
+            paragraphs = [tc.add_p()]
+        p = paragraphs[0]
+        for extra in paragraphs[1:]:
+            tc.remove(extra)
+        runs = p.findall(qn('w:r'))
+        rPr = runs[0].find(qn('w:rPr')) if runs else None
+        for child in list(p):
+            if child.tag != qn('w:pPr'):
+                p.remove(child)
+        r = OxmlElement('w:r')
+        if rPr is not None:
+            r.append(rPr)
+        text = OxmlElement('w:t')
+        text.set(qn('xml:space'), 'preserve')
+        r.append(text)
+        p.append(r)
+    return tr
+
+
+_BREAK_CHARS = re.compile(r'[\t\n\r]')
 
-    return doc
 
 def insert_rows(doc, rows):
+    """Append ``rows`` to the table whose header starts with S.NO.
+
+    The row XML is built once and deep-copied per data row, and all rows are
+    appended to the table in a single batch, which keeps tables with thousands
+    of transactions fast compared to ``add_row`` plus per-cell ``text``."""
     for t in doc.tables:
         if "S.NO" in t.rows[0].cells[0].text.upper():
+            proto = _row_prototype(t)
+            new_rows = []
             for r in rows:
-                cells = t.add_row().cells
-                for i in range(min(len(r), len(cells))):
-                    cells[i].text = str(r[i])
+                tr = copy.deepcopy(proto)
+                for i, tc in enumerate(tr.tc_lst):
+                    run = tc.find(qn('w:p')).find(qn('w:r'))
+                    if i < len(r):
+                        value = str(r[i])
+                        if _BREAK_CHARS.search(value):
+                            # CT_R.text writes tabs and line breaks as w:tab /
+                            # w:br, as cell.text did
+                            run.text = value
+                        else:
+                            run.find(qn('w:t')).text = value
+                    else:
+                        run.getparent().remove(run)
+                new_rows.append(tr)
+            t._tbl.extend(new_rows)
             return True
     return False
 
+
+# Parsed templates keyed by absolute path -> (mtime, Document).  Parsing the
+# DOCX means unzipping and building every XML part, so it is done once per
+# process and each letter works on a clone of the cached document instead.
+_TEMPLATE_CACHE = {}
+_TEMPLATE_LOCK = threading.Lock()
+
+# Only these parts are edited while rendering a letter; everything else
+# (styles, numbering, settings, media) is shared between clones.
+_MUTABLE_PART_TYPES = ('DocumentPart', 'HeaderPart', 'FooterPart')
+
+
+def _cached_template(path):
+    key = os.path.abspath(path)
+    mtime = os.path.getmtime(key)
+    with _TEMPLATE_LOCK:
+        cached = _TEMPLATE_CACHE.get(key)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, Document(key))
+            _TEMPLATE_CACHE[key] = cached
+    return cached[1]
+
+
+def load_template(path):
+    """Return a fresh Document for the template at ``path``.
+
+    The template is parsed once and re-read only when its mtime changes.  The
+    returned document deep-copies the body, header and footer XML of the cached
+    template and shares the read-only parts, so it can be edited and saved
+    without affecting later letters."""
+    base = _cached_template(path)
+    memo = {}
+    for part in base.part.package.iter_parts():
+        if type(part).__name__ not in _MUTABLE_PART_TYPES:
+            memo[id(part)] = part
+    return copy.deepcopy(base, memo)
+
+
 def clean_fn(s):
     allowed = "-_.()%s%s" % (string.ascii_letters, string.digits)
     return ''.join(c for c in s if c in allowed).replace(" ", "_")
 
 
-def _read_excel_or_csv(path):
+def _read_excel_or_csv(path, sheet_name=None):
     """Return a pandas DataFrame from either an Excel or CSV file."""
     if path.lower().endswith('.csv'):
         return pd.read_csv(path, dtype=str).fillna('')
     else:
-        return pd.read_excel(path, dtype=str).fillna('')
+        return pd.read_excel(path, sheet_name=sheet_name or 0, dtype=str).fillna('')
+
+
+# Letter table columns, in the order they appear in the letter, with the
+# portal export headers they are recognised by and the column position of the
+# portal layout.  Headers are normalised to lower-case words (``A/c No.`` ->
+# ``a c no``) and must match one of the patterns as a whole, so e.g. "Victim
+# A/c" or "Beneficiary Bank Name" are not taken for the suspect account.
+TXN_COLUMNS = [
+    ('LAYER', (r'layer( no)?',), 5),
+    ('SUSPECT/BENEFICIARY DETAILS', (r'account no wallet pg pa id',
+                                     r'(suspect |beneficiary )?(account|a c|ac) (no|number)',
+                                     r'(suspect|beneficiary) (account|a c|ac)( details)?'), 6),
+    ('SUSPECT/IFSC_CODE', (r'(suspect |beneficiary )?ifsc( code)?',), 7),
+    ('TXN_ID / UTR_NO', (r'(transaction|txn) id( utr( no| number)?)?', r'utr( no| number)?'), 9),
+    ('DISPUTED AMOUNT', (r'disputed (amount|amt)( rs| inr)?',), 11),
+    ('TXN AMOUNT', (r'(transaction|txn) (amount|amt)( rs| inr)?',), 10),
+]
+
+TXN_CHUNK_ROWS = int(os.environ.get('LETTER_TXN_CHUNK_ROWS', 50000))
+
+
+def _normalize_header(h):
+    return ' '.join(re.findall(r'[a-z0-9]+', str(h if h is not None else '').lower()))
+
+
+def _header_matches(header, patterns):
+    return any(re.fullmatch(p, header) for p in patterns)
+
+
+def resolve_txn_columns(headers):
+    """Map each TXN_COLUMNS name to a column index in ``headers``.
+
+    The portal position is kept when its header matches the column's
+    patterns; otherwise a header elsewhere is used when exactly one
+    not-yet-claimed column matches, and the portal position is the last
+    resort (exports without recognisable headers).  Returns None if none of
+    that works for some column."""
+    normalized = [_normalize_header(h) for h in headers]
+    resolved = {}
+    claimed = set()
+    for name, patterns, position in TXN_COLUMNS:
+        matches = [i for i, h in enumerate(normalized)
+                   if i not in claimed and _header_matches(h, patterns)]
+        if position in matches:
+            resolved[name] = position
+        elif len(matches) == 1:
+            resolved[name] = matches[0]
+        elif position < len(headers) and position not in claimed:
+            resolved[name] = position
+        else:
+            return None
+        claimed.add(resolved[name])
+    return resolved
+
+
+def _cell_str(v):
+    if v is None:
+        return ''
+    if isinstance(v, float):
+        if v != v:
+            return ''
+        # like pd.read_excel(dtype=str): account numbers stored as numbers
+        # must not come out as '1.2345678901234568e+16'
+        if v.is_integer():
+            return str(int(v))
+    return str(v)
+
+
+def _iter_txn_chunks(path, sheet_name=None, chunksize=None):
+    """Yield DataFrames of the TXN_COLUMNS (as str) in chunks of ``chunksize`` rows.
+
+    CSV files go through pandas' chunked reader with ``usecols``; .xlsx sheets
+    are streamed row by row with openpyxl in read-only mode, so only the used
+    columns of one chunk are held at a time."""
+    chunksize = chunksize or TXN_CHUNK_ROWS
+    names = [c[0] for c in TXN_COLUMNS]
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == '.csv':
+        headers = list(pd.read_csv(path, nrows=0).columns)
+        cols = resolve_txn_columns(headers)
+        if cols is None:
+            raise ValueError('transaction sheet is missing expected columns')
+        used = sorted(set(cols.values()))
+        for chunk in pd.read_csv(path, dtype=str, usecols=used, chunksize=chunksize):
+            chunk = chunk.fillna('')
+            yield pd.DataFrame({n: chunk.iloc[:, used.index(cols[n])].to_numpy() for n in names})
+        return
+
+    if ext == '.xlsx':
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+            rows = ws.iter_rows(values_only=True)
+            headers = next(rows, None) or ()
+            cols = resolve_txn_columns(headers)
+            if cols is None:
+                raise ValueError('transaction sheet is missing expected columns')
+            picks = [cols[n] for n in names]
+            buf = []
+            for r in rows:
+                buf.append([_cell_str(r[i]) if i < len(r) else '' for i in picks])
+                if len(buf) >= chunksize:
+                    yield pd.DataFrame(buf, columns=names)
+                    buf = []
+            if buf:
+                yield pd.DataFrame(buf, columns=names)
+        finally:
+            wb.close()
+        return
+
+    df = _read_excel_or_csv(path, sheet_name)
+    cols = resolve_txn_columns(list(df.columns))
+    if cols is None:
+        raise ValueError('transaction sheet is missing expected columns')
+    yield pd.DataFrame({n: df.iloc[:, cols[n]].astype(str).to_numpy() for n in names})
+
+
+@metrics.stage('transactions_read')
+def read_transactions(path, sheet_name=None, chunksize=None):
+    """Read the layered-transaction sheet into the letter table columns.
+
+    Rows without an IFSC code are dropped chunk by chunk, IFSC codes are
+    normalised to upper case and ``BANK_CODE`` (the IFSC prefix) is a
+    categorical column."""
+    parts = []
+    for chunk in _iter_txn_chunks(path, sheet_name, chunksize):
+        ifsc = chunk['SUSPECT/IFSC_CODE'].str.strip().str.upper()
+        keep = ifsc != ''
+        if not keep.any():
+            continue
+        chunk = chunk[keep].copy()
+        chunk['SUSPECT/IFSC_CODE'] = ifsc[keep]
+        chunk['TXN AMOUNT'] = chunk['TXN AMOUNT'].str.replace(',', '').str.strip()
+        parts.append(chunk)
+    names = [c[0] for c in TXN_COLUMNS]
+    df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=names, dtype=str)
+    df['BANK_CODE'] = df['SUSPECT/IFSC_CODE'].str[:4].astype('category')
+    return df
+
+
+def group_transactions(df):
+    """Yield ``(bank_code, rows)`` per bank in sorted bank-code order.
+
+    ``rows`` are tuples ``(s_no, layer, beneficiary, ifsc, utr, disputed,
+    txn_amount)`` built from column arrays instead of ``iterrows``."""
+    order = ['LAYER', 'SUSPECT/BENEFICIARY DETAILS', 'SUSPECT/IFSC_CODE',
+             'TXN_ID / UTR_NO', 'DISPUTED AMOUNT', 'TXN AMOUNT']
+    arrays = [df[c].to_numpy() for c in order]
+    groups = df.groupby('BANK_CODE', observed=True, sort=True).indices
+    for bank_code in sorted(groups):
+        idx = groups[bank_code]
+        yield bank_code, list(zip(range(1, len(idx) + 1), *(a[idx].tolist() for a in arrays)))
 
 
 def generate_letters_from_files(pdf_path,
                                 excel_path,
                                 output_dir=None,
                                 template_path=None,
-                                ifsc_csv_path=None):
+                                ifsc_csv_path=None,
+                                workers=1,
+                                timeout=None,
+                                failures=None,
+                                incremental=False,
+                                stats=None,
+                                sheet_name=None):
     """Generate the bank-wise letters and return a list of generated files.
 
     Arguments are mostly self‑explanatory; any parameter left as None will fall
     back to the module global constants.  Raised exceptions propagate up to the
-    caller to handle (for example the Flask route)."""
+    caller to handle (for example the Flask route); errors while rendering an
+    individual letter are collected in ``failures`` instead (see
+    ``render_letters``).  ``workers`` > 1 renders the bank letters in parallel
+    worker processes with ``timeout`` seconds allowed per letter.  With
+    ``incremental`` only letters whose inputs changed since the last run in
+    ``output_dir`` are rebuilt (see ``_render_incremental``).  ``sheet_name``
+    selects the transaction sheet of a multi-sheet workbook."""
     tpl = template_path or TEMPLATE_PATH
     ifsc_csv = ifsc_csv_path or IFSC_CSV_PATH
     out_dir = output_dir or OUTPUT_DIR
@@ -180,76 +473,370 @@ def generate_letters_from_files(pdf_path,
     # load IFSC reference
     load_ifsc_csv(ifsc_csv)
 
-    # read the PDF text and placeholders
-    pdf_text = ''
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            t = page.extract_text()
-            if t:
-                pdf_text += t + '\n'
-    pdf_data = extract_pdf_placeholders(pdf_text)
-
-    # read table data
-    df = _read_excel_or_csv(excel_path)
-
-    df_final = pd.DataFrame({
-        'S.NO': range(1, len(df) + 1),
-        'LAYER': df.iloc[:, 5].astype(str),
-        'SUSPECT/BENEFICIARY DETAILS': df.iloc[:, 6].astype(str),
-        'SUSPECT/IFSC_CODE': df.iloc[:, 7].astype(str),
-        'TXN_ID / UTR_NO': df.iloc[:, 9].astype(str),
-        'DISPUTED AMOUNT': df.iloc[:, 11].astype(str),
-        'TXN AMOUNT': df.iloc[:, 10].astype(str).str.replace(',', '').str.strip()
-    })
-
-    df_final['SUSPECT/IFSC_CODE'] = (
-        df_final['SUSPECT/IFSC_CODE']
-        .astype(str)
-        .str.strip()
-        .str.upper()
-    )
-    df_final = df_final[df_final['SUSPECT/IFSC_CODE'] != '']
-    df_final['BANK_CODE'] = df_final['SUSPECT/IFSC_CODE'].str[:4]
-
-    generated_files = []
-
-    for bank_code, group in df_final.groupby('BANK_CODE'):
-        rows = []
-        for idx, (_, r) in enumerate(group.iterrows(), 1):
-            rows.append([
-                idx,
-                r['LAYER'],
-                r['SUSPECT/BENEFICIARY DETAILS'],
-                r['SUSPECT/IFSC_CODE'],
-                r['TXN_ID / UTR_NO'],
-                r['DISPUTED AMOUNT'],
-                r['TXN AMOUNT']
-            ])
-
-        doc = Document(tpl)
-        inserted = insert_rows(doc, rows)
-        if not inserted:
-            # if the template doesn't have the expected table, skip this bank
-            continue
+    # read the PDF text (from the shared text store when available) and placeholders
+    pdf_data = extract_pdf_placeholders(pdf_text(pdf_path))
+
+    # read table data (chunked, only the letter columns)
+    df_final = read_transactions(excel_path, sheet_name)
+
+    today = datetime.now().strftime('%d-%m-%Y')
+    csr_part = pdf_data.get('{{CSRNO}}', 'NA').replace('/', '-')
+    jobs = []
+    used_names = set()
 
-        sample_ifsc = group['SUSPECT/IFSC_CODE'].iloc[0]
+    for bank_code, rows in group_transactions(df_final):
+        sample_ifsc = rows[0][3]
         full_bank_name = get_full_bank_name(sample_ifsc)
 
         replacements = pdf_data.copy()
         replacements['{{BANK_NAME}}'] = full_bank_name
-        replacements['{{GETDATE}}'] = datetime.now().strftime('%d-%m-%Y')
+        replacements['{{GETDATE}}'] = today
 
-        doc = strong_replace(doc, replacements)
-
-        csr_part = replacements.get('{{CSRNO}}', 'NA').replace('/', '-')
         filename = f"{clean_fn(full_bank_name)}__CSR_{clean_fn(csr_part)}.docx"
-
-        os.makedirs(out_dir, exist_ok=True)
-        out_path = os.path.join(out_dir, filename)
-        doc.save(out_path)
-        generated_files.append(out_path)
-
-    return generated_files
+        if filename in used_names:
+            # two bank codes resolving to the same name must not overwrite
+            # each other; groups are sorted so the suffix is stable
+            filename = f"{clean_fn(full_bank_name)}_{clean_fn(bank_code)}__CSR_{clean_fn(csr_part)}.docx"
+        used_names.add(filename)
+
+        jobs.append((bank_code, rows, replacements, os.path.join(out_dir, filename)))
+
+    os.makedirs(out_dir, exist_ok=True)
+    if not incremental:
+        return render_letters(tpl, jobs, workers=workers, timeout=timeout, failures=failures)
+    return _render_incremental(tpl, jobs, out_dir, workers, timeout, failures, stats)
+
+
+def generate_letters_job(pdf_path, excel_path, output_dir, sheet_name=None):
+    """Process-pool entry point for bulk runs over many complaints.
+
+    Renders one complaint's letters serially and incrementally and returns
+    ``(generated_files, failures, stats)``."""
+    failures = []
+    stats = {}
+    generated = generate_letters_from_files(pdf_path, excel_path, output_dir=output_dir,
+                                            failures=failures, incremental=True, stats=stats,
+                                            sheet_name=sheet_name)
+    return generated, failures, stats
+
+
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.manifest.lock'
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _job_digest(rows, replacements, template_version):
+    # the letter date is left out so unchanged banks are not rebuilt just
+    # because letters are regenerated on a later day
+    placeholders = {k: v for k, v in replacements.items() if k != '{{GETDATE}}'}
+    payload = json.dumps([rows, placeholders, template_version], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME), 'r', encoding='utf-8') as fh:
+            return json.load(fh) or {}
+    except Exception:
+        return {}
+
+
+def _save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=1)
+    os.replace(tmp, path)
+
+
+@contextlib.contextmanager
+def _locked(out_dir):
+    """Hold an exclusive OS lock on ``out_dir`` (released if the process dies)."""
+    fh = open(os.path.join(out_dir, LOCK_NAME), 'a+b')
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            while True:
+                fh.seek(0)
+                try:
+                    # LK_LOCK itself retries for ~10 seconds before failing
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+    finally:
+        fh.close()
+
+
+def _render_incremental(tpl, jobs, out_dir, workers, timeout, failures, stats):
+    """``_render_incremental_locked`` while holding the lock of ``out_dir``, so
+    concurrent runs for one complaint do not lose each other's manifest entries."""
+    with _locked(out_dir):
+        return _render_incremental_locked(tpl, jobs, out_dir, workers, timeout, failures, stats)
+
+
+def _render_incremental_locked(tpl, jobs, out_dir, workers, timeout, failures, stats):
+    """Rebuild only the letters whose rows, placeholders or template changed.
+
+    ``letters/<cid>/manifest.json`` maps each bank code to the digest of its
+    inputs and the file written for it.  Letters of banks that no longer appear
+    in the spreadsheet (or whose file name changed) are deleted, and so is the
+    previous letter of a bank that is rebuilt, so a failed rebuild never leaves
+    outdated rows behind.  Counts are stored in ``stats`` (when a
+    dict is given) under ``rebuilt``, ``reused`` and ``deleted``."""
+    template_version = _file_digest(tpl)
+    old_banks = _load_manifest(out_dir).get('banks', {})
+    new_banks = {}
+    todo = []
+    reused = set()
+
+    for bank_code, rows, replacements, out_path in jobs:
+        digest = _job_digest(rows, replacements, template_version)
+        name = os.path.basename(out_path)
+        entry = old_banks.get(bank_code)
+        if entry and entry.get('hash') == digest and entry.get('file') == name and os.path.exists(out_path):
+            reused.add(out_path)
+            new_banks[bank_code] = entry
+        else:
+            todo.append((bank_code, rows, replacements, out_path))
+            new_banks[bank_code] = {'hash': digest, 'file': name}
+
+    for job in todo:
+        _remove(job[3])
+    rendered = set(render_letters(tpl, todo, workers=workers, timeout=timeout, failures=failures))
+    for bank_code, _, _, out_path in todo:
+        if out_path not in rendered:
+            # retried on the next run
+            new_banks.pop(bank_code, None)
+
+    current_files = {os.path.basename(job[3]) for job in jobs}
+    deleted = 0
+    for entry in old_banks.values():
+        # banks that vanished, or whose letter was renamed (e.g. new CSR no.)
+        if entry.get('file') in current_files:
+            continue
+        try:
+            os.remove(os.path.join(out_dir, entry.get('file', '')))
+            deleted += 1
+        except OSError:
+            pass
+
+    _save_manifest(out_dir, {'template': os.path.abspath(tpl),
+                             'template_version': template_version,
+                             'banks': new_banks})
+
+    if stats is not None:
+        stats.update({'rebuilt': len(rendered), 'reused': len(reused), 'deleted': deleted})
+    return [job[3] for job in jobs if job[3] in rendered or job[3] in reused]
+
+
+def _render_letter(tpl, rows, replacements, out_path):
+    """Render one bank letter and return its path (None if the template has
+    no transaction table).  Runs in a worker process, so it only receives
+    plain rows and placeholders."""
+    doc = load_template(tpl)
+    if not insert_rows(doc, rows):
+        return None
+    doc = strong_replace(doc, replacements)
+    doc.save(out_path)
+    return out_path
+
+
+# Letters rendered with workers > 1 go to one process pool per process that
+# is kept between requests, so its workers keep the modules and the parsed
+# template (see load_template) warm.  Workers report when they start a
+# letter when a timeout is set; a letter running longer than its timeout gets
+# the pool's processes terminated (a hung render cannot be cancelled
+# otherwise) and the pool is replaced.  Letters of a pool terminated that way
+# are resubmitted, whichever request they belong to; letters of a pool whose
+# worker died on its own are resubmitted once.
+_pool = None
+_pool_size = 0
+_pool_started = None
+_pool_lock = threading.Lock()
+_recycled_pools = weakref.WeakSet()
+_started_at = {}
+_task_ids = itertools.count()
+_worker_started = None
+
+
+def _init_letter_worker(started):
+    global _worker_started
+    _worker_started = started
+
+
+def _render_letter_task(task_id, report, tpl, *args):
+    """``_render_letter`` for the process pool: reports its start to the parent
+    when ``report`` is set and also returns the render time, which the parent
+    records (worker processes do not report metrics)."""
+    if report:
+        _worker_started.put((task_id, time.time()))
+    start = time.perf_counter()
+    out_path = _render_letter(tpl, *args)
+    return out_path, time.perf_counter() - start
+
+
+def _letter_pool(workers):
+    """Return ``(pool, started_queue)``, (re)creating the pool when needed."""
+    global _pool, _pool_size, _pool_started
+    with _pool_lock:
+        if _pool is None or _pool_size < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool_started = multiprocessing.Queue()
+            _pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_letter_worker,
+                                        initargs=(_pool_started,))
+            _pool_size = workers
+        return _pool, _pool_started
+
+
+def _drop_pool(pool):
+    """Stop handing out ``pool``; the next letter starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+
+def _recycle_pool(pool):
+    """Terminate the processes of ``pool`` and drop it."""
+    with _pool_lock:
+        _recycled_pools.add(pool)
+    _drop_pool(pool)
+    processes = list((getattr(pool, '_processes', None) or {}).values())
+    for proc in processes:
+        proc.terminate()
+    for proc in processes:
+        proc.join(5)
+    # not cancel_futures: the broken pool fails the queued letters, which resubmit
+    pool.shutdown(wait=False)
+
+
+def _drain_started(started):
+    while True:
+        try:
+            task_id, at = started.get_nowait()
+        except (queue.Empty, OSError, ValueError):
+            return
+        with _pool_lock:
+            _started_at[task_id] = at
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def render_letters(tpl, jobs, workers=None, timeout=None, failures=None):
+    """Render ``(bank_code, rows, replacements, out_path)`` jobs.
+
+    With more than one worker the letters are rendered in the shared process
+    pool and each may run for at most ``timeout`` seconds from when a worker
+    picks it up; a letter that runs longer is killed and its file removed.
+    Letters that fail or time out are left out of the returned list and, when
+    ``failures`` is a list, recorded in it as ``{'bank_code', 'file', 'error'}``
+    dicts.  The returned paths keep the order of ``jobs``."""
+    if failures is None:
+        failures = []
+    # the pool is sized by ``workers`` alone so later, larger runs can reuse it
+    workers = workers or os.cpu_count() or 1
+    results = {}
+
+    def record(i, result, error=None):
+        job = jobs[i]
+        if error is not None:
+            failures.append({'bank_code': job[0], 'file': os.path.basename(job[3]), 'error': error})
+        elif result:
+            results[i] = result
+
+    if workers <= 1:
+        for i, job in enumerate(jobs):
+            try:
+                with metrics.stage('letter_render'):
+                    result = _render_letter(tpl, *job[1:])
+                record(i, result)
+            except Exception as e:
+                record(i, None, str(e))
+        return [results[i] for i in sorted(results)]
+
+    pending = {}
+
+    def submit(i, retried=False):
+        task_id = next(_task_ids)
+        while True:
+            pool, started = _letter_pool(workers)
+            try:
+                fut = pool.submit(_render_letter_task, task_id, bool(timeout), tpl, *jobs[i][1:])
+                break
+            except (RuntimeError, BrokenProcessPool):
+                # another request shut this pool down or it broke just now
+                _drop_pool(pool)
+        pending[fut] = (i, task_id, pool, started, retried)
+
+    for i in range(len(jobs)):
+        submit(i)
+    while pending:
+        done, _ = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+        for started in {entry[3] for entry in pending.values()}:
+            _drain_started(started)
+        for fut in done:
+            i, task_id, pool, _, retried = pending.pop(fut)
+            with _pool_lock:
+                _started_at.pop(task_id, None)
+            try:
+                result, seconds = fut.result()
+                metrics.observe_stage('letter_render', seconds)
+                record(i, result)
+            except (BrokenProcessPool, CancelledError):
+                _drop_pool(pool)
+                with _pool_lock:
+                    recycled = pool in _recycled_pools
+                # a pool killed for another letter's timeout does not use up the retry
+                if recycled or not retried:
+                    submit(i, retried=retried or not recycled)
+                    continue
+                metrics.stage_error('letter_render')
+                record(i, None, 'letter worker process died')
+            except Exception as e:
+                metrics.stage_error('letter_render')
+                record(i, None, str(e))
+        if not timeout:
+            continue
+        now = time.time()
+        for fut, (i, task_id, pool, _, _) in list(pending.items()):
+            with _pool_lock:
+                began = _started_at.get(task_id)
+            if began is None or now - began <= timeout:
+                continue
+            _recycle_pool(pool)
+            pending.pop(fut)
+            with _pool_lock:
+                _started_at.pop(task_id, None)
+            # the killed render may have written part of the file
+            _remove(jobs[i][3])
+            metrics.stage_error('letter_render')
+            record(i, None, f'timed out after {timeout}s')
+    return [results[i] for i in sorted(results)]
 
 
 def generate_letters():
@@ -257,9 +844,13 @@ def generate_letters():
     if not PDF_PATH or not EXCEL_PATH:
         print("ERROR: PDF_PATH and EXCEL_PATH must be set when running as a script")
         return
-    generated = generate_letters_from_files(PDF_PATH, EXCEL_PATH, OUTPUT_DIR, TEMPLATE_PATH, IFSC_CSV_PATH)
+    failures = []
+    generated = generate_letters_from_files(PDF_PATH, EXCEL_PATH, OUTPUT_DIR, TEMPLATE_PATH, IFSC_CSV_PATH,
+                                            workers=os.cpu_count(), failures=failures)
     for f in generated:
         print(f"Generated: {f}")
+    for f in failures:
+        print(f"Failed: {f['file']} ({f['error']})")
 
 
 if __name__ == "__main__":
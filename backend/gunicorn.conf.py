@@ -0,0 +1,8 @@
+# gunicorn settings for the backend (read from the working directory, see the
+# Dockerfile).  Background jobs are started per worker once the app is
+# loaded; app.start_background lets only one worker at a time run them.
+
+
+def post_worker_init(worker):
+    import app
+    app.start_background()
@@ -0,0 +1,187 @@
+import os
+import json
+import queue
+import socket
+import logging
+import subprocess
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+# Local LLM access for mitigation advice.  Requests go to the Ollama HTTP API
+# over a small pool of keep-alive connections; ``keep_alive`` asks Ollama to
+# keep the model loaded between calls.  When the API is unreachable (nothing
+# listening) the old ``ollama run`` subprocess path is used instead.  A
+# generate request is never sent twice once Ollama may have started on it.
+OLLAMA_URL = os.environ.get('OLLAMA_URL', 'http://127.0.0.1:11434')
+OLLAMA_MODEL = os.environ.get('OLLAMA_MODEL', "huggingface.co/QuantFactory/Meta-Llama-3-8B-Instruct-GGUF:latest")
+#OLLAMA_MODEL = "llama3"
+OLLAMA_KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
+OLLAMA_TIMEOUT = float(os.environ.get('OLLAMA_TIMEOUT', 120))
+OLLAMA_POOL_SIZE = int(os.environ.get('OLLAMA_POOL_SIZE', 4))
+OLLAMA_CLI_FALLBACK = os.environ.get('OLLAMA_CLI_FALLBACK', '1').lower() in ('1', 'true', 'yes')
+
+log = logging.getLogger(__name__)
+
+# errors of a pooled connection the server closed while it was idle
+_STALE = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class OllamaError(Exception):
+    pass
+
+
+class OllamaClient:
+    """Minimal Ollama /api/generate client with pooled keep-alive connections."""
+
+    def __init__(self, base_url=OLLAMA_URL, model=OLLAMA_MODEL, keep_alive=OLLAMA_KEEP_ALIVE,
+                 timeout=OLLAMA_TIMEOUT, pool_size=OLLAMA_POOL_SIZE):
+        url = urlsplit(base_url)
+        self._conn_cls = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self.host = url.hostname or '127.0.0.1'
+        self.port = url.port
+        self.model = model
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _acquire(self):
+        """Return ``(conn, pooled)``; ``pooled`` is set for a reused connection."""
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return self._conn_cls(self.host, self.port, timeout=self.timeout), False
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _post(self, path, payload):
+        body = json.dumps(payload).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive'}
+        # a pooled connection may have been closed by the server while idle;
+        # only then is the request resent, once, on a fresh connection
+        conn, pooled = self._acquire()
+        while True:
+            try:
+                conn.request('POST', path, body=body, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if not (pooled and isinstance(e, _STALE)):
+                    raise
+                conn, pooled = self._conn_cls(self.host, self.port, timeout=self.timeout), False
+                continue
+            if resp.status != 200:
+                detail = resp.read().decode('utf-8', 'ignore')
+                self._release(conn)
+                raise OllamaError(f'Ollama returned HTTP {resp.status}: {detail[:200]}')
+            return conn, resp
+
+    def stream(self, prompt):
+        """Yield response tokens for ``prompt`` as Ollama generates them."""
+        conn, resp = self._post('/api/generate', {
+            'model': self.model, 'prompt': prompt, 'stream': True, 'keep_alive': self.keep_alive})
+        finished = False
+        try:
+            for line in resp:
+                if not line.strip():
+                    continue
+                obj = json.loads(line)
+                if obj.get('error'):
+                    raise OllamaError(obj['error'])
+                if obj.get('response'):
+                    yield obj['response']
+                if obj.get('done'):
+                    break
+            resp.read()
+            finished = True
+        finally:
+            if finished:
+                self._release(conn)
+            else:
+                conn.close()
+
+    def generate(self, prompt):
+        return ''.join(self.stream(prompt))
+
+    def warm(self):
+        """Load the model without generating anything (empty prompt)."""
+        conn, resp = self._post('/api/generate', {'model': self.model, 'keep_alive': self.keep_alive})
+        resp.read()
+        self._release(conn)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
+
+
+def ask_cli(prompt):
+    """Call Ollama via the CLI and return text (the original subprocess path)."""
+    try:
+        process = subprocess.run(
+            ["ollama", "run", OLLAMA_MODEL],
+            input=prompt,
+            text=True,
+            encoding="utf-8",
+            errors="ignore",
+            capture_output=True,
+            timeout=OLLAMA_TIMEOUT
+        )
+        return process.stdout.strip()
+
+    except Exception as e:
+        return f"LLM Error: {e}"
+
+
+def _unreachable(e):
+    """True when the API could not be reached at all, so no generation started."""
+    return isinstance(e, (ConnectionRefusedError, socket.gaierror))
+
+
+def ask(prompt):
+    """Return the full LLM response for ``prompt``."""
+    try:
+        return get_client().generate(prompt).strip()
+    except Exception as e:
+        if not OLLAMA_CLI_FALLBACK or not _unreachable(e):
+            return f"LLM Error: {e}"
+        log.warning('Ollama HTTP API failed (%s); falling back to ollama CLI', e)
+        return ask_cli(prompt)
+
+
+def ask_stream(prompt):
+    """Yield the LLM response for ``prompt`` token by token.
+
+    Falls back to the CLI (yielding its whole answer at once) only if the API
+    fails before the first token."""
+    started = False
+    try:
+        for token in get_client().stream(prompt):
+            started = True
+            yield token
+    except Exception as e:
+        if started or not OLLAMA_CLI_FALLBACK or not _unreachable(e):
+            raise
+        log.warning('Ollama HTTP API failed (%s); falling back to ollama CLI', e)
+        yield ask_cli(prompt)
+
+
+def warm_in_background():
+    """Preload the model in a daemon thread so the first request is not cold."""
+    def _warm():
+        try:
+            get_client().warm()
+        except Exception as e:
+            log.info('Ollama warm-up skipped: %s', e)
+    threading.Thread(target=_warm, name='ollama-warm', daemon=True).start()
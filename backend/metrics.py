@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import contextlib
+
+# In-process counters and histograms for the upload/letter pipeline, served
+# in the Prometheus text format (version 0.0.4) by /metrics.  Stages are timed
+# with ``stage()``:
+#
+#     with metrics.stage('tesseract'):
+#         text = pytesseract.image_to_string(img)
+#
+# which feeds ncrp_stage_seconds{stage="tesseract"} and counts exceptions in
+# ncrp_stage_errors_total.  Gauges are read through callbacks when /metrics is
+# scraped, so queue depths and cache stats come straight from their owners.
+#
+# Under gunicorn every worker has its own numbers.  Set METRICS_DIR to a
+# directory shared by the workers: each process then writes a snapshot there
+# every METRICS_FLUSH_SECONDS and /metrics adds up the snapshots of all of
+# them (counters of exited workers keep counting, as in prometheus_client's
+# multiprocess mode).  Gauges are only reported by the process that answers.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 10))
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+log = logging.getLogger(__name__)
+_lock = threading.Lock()
+_metrics = {}
+_flusher_started = False
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(v):
+    if v == float('inf'):
+        return '+Inf'
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        with _lock:
+            _metrics[name] = self
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        _ensure_flusher()
+
+    def snapshot(self):
+        with _lock:
+            return {'\t'.join(k): v for k, v in self._values.items()}
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    def lines(self, values):
+        for key, v in sorted(values.items()):
+            yield f'{self.name}{_labels(self.labelnames, key.split(chr(9)) if key else ())} {_number(v)}'
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # one count per bucket (non-cumulative) + the +Inf bucket, then sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+        _ensure_flusher()
+
+    def time(self, **labels):
+        return _Timer(lambda seconds, ok: self.observe(seconds, **labels))
+
+    def snapshot(self):
+        with _lock:
+            return {'\t'.join(k): list(v) for k, v in self._values.items()}
+
+    @staticmethod
+    def merge(a, b):
+        return [x + y for x, y in zip(a, b)]
+
+    def lines(self, values):
+        for key, counts in sorted(values.items()):
+            names = key.split('\t') if key else ()
+            running = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                running += n
+                yield f'{self.name}_bucket{_labels(self.labelnames, names, [("le", _number(bound))])} {running}'
+            yield f'{self.name}_sum{_labels(self.labelnames, names)} {_number(counts[-1])}'
+            yield f'{self.name}_count{_labels(self.labelnames, names)} {running}'
+
+
+class Gauge(_Metric):
+    """Value read from ``fn`` at scrape time: a number, or ``{label_values_tuple: number}``."""
+    kind = 'gauge'
+
+    def __init__(self, name, help, fn, labelnames=(), kind='gauge'):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+        # callbacks may also report counters kept elsewhere (e.g. cache hits)
+        self.kind = kind
+
+    def snapshot(self):
+        return None
+
+    def lines(self, values):
+        try:
+            value = self.fn()
+        except Exception:
+            log.exception('Metric callback %s failed', self.name)
+            return
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for key, v in items:
+            if v is None:
+                continue
+            if not isinstance(key, tuple):
+                key = (key,)
+            yield f'{self.name}{_labels(self.labelnames, key)} {_number(v)}'
+
+
+class _Timer(contextlib.ContextDecorator):
+
+    def __init__(self, done):
+        self._done = done
+
+    def _recreate_cm(self):
+        # a fresh timer per decorated call, so concurrent calls do not share _start
+        return _Timer(self._done)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._start
+        self._done(self.seconds, exc_type is None)
+        return False
+
+
+STAGE_SECONDS = Histogram('ncrp_stage_seconds', 'Time spent in each pipeline stage.', ('stage',))
+STAGE_ERRORS = Counter('ncrp_stage_errors_total', 'Pipeline stages that raised.', ('stage',))
+CACHE_REQUESTS = Counter('ncrp_cache_requests_total', 'Cache lookups by cache and result.', ('cache', 'result'))
+
+
+def stage(name):
+    """Context manager / decorator timing one pipeline stage."""
+    def done(seconds, ok):
+        STAGE_SECONDS.observe(seconds, stage=name)
+        if not ok:
+            STAGE_ERRORS.inc(stage=name)
+    return _Timer(done)
+
+
+def observe_stage(name, seconds):
+    """Record a stage timed elsewhere (e.g. in a worker process)."""
+    STAGE_SECONDS.observe(seconds, stage=name)
+
+
+def stage_error(name):
+    """Count a failure of a stage timed elsewhere."""
+    STAGE_ERRORS.inc(stage=name)
+
+
+def cache_result(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+# ---------------- multi-process snapshots ----------------
+def _snapshot_path(pid=None):
+    return os.path.join(METRICS_DIR, f'metrics_{pid or os.getpid()}.json')
+
+
+def flush():
+    """Write this process's counters and histograms to METRICS_DIR."""
+    if not METRICS_DIR:
+        return
+    with _lock:
+        metrics = list(_metrics.values())
+    data = {m.name: m.snapshot() for m in metrics if m.snapshot() is not None}
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    tmp = _snapshot_path() + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(data, fh)
+    os.replace(tmp, _snapshot_path())
+
+
+def _ensure_flusher():
+    global _flusher_started
+    if _flusher_started or not METRICS_DIR or METRICS_FLUSH_SECONDS <= 0:
+        return
+    with _lock:
+        if _flusher_started:
+            return
+        _flusher_started = True
+
+    def _loop():
+        while True:
+            time.sleep(METRICS_FLUSH_SECONDS)
+            try:
+                flush()
+            except Exception:
+                log.exception('Writing metrics snapshot failed')
+
+    threading.Thread(target=_loop, name='metrics-flush', daemon=True).start()
+
+
+def _collect():
+    """``{name: {label_key: value}}`` for this process, plus other workers' snapshots."""
+    with _lock:
+        metrics = list(_metrics.values())
+    own = {m.name: m.snapshot() for m in metrics if m.snapshot() is not None}
+    if not METRICS_DIR or not os.path.isdir(METRICS_DIR):
+        return own
+    merged = {name: dict(values) for name, values in own.items()}
+    mine = os.path.basename(_snapshot_path())
+    for entry in os.scandir(METRICS_DIR):
+        if entry.name == mine or not entry.name.startswith('metrics_') or not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path, 'r', encoding='utf-8') as fh:
+                other = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        for name, values in other.items():
+            metric = _metrics.get(name)
+            if metric is None or metric.snapshot() is None:
+                continue
+            target = merged.setdefault(name, {})
+            for key, v in values.items():
+                target[key] = metric.merge(target[key], v) if key in target else v
+    return merged
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    values = _collect()
+    with _lock:
+        metrics = sorted(_metrics.values(), key=lambda m: m.name)
+    out = []
+    for m in metrics:
+        out.append(f'# HELP {m.name} {m.help}')
+        out.append(f'# TYPE {m.name} {m.kind}')
+        out.extend(m.lines(values.get(m.name, {})))
+    return '\n'.join(out) + '\n'
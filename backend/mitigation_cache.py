@@ -0,0 +1,378 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+# Mitigation advice only depends on the complaint's type, platform, amount,
+# state and district, so answers are cached in SQLite keyed on a normalised
+# form of those fields (amount bucketed) plus the model name.  Entries expire
+# after a TTL and the least recently used ones are evicted above a size
+# limit.  Concurrent requests for the same key share a single LLM generation:
+# inside one process through an in-memory flight, across processes (gunicorn
+# workers) through a leased row in mitigation_inflight that the generating
+# process renews until it is done; the others poll the cache until the row
+# is gone.
+
+CACHE_TABLE = 'mitigation_cache'
+INFLIGHT_TABLE = 'mitigation_inflight'
+INFLIGHT_LEASE = 30
+INFLIGHT_POLL = 0.25
+
+log = logging.getLogger(__name__)
+
+# Upper bounds (in rupees) of the amount buckets used in cache keys
+AMOUNT_BUCKETS = [0, 1000, 5000, 10000, 25000, 50000, 100000, 500000, 1000000]
+
+
+def _norm(v):
+    return re.sub(r'\s+', ' ', str(v if v is not None else '')).strip().lower()
+
+
+def amount_bucket(v):
+    """Return a label such as '<=10000' or '>1000000' for an amount value."""
+    try:
+        amount = float(str(v).replace(',', '').replace('₹', '').strip())
+    except (TypeError, ValueError):
+        return 'unknown'
+    for upper in AMOUNT_BUCKETS:
+        if amount <= upper:
+            return f'<={upper}'
+    return f'>{AMOUNT_BUCKETS[-1]}'
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MitigationCache:
+
+    def __init__(self, db_path, model='', ttl=7 * 24 * 3600, max_entries=1000, lease=INFLIGHT_LEASE):
+        self.db_path = db_path
+        self.model = model
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._claimed = set()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'errors': 0}
+        self._initialized = False
+        self._renewer_started = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._initialized:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {CACHE_TABLE} (
+                    key TEXT PRIMARY KEY,
+                    fields TEXT,
+                    response TEXT,
+                    created_at REAL,
+                    last_used REAL
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{CACHE_TABLE}_last_used ON {CACHE_TABLE}(last_used)")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {INFLIGHT_TABLE} (
+                    key TEXT PRIMARY KEY,
+                    pid INTEGER,
+                    expires_at REAL
+                )
+            """)
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def normalized(self, data):
+        return {
+            'cybercrime_type': _norm(data.get('Cybercrime Type')),
+            'platform': _norm(data.get('Platform')),
+            'amount': amount_bucket(data.get('Total Amount Lost')),
+            'state': _norm(data.get('State')),
+            'district': _norm(data.get('District')),
+            'model': self.model,
+        }
+
+    def key_for(self, data):
+        payload = json.dumps(self.normalized(data), sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute(f"SELECT response, created_at FROM {CACHE_TABLE} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                conn.execute(f"DELETE FROM {CACHE_TABLE} WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute(f"UPDATE {CACHE_TABLE} SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return row[0]
+        finally:
+            conn.close()
+
+    def put(self, key, response, fields=None):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {CACHE_TABLE} (key, fields, response, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(fields) if fields else None, response, now, now))
+            conn.execute(f"DELETE FROM {CACHE_TABLE} WHERE created_at < ?", (now - self.ttl,))
+            (count,) = conn.execute(f"SELECT COUNT(*) FROM {CACHE_TABLE}").fetchone()
+            if count > self.max_entries:
+                cur = conn.execute(
+                    f"DELETE FROM {CACHE_TABLE} WHERE key IN "
+                    f"(SELECT key FROM {CACHE_TABLE} ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,))
+                with self._lock:
+                    self._stats['evictions'] += cur.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+            out['inflight'] = len(self._inflight)
+        conn = self._connect()
+        try:
+            (out['entries'],) = conn.execute(f"SELECT COUNT(*) FROM {CACHE_TABLE}").fetchone()
+        finally:
+            conn.close()
+        lookups = out['hits'] + out['misses'] + out['coalesced']
+        out['hit_rate'] = round((out['hits'] + out['coalesced']) / lookups, 4) if lookups else None
+        return out
+
+    def busy(self):
+        """True while any generation is in flight in this process."""
+        with self._lock:
+            return bool(self._inflight)
+
+    def _join_or_lead(self, key):
+        """Return (flight, is_leader) for ``key``."""
+        with self._lock:
+            flight = self._inflight.get(key)
+            if flight is not None:
+                return flight, False
+            flight = _Flight()
+            self._inflight[key] = flight
+            return flight, True
+
+    def _finish(self, key, flight, result=None, error=None):
+        flight.result = result
+        flight.error = error
+        with self._lock:
+            self._inflight.pop(key, None)
+        flight.done.set()
+
+    def _cacheable(self, response):
+        return bool(response) and not response.startswith('LLM Error')
+
+    def _wait(self, flight):
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _claim(self, key):
+        """Mark ``key`` as being generated by this process; False if another one is."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(f"DELETE FROM {INFLIGHT_TABLE} WHERE key = ? AND expires_at < ?", (key, now))
+            cur = conn.execute(f"INSERT OR IGNORE INTO {INFLIGHT_TABLE} (key, pid, expires_at) VALUES (?, ?, ?)",
+                               (key, os.getpid(), now + self.lease))
+            conn.commit()
+        finally:
+            conn.close()
+        if cur.rowcount != 1:
+            return False
+        with self._lock:
+            self._claimed.add(key)
+        self._ensure_renewer()
+        return True
+
+    def _unclaim(self, key):
+        with self._lock:
+            self._claimed.discard(key)
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(f"DELETE FROM {INFLIGHT_TABLE} WHERE key = ? AND pid = ?", (key, os.getpid()))
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception:
+            # the lease runs out on its own
+            log.exception('Releasing mitigation claim failed')
+
+    def _claimed_elsewhere(self, key):
+        conn = self._connect()
+        try:
+            return conn.execute(f"SELECT 1 FROM {INFLIGHT_TABLE} WHERE key = ? AND expires_at >= ?",
+                                (key, time.time())).fetchone() is not None
+        finally:
+            conn.close()
+
+    def _claim_or_wait(self, key, wait=True):
+        """Claim ``key`` for this process or wait for the process generating it.
+
+        Returns ``(claimed, cached)``: ``claimed`` once this process should
+        generate, otherwise the other process's answer in ``cached``.  With
+        ``wait=False`` it returns ``(False, None)`` instead of waiting."""
+        while True:
+            if self._claim(key):
+                # the other process may have finished just before the claim
+                cached = self.get(key)
+                if cached is None:
+                    return True, None
+                self._unclaim(key)
+                return False, cached
+            if not wait:
+                return False, None
+            while self._claimed_elsewhere(key):
+                time.sleep(INFLIGHT_POLL)
+            cached = self.get(key)
+            if cached is not None:
+                return False, cached
+
+    def _renew(self):
+        with self._lock:
+            keys = list(self._claimed)
+        if not keys:
+            return
+        conn = self._connect()
+        try:
+            conn.executemany(f"UPDATE {INFLIGHT_TABLE} SET expires_at = ? WHERE key = ? AND pid = ?",
+                             [(time.time() + self.lease, k, os.getpid()) for k in keys])
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _ensure_renewer(self):
+        with self._lock:
+            if self._renewer_started:
+                return
+            self._renewer_started = True
+
+        def _loop():
+            while True:
+                time.sleep(self.lease / 3)
+                try:
+                    self._renew()
+                except Exception:
+                    log.exception('Renewing mitigation claims failed')
+
+        threading.Thread(target=_loop, name='mitigation-claims', daemon=True).start()
+
+    def get_or_generate(self, data, generate):
+        """Return cached advice for ``data`` or call ``generate()`` once for it."""
+        key = self.key_for(data)
+        cached = self.get(key)
+        if cached is not None:
+            self._count('hits')
+            return cached
+        flight, leader = self._join_or_lead(key)
+        if not leader:
+            self._count('coalesced')
+            return self._wait(flight)
+        claimed = False
+        try:
+            claimed, cached = self._claim_or_wait(key)
+            if claimed:
+                self._count('misses')
+                response = generate()
+                if self._cacheable(response):
+                    self.put(key, response, self.normalized(data))
+        except Exception as e:
+            self._count('errors')
+            self._finish(key, flight, error=e)
+            raise
+        finally:
+            if claimed:
+                self._unclaim(key)
+        if not claimed:
+            self._count('coalesced')
+            response = cached
+        self._finish(key, flight, result=response)
+        return response
+
+    def stream(self, data, stream_tokens, acquire=None):
+        """Return an iterator of advice tokens for ``data``.
+
+        Cached and coalesced answers are yielded whole; otherwise tokens from
+        ``stream_tokens()`` are passed through and the joined text is cached.
+        ``acquire()`` is only called when this request generates the answer;
+        it returns a slot (with ``release()``) that is held until the stream
+        ends.  The cache lookup and, unless another process is generating the
+        answer, ``acquire()`` run before this returns, so their errors are
+        raised here.  Close the iterator when the response is done."""
+        tokens = self._stream(data, stream_tokens, acquire)
+        next(tokens)
+        return tokens
+
+    def _stream(self, data, stream_tokens, acquire):
+        key = self.key_for(data)
+        cached = self.get(key)
+        if cached is not None:
+            self._count('hits')
+            yield
+            yield cached
+            return
+        flight, leader = self._join_or_lead(key)
+        if not leader:
+            self._count('coalesced')
+            yield
+            yield self._wait(flight)
+            return
+        claimed = False
+        slot = None
+        try:
+            claimed, cached = self._claim_or_wait(key, wait=False)
+            if claimed and acquire is not None:
+                slot = acquire()
+            yield
+            if not claimed and cached is None:
+                claimed, cached = self._claim_or_wait(key)
+                if claimed and acquire is not None:
+                    slot = acquire()
+            if claimed:
+                self._count('misses')
+                parts = []
+                for token in stream_tokens():
+                    parts.append(token)
+                    yield token
+                response = ''.join(parts).strip()
+                if self._cacheable(response):
+                    self.put(key, response, self.normalized(data))
+        except BaseException as e:
+            # includes GeneratorExit when the client disconnects mid-stream
+            self._count('errors')
+            self._finish(key, flight, error=e if isinstance(e, Exception) else RuntimeError('stream aborted'))
+            raise
+        finally:
+            if claimed:
+                self._unclaim(key)
+            if slot is not None:
+                slot.release()
+        if claimed:
+            self._finish(key, flight, result=response)
+            return
+        self._count('coalesced')
+        self._finish(key, flight, result=cached)
+        yield cached
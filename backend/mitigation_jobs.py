@@ -0,0 +1,161 @@
+import time
+import sqlite3
+import logging
+import threading
+
+from admission import Overloaded
+
+# Background pre-generation of mitigation advice for saved complaints.
+# /api/verify enqueues every newly saved complaint in the complaint_mitigation
+# table; a low-priority worker thread claims pending rows one at a time and
+# stores the advice there, so /api/complaints can return it inline.  The
+# queue lives in SQLite, so jobs survive restarts and are claimed atomically
+# when several gunicorn workers run a worker thread each.
+
+JOBS_TABLE = 'complaint_mitigation'
+MAX_ATTEMPTS = 3
+# 'running' rows older than this are assumed orphaned by a crashed process
+STALE_SECONDS = 15 * 60
+
+log = logging.getLogger(__name__)
+
+
+def init_jobs_table(db_path):
+    conn = sqlite3.connect(db_path, timeout=10)
+    try:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {JOBS_TABLE} (
+                complaint_id TEXT PRIMARY KEY,
+                status TEXT DEFAULT 'pending',
+                advice TEXT,
+                error TEXT,
+                attempts INTEGER DEFAULT 0,
+                created_at REAL,
+                updated_at REAL
+            )
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{JOBS_TABLE}_status ON {JOBS_TABLE}(status, created_at)")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class MitigationWorker:
+    """Generates advice for queued complaints with a fixed number of threads.
+
+    ``load(complaint_id)`` returns the prompt fields for a complaint (or None)
+    and ``advise(fields)`` returns the advice text.  ``is_busy()`` is polled
+    before each job so interactive LLM requests go first."""
+
+    def __init__(self, db_path, load, advise, threads=1, poll_seconds=30, is_busy=None):
+        self.db_path = db_path
+        self.load = load
+        self.advise = advise
+        self.threads = max(1, int(threads))
+        self.poll_seconds = poll_seconds
+        self.is_busy = is_busy or (lambda: False)
+        self._wake = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def enqueue(self, complaint_ids):
+        ids = [str(c) for c in complaint_ids if c]
+        if not ids:
+            return
+        init_jobs_table(self.db_path)
+        now = time.time()
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {JOBS_TABLE} (complaint_id, status, created_at, updated_at) VALUES (?, 'pending', ?, ?)",
+                [(cid, now, now) for cid in ids])
+            conn.commit()
+        finally:
+            conn.close()
+        self._wake.set()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        init_jobs_table(self.db_path)
+        for i in range(self.threads):
+            threading.Thread(target=self._run, name=f'mitigation-worker-{i}', daemon=True).start()
+
+    def _claim(self):
+        now = time.time()
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                f"UPDATE {JOBS_TABLE} SET status = 'pending' WHERE status = 'running' AND updated_at < ?",
+                (now - STALE_SECONDS,))
+            row = conn.execute(
+                f"SELECT complaint_id FROM {JOBS_TABLE} WHERE status = 'pending' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row:
+                conn.execute(
+                    f"UPDATE {JOBS_TABLE} SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE complaint_id = ?",
+                    (now, row[0]))
+            conn.execute("COMMIT")
+            return row[0] if row else None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _finish(self, complaint_id, advice=None, error=None):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            if isinstance(error, Overloaded):
+                # the LLM was busy: back in the queue without using up an attempt
+                conn.execute(
+                    f"UPDATE {JOBS_TABLE} SET status = 'pending', attempts = attempts - 1, updated_at = ? "
+                    f"WHERE complaint_id = ?", (time.time(), complaint_id))
+            elif error is None:
+                conn.execute(
+                    f"UPDATE {JOBS_TABLE} SET status = 'done', advice = ?, error = NULL, updated_at = ? WHERE complaint_id = ?",
+                    (advice, time.time(), complaint_id))
+            else:
+                conn.execute(
+                    f"UPDATE {JOBS_TABLE} SET status = CASE WHEN attempts >= ? THEN 'error' ELSE 'pending' END, "
+                    f"error = ?, updated_at = ? WHERE complaint_id = ?",
+                    (MAX_ATTEMPTS, str(error), time.time(), complaint_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def run_once(self):
+        """Process one queued complaint; returns False when the queue is empty."""
+        complaint_id = self._claim()
+        if complaint_id is None:
+            return False
+        try:
+            fields = self.load(complaint_id)
+            if fields is None:
+                raise ValueError('complaint not found')
+            advice = self.advise(fields)
+            if not advice or advice.startswith('LLM Error'):
+                raise RuntimeError(advice or 'empty response')
+            self._finish(complaint_id, advice=advice)
+        except Overloaded as e:
+            self._finish(complaint_id, error=e)
+        except Exception as e:
+            log.warning('Mitigation pre-generation failed for %s: %s', complaint_id, e)
+            self._finish(complaint_id, error=e)
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                if self.is_busy():
+                    time.sleep(1)
+                    continue
+                if self.run_once():
+                    continue
+            except Exception:
+                log.exception('Mitigation worker error')
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
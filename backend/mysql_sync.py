@@ -0,0 +1,378 @@
+"""Incremental sync of the SQLite ``ncrp_complaints`` table to MySQL.
+
+Every row carries an ``updated_at`` timestamp maintained by SQLite triggers
+(set on insert and on any update).  The sync keeps a high-water mark of
+``(updated_at, id)`` per target in the ``sync_state`` table and pushes only
+rows past it, in batched upserts keyed on ``complaint_id`` over a pooled
+SQLAlchemy engine.  Reruns are therefore cheap and never duplicate rows.
+Deleted rows are not propagated.
+
+The target can be any SQLAlchemy URL with an upsert dialect (MySQL, SQLite,
+PostgreSQL); a SQLite file works as a local stand-in for MySQL.
+
+Usage (from the backend folder):
+    python mysql_sync.py [--url mysql+pymysql://user:pw@host/ncrp_db] [--sqlite data.db]
+                         [--watch 60] [--reset] [--status]
+"""
+import argparse
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import (Column, Date, DateTime, DECIMAL, Integer, MetaData, String, Table, Text,
+                        create_engine, inspect)
+from sqlalchemy.engine import make_url, URL
+
+SOURCE_TABLE = 'ncrp_complaints'
+STATE_TABLE = 'sync_state'
+SYNC_TABLE = os.environ.get('MYSQL_SYNC_TABLE', 'ncrp_complaints')
+SYNC_BATCH = int(os.environ.get('MYSQL_SYNC_BATCH', 500))
+# Seconds between background runs in the web app (0 disables the thread)
+SYNC_INTERVAL = float(os.environ.get('MYSQL_SYNC_INTERVAL', 60))
+
+# Columns copied to the target, in SQLite order
+DATA_COLUMNS = [
+    'source', 'complaint_id', 'complaint_date', 'incident_datetime', 'mobile', 'email',
+    'full_address', 'district', 'state', 'cybercrime_type', 'platform', 'total_amount_lost',
+    'current_status', 'saved_filename', 'created_at', 'updated_at',
+]
+
+# Same types save_df_to_mysql has always used, plus the bookkeeping columns
+MYSQL_DTYPES = {
+    "source": String(32),
+    "complaint_id": String(128),
+    "complaint_date": Date(),
+    "incident_datetime": DateTime(),
+    "mobile": String(32),
+    "email": String(256),
+    "full_address": Text(),
+    "district": String(128),
+    "state": String(128),
+    "cybercrime_type": String(256),
+    "platform": String(64),
+    "total_amount_lost": DECIMAL(18, 2),
+    "current_status": String(64),
+    "saved_filename": String(512),
+    "created_at": DateTime(),
+    "updated_at": DateTime(),
+}
+
+log = logging.getLogger(__name__)
+
+# SQLite's datetime('now') has second resolution; the triggers use
+# milliseconds so the watermark rarely needs the id tie-break
+_NOW_MS = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+_tracked = set()
+_tracked_lock = threading.Lock()
+
+
+def ensure_change_tracking(db_path, table=SOURCE_TABLE):
+    """Add ``updated_at`` and its triggers to ``table`` (once per process)."""
+    key = (os.path.abspath(db_path), table)
+    with _tracked_lock:
+        if key in _tracked:
+            return
+        conn = sqlite3.connect(db_path, timeout=10)
+        try:
+            cols = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+            if not cols:
+                return  # table not created yet
+            if 'updated_at' not in cols:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN updated_at TEXT")
+                conn.execute(f"UPDATE {table} SET updated_at = COALESCE(created_at, {_NOW_MS})")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_updated_at ON {table}(updated_at, id)")
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_insert_ts AFTER INSERT ON {table}
+                WHEN NEW.updated_at IS NULL
+                BEGIN
+                    UPDATE {table} SET updated_at = {_NOW_MS} WHERE id = NEW.id;
+                END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_update_ts AFTER UPDATE ON {table}
+                WHEN NEW.updated_at IS OLD.updated_at
+                BEGIN
+                    UPDATE {table} SET updated_at = {_NOW_MS} WHERE id = NEW.id;
+                END
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+        _tracked.add(key)
+
+
+# ---------------- ENGINES ----------------
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def mysql_url(user, password, host="localhost", port=3306, db="ncrp_db"):
+    return URL.create("mysql+pymysql", username=user, password=password, host=host, port=int(port),
+                      database=db, query={"charset": "utf8mb4"})
+
+
+def url_from_env():
+    """MYSQL_SYNC_URL, else the DB_USER/DB_PASSWORD/... variables used by ncrp_script."""
+    if os.environ.get('MYSQL_SYNC_URL'):
+        return make_url(os.environ['MYSQL_SYNC_URL'])
+    if os.environ.get('DB_USER'):
+        return mysql_url(os.environ['DB_USER'], os.environ.get('DB_PASSWORD', ''),
+                         os.environ.get('DB_HOST', 'localhost'), os.environ.get('DB_PORT', 3306),
+                         os.environ.get('DB_NAME', 'ncrp_db'))
+    return None
+
+
+def get_engine(url):
+    """One pooled engine per URL for the life of the process."""
+    url = make_url(url)
+    key = url.render_as_string(hide_password=False)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            kwargs = {'pool_pre_ping': True, 'pool_recycle': 3600}
+            if url.get_backend_name() != 'sqlite':
+                kwargs.update(pool_size=5, max_overflow=5)
+            engine = create_engine(url, **kwargs)
+            _engines[key] = engine
+        return engine
+
+
+# ---------------- TARGET ----------------
+def target_table(engine, name=SYNC_TABLE):
+    """Reflect the target table, creating it (with a unique complaint_id) if missing."""
+    insp = inspect(engine)
+    metadata = MetaData()
+    if not insp.has_table(name):
+        Table(name, metadata,
+              Column('id', Integer, primary_key=True, autoincrement=True),
+              *[Column(c, MYSQL_DTYPES[c], unique=(c == 'complaint_id')) for c in DATA_COLUMNS])
+        metadata.create_all(engine)
+        metadata = MetaData()
+    else:
+        unique = [u['column_names'] for u in insp.get_unique_constraints(name)]
+        unique += [i['column_names'] for i in insp.get_indexes(name) if i.get('unique')]
+        if ['complaint_id'] not in unique:
+            log.warning('%s has no UNIQUE index on complaint_id; upserts cannot replace existing rows. '
+                        'Add one with: ALTER TABLE %s ADD UNIQUE (complaint_id)', name, name)
+    return Table(name, metadata, autoload_with=engine)
+
+
+def _upsert(engine, table, columns):
+    dialect = engine.dialect.name
+    updates = [c for c in columns if c != 'complaint_id']
+    if dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in updates})
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        return stmt.on_conflict_do_update(index_elements=['complaint_id'],
+                                          set_={c: stmt.excluded[c] for c in updates})
+    raise ValueError(f'upsert not supported for {dialect}')
+
+
+def _parse_dt(v, fmts):
+    if v is None or isinstance(v, (datetime.date, datetime.datetime)):
+        return v
+    s = str(v).strip()
+    for fmt in fmts:
+        try:
+            return datetime.datetime.strptime(s, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def convert_row(row):
+    """SQLite text values -> the Python types of MYSQL_DTYPES."""
+    out = dict(row)
+    d = _parse_dt(out.get('complaint_date'), ('%Y-%m-%d', '%d/%m/%Y'))
+    out['complaint_date'] = d.date() if isinstance(d, datetime.datetime) else d
+    out['incident_datetime'] = _parse_dt(out.get('incident_datetime'),
+                                         ('%Y-%m-%d %H:%M:%S', '%d/%m/%Y %I:%M:%S %p', '%d/%m/%Y %H:%M:%S'))
+    for c in ('created_at', 'updated_at'):
+        out[c] = _parse_dt(out.get(c), ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S'))
+    amount = out.get('total_amount_lost')
+    if amount is not None and not isinstance(amount, (int, float)):
+        try:
+            amount = float(str(amount).replace(',', '').replace(' ', ''))
+        except ValueError:
+            amount = None
+    out['total_amount_lost'] = amount
+    return out
+
+
+def upsert_rows(engine, table, rows):
+    """Insert or update ``rows`` (dicts) by complaint_id in one transaction."""
+    if not rows:
+        return 0
+    columns = [c for c in rows[0] if c in table.c]
+    stmt = _upsert(engine, table, columns)
+    with engine.begin() as conn:
+        conn.execute(stmt, [{c: r.get(c) for c in columns} for r in rows])
+    return len(rows)
+
+
+# ---------------- SYNC ----------------
+class MysqlSync:
+    """Pushes new and changed SQLite rows to ``url`` past the stored watermark."""
+
+    def __init__(self, sqlite_path, url, table=SYNC_TABLE, batch_size=SYNC_BATCH):
+        self.sqlite_path = sqlite_path
+        self.url = make_url(url)
+        self.table = table
+        self.batch_size = max(1, int(batch_size))
+        self.key = f"{table}@{self.url.render_as_string(hide_password=True)}"
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _state_conn(self):
+        conn = sqlite3.connect(self.sqlite_path, timeout=10)
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+                target TEXT PRIMARY KEY,
+                last_updated_at TEXT,
+                last_id INTEGER,
+                rows_synced INTEGER DEFAULT 0,
+                last_run_at TEXT,
+                last_error TEXT
+            )
+        """)
+        return conn
+
+    def status(self):
+        ensure_change_tracking(self.sqlite_path)
+        conn = self._state_conn()
+        try:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(f"SELECT * FROM {STATE_TABLE} WHERE target = ?", (self.key,)).fetchone()
+            out = dict(row) if row else {'target': self.key, 'last_updated_at': None, 'last_id': None}
+            out['pending'] = self._pending(conn, out['last_updated_at'], out['last_id'])
+            return out
+        finally:
+            conn.close()
+
+    def _pending(self, conn, ts, last_id):
+        if ts is None:
+            return conn.execute(f"SELECT COUNT(*) FROM {SOURCE_TABLE}").fetchone()[0]
+        return conn.execute(
+            f"SELECT COUNT(*) FROM {SOURCE_TABLE} WHERE updated_at > ? OR (updated_at = ? AND id > ?)",
+            (ts, ts, last_id)).fetchone()[0]
+
+    def reset(self):
+        conn = self._state_conn()
+        try:
+            conn.execute(f"DELETE FROM {STATE_TABLE} WHERE target = ?", (self.key,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _save_state(self, conn, ts, last_id, pushed, error=None):
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        conn.execute(
+            f"INSERT INTO {STATE_TABLE} (target, last_updated_at, last_id, rows_synced, last_run_at, last_error) "
+            f"VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(target) DO UPDATE SET "
+            f"last_updated_at = excluded.last_updated_at, last_id = excluded.last_id, "
+            f"rows_synced = rows_synced + ?, last_run_at = excluded.last_run_at, last_error = excluded.last_error",
+            (self.key, ts, last_id, pushed, now, error, pushed))
+        conn.commit()
+
+    def run_once(self):
+        """Push everything past the watermark; returns the number of rows sent."""
+        with self._lock:
+            ensure_change_tracking(self.sqlite_path)
+            engine = get_engine(self.url)
+            target = target_table(engine, self.table)
+            conn = self._state_conn()
+            conn.row_factory = sqlite3.Row
+            total = 0
+            try:
+                state = conn.execute(
+                    f"SELECT last_updated_at, last_id FROM {STATE_TABLE} WHERE target = ?", (self.key,)).fetchone()
+                ts, last_id = (state['last_updated_at'], state['last_id']) if state else (None, None)
+                cols = ', '.join(['id'] + DATA_COLUMNS)
+                while True:
+                    if ts is None:
+                        rows = conn.execute(
+                            f"SELECT {cols} FROM {SOURCE_TABLE} ORDER BY updated_at, id LIMIT ?",
+                            (self.batch_size,)).fetchall()
+                    else:
+                        rows = conn.execute(
+                            f"SELECT {cols} FROM {SOURCE_TABLE} WHERE updated_at > ? OR (updated_at = ? AND id > ?) "
+                            f"ORDER BY updated_at, id LIMIT ?", (ts, ts, last_id, self.batch_size)).fetchall()
+                    if not rows:
+                        break
+                    upsert_rows(engine, target, [convert_row({c: r[c] for c in DATA_COLUMNS}) for r in rows])
+                    total += len(rows)
+                    ts, last_id = rows[-1]['updated_at'], rows[-1]['id']
+                    # advance the watermark after every batch so a crash
+                    # resumes from the last pushed row
+                    self._save_state(conn, ts, last_id, len(rows))
+                if total == 0:
+                    self._save_state(conn, ts, last_id, 0)
+            except Exception as e:
+                self._save_state(conn, ts, last_id, 0, error=str(e))
+                raise
+            finally:
+                conn.close()
+            return total
+
+    def start(self, interval=SYNC_INTERVAL):
+        """Run ``run_once`` every ``interval`` seconds in a daemon thread."""
+        if self._started or interval <= 0:
+            return
+        self._started = True
+
+        def _loop():
+            while True:
+                try:
+                    n = self.run_once()
+                    if n:
+                        log.info('Synced %d complaint row(s) to %s', n, self.key)
+                except Exception:
+                    log.exception('MySQL sync failed')
+                time.sleep(interval)
+
+        threading.Thread(target=_loop, name='mysql-sync', daemon=True).start()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Push new and changed complaints from SQLite to MySQL.')
+    ap.add_argument('--url', help='SQLAlchemy URL of the target (default: MYSQL_SYNC_URL or DB_* variables)')
+    ap.add_argument('--sqlite', default=os.path.join(os.environ.get('NCRP_DATA_PATH', r'C:\NCRP'), 'data.db'))
+    ap.add_argument('--table', default=SYNC_TABLE)
+    ap.add_argument('--batch', type=int, default=SYNC_BATCH)
+    ap.add_argument('--watch', type=float, default=0, help='keep running, syncing every N seconds')
+    ap.add_argument('--reset', action='store_true', help='forget the watermark and resend every row')
+    ap.add_argument('--status', action='store_true', help='print the watermark and pending row count')
+    args = ap.parse_args(argv)
+
+    url = args.url or url_from_env()
+    if url is None:
+        ap.error('no target: pass --url or set MYSQL_SYNC_URL / DB_USER')
+    sync = MysqlSync(args.sqlite, url, args.table, args.batch)
+    if args.status:
+        for k, v in sync.status().items():
+            print(f'{k}: {v}')
+        return 0
+    if args.reset:
+        sync.reset()
+    while True:
+        start = time.perf_counter()
+        n = sync.run_once()
+        print(f'✔ {n} row(s) synced to {sync.key} in {time.perf_counter() - start:.2f}s')
+        if not args.watch:
+            return 0
+        time.sleep(args.watch)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
@@ -14,11 +14,14 @@ a = Analysis(
         'flask_cors',
         'pandas',
         'PyPDF2',
+        'pdfplumber',
+        'pypdfium2',
         'openpyxl',
         'pytesseract',
         'cv2',
         'dotenv',
         'sqlalchemy',
+        'pymysql',
         'sqlite3',
         'werkzeug',
         'werkzeug.utils',
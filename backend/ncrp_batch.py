@@ -0,0 +1,328 @@
+"""Resumable, parallel batch extraction of NCRP complaints from a folder.
+
+Files are processed by a pool of worker processes with ncrp_script's
+extractors and every result is written as soon as it arrives, to SQLite
+and/or NDJSON.  A checkpoint manifest (NDJSON, one line per finished file,
+keyed on relative path + size + mtime, with the outputs it was written to)
+lets a rerun skip everything that was already processed into the same
+outputs, so a crash on file 4,000 of 5,000 only costs the files in flight.
+The manifest is kept next to the SQLite (or NDJSON) output by default.
+
+Usage (from the backend folder):
+    python ncrp_batch.py <input dir> [-r] [--pattern "*.pdf"] [--workers 8]
+                         [--sqlite out.db] [--ndjson out.ndjson] [--excel out.xlsx]
+                         [--retry-failed] [--force]
+"""
+import argparse
+import datetime
+import glob
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import ncrp_script
+from ncrp_script import COLUMNS
+
+EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png", ".xlsx", ".xls")
+MANIFEST_NAME = ".ncrp_batch_manifest.ndjson"
+RESULTS_TABLE = "batch_results"
+
+
+# ---------------- WORKER ----------------
+def process_file(path):
+    """Runs in a worker process; returns (rows, error)."""
+    try:
+        result = ncrp_script.extract_ncrp(path)
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+    if isinstance(result, dict) and result.get("error"):
+        return [], result["error"]
+    rows = result if isinstance(result, list) else [result]
+    return [{col: r.get(col, "NOT FOUND") for col in COLUMNS} for r in rows], None
+
+
+# ---------------- CHECKPOINT ----------------
+class Manifest:
+    """Append-only record of finished files.  Later lines win on reload."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    self.done[entry["file"]] = entry
+        self._fh = open(path, "a", encoding="utf-8")
+
+    @staticmethod
+    def fingerprint(path):
+        st = os.stat(path)
+        return f"{st.st_size}:{st.st_mtime_ns}"
+
+    def is_done(self, rel, fingerprint, sinks=(), retry_failed=False):
+        """True if ``rel`` is unchanged and was written to every one of ``sinks``."""
+        entry = self.done.get(rel)
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            return False
+        if entry.get("status") != "ok":
+            return not retry_failed
+        return set(sinks) <= set(entry.get("sinks", ()))
+
+    def record(self, rel, fingerprint, status, rows, error=None, sinks=()):
+        sinks = set(sinks)
+        prev = self.done.get(rel)
+        if status == "ok" and prev and prev.get("fingerprint") == fingerprint and prev.get("status") == "ok":
+            # still in the outputs an earlier run wrote it to
+            sinks.update(prev.get("sinks", ()))
+        entry = {"file": rel, "fingerprint": fingerprint, "status": status, "rows": rows,
+                 "error": error, "sinks": sorted(sinks) if status == "ok" else [],
+                 "at": datetime.datetime.now().isoformat(timespec="seconds")}
+        self.done[rel] = entry
+        self._fh.write(json.dumps(entry) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def close(self):
+        self._fh.close()
+
+
+# ---------------- SINKS ----------------
+class SqliteSink:
+    """One row per extracted complaint; rewriting a file replaces its rows."""
+
+    def __init__(self, path):
+        self.name = "sqlite:" + os.path.abspath(path)
+        self.conn = sqlite3.connect(path)
+        cols = ", ".join(f'"{c}" TEXT' for c in COLUMNS)
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {RESULTS_TABLE} (
+                file TEXT,
+                row_index INTEGER,
+                {cols},
+                processed_at TEXT,
+                PRIMARY KEY (file, row_index)
+            )
+        """)
+        self.conn.commit()
+        quoted = ", ".join(f'"{c}"' for c in COLUMNS)
+        marks = ", ".join("?" for _ in COLUMNS)
+        self._insert = (f"INSERT INTO {RESULTS_TABLE} (file, row_index, {quoted}, processed_at) "
+                        f"VALUES (?, ?, {marks}, ?)")
+
+    def write(self, rel, rows):
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        with self.conn:
+            self.conn.execute(f"DELETE FROM {RESULTS_TABLE} WHERE file = ?", (rel,))
+            self.conn.executemany(self._insert, [
+                (rel, i, *[r[c] for c in COLUMNS], now) for i, r in enumerate(rows)])
+
+    def close(self):
+        self.conn.close()
+
+
+class NdjsonSink:
+    """Appends one JSON object per complaint (with a ``_file`` key).
+
+    Reprocessed files (--force, --retry-failed) are appended again, so readers
+    should keep the last block of rows per ``_file``."""
+
+    def __init__(self, path):
+        self.name = "ndjson:" + os.path.abspath(path)
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def write(self, rel, rows):
+        for r in rows:
+            self._fh.write(json.dumps({"_file": rel, **r}, ensure_ascii=False) + "\n")
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+
+# ---------------- PROGRESS ----------------
+class Progress:
+    def __init__(self, total, stream=sys.stderr, width=30):
+        self.total = total
+        self.stream = stream
+        self.width = width
+        self.done = 0
+        self.failed = 0
+        self.rows = 0
+        self.start = time.perf_counter()
+        self._last = 0.0
+
+    def update(self, rows=0, failed=False):
+        self.done += 1
+        self.rows += rows
+        self.failed += failed
+        now = time.perf_counter()
+        if now - self._last >= 0.2 or self.done == self.total:
+            self._last = now
+            self.draw()
+
+    def draw(self):
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed else 0.0
+        eta = (self.total - self.done) / rate if rate else 0
+        filled = int(self.width * self.done / self.total) if self.total else self.width
+        bar = "#" * filled + "-" * (self.width - filled)
+        self.stream.write(
+            f"\r[{bar}] {self.done}/{self.total} files, {self.rows} rows, {self.failed} failed, "
+            f"{rate:.1f} files/s, ETA {int(eta // 60)}m{int(eta % 60):02d}s ")
+        self.stream.flush()
+
+    def finish(self):
+        if self.done != self.total or not self._last:
+            self.draw()
+        self.stream.write("\n")
+
+
+# ---------------- MAIN ----------------
+def find_files(input_dir, pattern="*", recursive=False):
+    if recursive and "**" not in pattern:
+        pattern = os.path.join("**", pattern)
+    paths = glob.glob(os.path.join(input_dir, pattern), recursive=recursive)
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(EXTENSIONS))
+
+
+def read_results(sqlite_path):
+    """Yield every stored complaint row as a COLUMNS dict."""
+    conn = sqlite3.connect(sqlite_path)
+    try:
+        quoted = ", ".join(f'"{c}"' for c in COLUMNS)
+        for r in conn.execute(f"SELECT {quoted} FROM {RESULTS_TABLE} ORDER BY file, row_index"):
+            yield dict(zip(COLUMNS, r))
+    finally:
+        conn.close()
+
+
+def export_excel(rows, path):
+    import pandas as pd
+    from openpyxl import load_workbook
+    from openpyxl.styles import Alignment
+    pd.DataFrame(list(rows), columns=COLUMNS).to_excel(path, index=False)
+    wb = load_workbook(path)
+    ws = wb.active
+    for row in ws.iter_rows(min_row=2):
+        for cell in row:
+            cell.alignment = Alignment(wrap_text=True, vertical="center")
+    wb.save(path)
+
+
+def run(input_dir, pattern="*", recursive=False, workers=None, sqlite_path=None, ndjson_path=None,
+        manifest_path=None, retry_failed=False, force=False, progress=True):
+    """Process ``input_dir`` and return a summary dict."""
+    input_dir = os.path.abspath(input_dir)
+    workers = workers or os.cpu_count() or 1
+    output = sqlite_path or ndjson_path
+    if not manifest_path:
+        # next to the output, so the input folder may be read-only
+        manifest_path = os.path.join(os.path.dirname(os.path.abspath(output)) if output else input_dir,
+                                     MANIFEST_NAME)
+    manifest = Manifest(manifest_path)
+    sinks = []
+    if sqlite_path:
+        sinks.append(SqliteSink(sqlite_path))
+    if ndjson_path:
+        sinks.append(NdjsonSink(ndjson_path))
+    sink_names = [sink.name for sink in sinks]
+
+    todo, skipped = [], 0
+    for path in find_files(input_dir, pattern, recursive):
+        rel = os.path.relpath(path, input_dir).replace(os.sep, "/")
+        fp = Manifest.fingerprint(path)
+        if not force and manifest.is_done(rel, fp, sink_names, retry_failed):
+            skipped += 1
+            continue
+        todo.append((path, rel, fp))
+
+    bar = Progress(len(todo)) if progress and todo else None
+    summary = {"files": len(todo), "skipped": skipped, "ok": 0, "failed": 0, "rows": 0}
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # keep a bounded number of files in flight so huge folders do
+            # not queue thousands of futures up front
+            pending = {}
+            queue = iter(todo)
+            for item in queue:
+                pending[pool.submit(process_file, item[0])] = item
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    path, rel, fp = pending.pop(fut)
+                    try:
+                        rows, error = fut.result()
+                    except Exception as e:
+                        rows, error = [], f"{type(e).__name__}: {e}"
+                    if error is None:
+                        for sink in sinks:
+                            sink.write(rel, rows)
+                        summary["ok"] += 1
+                        summary["rows"] += len(rows)
+                    else:
+                        summary["failed"] += 1
+                    manifest.record(rel, fp, "ok" if error is None else "error", len(rows), error, sink_names)
+                    if bar:
+                        bar.update(len(rows), failed=error is not None)
+                    nxt = next(queue, None)
+                    if nxt is not None:
+                        pending[pool.submit(process_file, nxt[0])] = nxt
+    finally:
+        if bar:
+            bar.finish()
+        manifest.close()
+        for sink in sinks:
+            sink.close()
+    return summary
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Extract NCRP complaints from a folder of PDFs, images and Excel files.")
+    ap.add_argument("input_dir")
+    ap.add_argument("--pattern", default="*", help='glob for files to include (default "*")')
+    ap.add_argument("-r", "--recursive", action="store_true", help="descend into subfolders")
+    ap.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    ap.add_argument("--sqlite", help="SQLite file to write results to")
+    ap.add_argument("--ndjson", help="NDJSON file to append results to")
+    ap.add_argument("--excel", help="export all SQLite results to this Excel file at the end")
+    ap.add_argument("--manifest", help=f"checkpoint file (default: {MANIFEST_NAME} next to the output)")
+    ap.add_argument("--retry-failed", action="store_true", help="reprocess files that failed last time")
+    ap.add_argument("--force", action="store_true", help="ignore the checkpoint and reprocess everything")
+    ap.add_argument("--no-progress", action="store_true")
+    args = ap.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        ap.error(f"not a folder: {args.input_dir}")
+    sqlite_path = args.sqlite
+    if not sqlite_path and not args.ndjson:
+        sqlite_path = os.path.join(ncrp_script._NCRP_BASE, "ncrp_batch.db")
+    if args.excel and not sqlite_path:
+        ap.error("--excel needs --sqlite")
+
+    summary = run(args.input_dir, args.pattern, args.recursive, args.workers, sqlite_path, args.ndjson,
+                  args.manifest, args.retry_failed, args.force, progress=not args.no_progress)
+    print(f"✔ {summary['ok']} file(s) processed, {summary['rows']} complaint row(s), "
+          f"{summary['failed']} failed, {summary['skipped']} skipped from checkpoint")
+    if sqlite_path:
+        print(f"✔ Results in {sqlite_path} (table {RESULTS_TABLE})")
+    if args.ndjson:
+        print(f"✔ Results appended to {args.ndjson}")
+    if args.excel:
+        export_excel(read_results(sqlite_path), args.excel)
+        print(f"✔ Excel export saved to {args.excel}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,15 +1,18 @@
 import pandas as pd
 import os
 import re
-from PyPDF2 import PdfReader
 from openpyxl import load_workbook
 from openpyxl.styles import Alignment
 import pytesseract
 import cv2
+import numpy as np
 from dotenv import load_dotenv
 import shutil
 import datetime
 import json
+import io
+import pdf_backends
+import metrics
 try:
     from openai import OpenAI
 except Exception:
@@ -123,16 +126,26 @@ COLUMNS = [
     "Current Status"
 ]
 
-# OpenAI client — set OPENAI_API_KEY in environment to use AI parsing
-try:
-    client = OpenAI()
-except Exception:
-    client = None
+# OpenAI client — set OPENAI_API_KEY in environment to use AI parsing.
+# Created on first use so importing this module never touches the network
+# or fails on a missing key.
+client = None
+AI_MODEL = os.environ.get("AI_MODEL", "gpt-4.1-mini")
+
+
+def get_openai_client():
+    global client
+    if client is None and OpenAI is not None:
+        try:
+            client = OpenAI()
+        except Exception:
+            client = None
+    return client
 
 
 # ---------------- AI PARSER (optional)
-def ai_parse_complaint(text, source="IMAGE"):
-    prompt = f"""
+def ai_prompt(text, source="IMAGE"):
+    return f"""
 You are given raw OCR text from an Indian NCRP complaint form.
 Your task is to extract ALL fields accurately.
 
@@ -170,22 +183,31 @@ Return strictly in JSON:
 Raw text:
 {text}
 """
+
+
+def parse_ai_content(content):
+    """Turn a chat completion's content into a COLUMNS dict."""
+    m = re.search(r"\{.*\}", content or "", re.DOTALL)
+    if m:
+        data = json.loads(m.group())
+        return {k: v if v else "NOT FOUND" for k, v in data.items()}
+    return {col: "NOT FOUND" for col in COLUMNS}
+
+
+def ai_parse_complaint(text, source="IMAGE"):
+    prompt = ai_prompt(text, source)
+    client = get_openai_client()
     if client is None:
         print("⚠ OpenAI client not available (OPENAI_API_KEY missing). Skipping AI parse.")
         return {col: "NOT FOUND" for col in COLUMNS}
     try:
-        res = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
-        content = res.choices[0].message.content
-        m = re.search(r"\{.*\}", content, re.DOTALL)
-        if m:
-            data = json.loads(m.group())
-            return {k: v if v else "NOT FOUND" for k, v in data.items()}
-        else:
-            return {col: "NOT FOUND" for col in COLUMNS}
+        with metrics.stage("llm_parse"):
+            res = client.chat.completions.create(
+                model=AI_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0
+            )
+        return parse_ai_content(res.choices[0].message.content)
     except Exception as e:
         print(f"⚠ AI parsing failed: {e}")
         return {col: "NOT FOUND" for col in COLUMNS}
@@ -205,11 +227,13 @@ def first_match(patterns, text):
     return ""
 
 # ---------------- READERS ----------------
-def read_pdf(path):
-    reader = PdfReader(path)
+@metrics.stage("pdf_parse")
+def read_pdf(path, data=None, sha=None):
+    # backend is chosen by pdf_backends (NCRP_PDF_BACKEND_FIELDS); page text
+    # is cached in the shared text store so letter generation can reuse it.
+    # ``data`` is the file's bytes when the caller already has them in memory
     text = ""
-    for page in reader.pages:
-        t = page.extract_text()
+    for t in pdf_backends.page_texts(path, "fields", sha=sha, data=data):
         if t:
             text += " " + t
     return clean(text)
@@ -229,8 +253,11 @@ def _get_tessdata_config():
     return ""
 
 
-def read_image(path):
-    img = cv2.imread(path)
+def read_image(path, data=None):
+    if data is not None:
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    else:
+        img = cv2.imread(path)
     if img is None:
         raise ValueError(f"Image not readable: {path}")
 
@@ -238,13 +265,13 @@ def read_image(path):
     gray = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)[1]
 
     # DO NOT pass --tessdata-dir
-    return clean(
-        pytesseract.image_to_string(
+    with metrics.stage("tesseract"):
+        text = pytesseract.image_to_string(
             gray,
             lang="eng",
             config="--oem 3 --psm 6"
         )
-    )
+    return clean(text)
 
 
 # ---------------- EXCEL READER ----------------
@@ -292,7 +319,8 @@ def _normalize_header(h):
     return str(h).strip().lower().replace("\n", " ").replace("\r", "")
 
 
-def read_excel(path):
+@metrics.stage("excel_read")
+def read_excel(path, data=None):
     """
     Read an Excel file (.xlsx or .xls) and extract NCRP-style rows.
     - First row is treated as headers (mapped to COLUMNS where possible).
@@ -304,7 +332,7 @@ def read_excel(path):
         raise ValueError(f"Expected .xlsx or .xls, got {ext}")
 
     try:
-        df = pd.read_excel(path, engine=None, header=0)
+        df = pd.read_excel(io.BytesIO(data) if data is not None else path, engine=None, header=0)
     except Exception as e:
         raise ValueError(f"Excel not readable: {e}") from e
 
@@ -357,20 +385,27 @@ def read_excel(path):
 
 
 # ---------------- EXTRACTION ----------------
-def extract_ncrp(file_path):
+def extract_ncrp(file_path, data=None, sha=None):
+    # ``data``/``sha``: the file's bytes and SHA-256 when already in memory
+    # (uploads), so the file is not read back from disk
     ext = os.path.splitext(file_path)[1].lower()
 
     # Excel: return list of dicts (one per row)
     if ext in (".xlsx", ".xls"):
-        rows = read_excel(file_path)
+        rows = read_excel(file_path, data)
         if not rows:
             return {"Source": "EXCEL", "Complaint ID": "", "error": "no data rows in Excel"}
         return rows
 
     # PDF or Image: single dict from text extraction
-    text = read_pdf(file_path) if ext == ".pdf" else read_image(file_path)
+    text = read_pdf(file_path, data, sha) if ext == ".pdf" else read_image(file_path, data)
     source = "PDF" if ext == ".pdf" else "IMAGE"
+    return extract_fields(text, source)
 
+
+@metrics.stage("field_extract")
+def extract_fields(text, source):
+    """Extract the NCRP fields (COLUMNS) from PDF or OCR text."""
     complaint_id = safe(first_match([
         r"Acknowledgement Number\s*[:\-]?\s*(\d+)",
         r"Complaint ID\s*[:\-]?\s*(\d+)",
@@ -446,11 +481,10 @@ def save_df_to_mysql(df, *, user, password, host="localhost", port=3306, db="ncr
     Save pandas DataFrame to MySQL using SQLAlchemy + pymysql.
     - Renames DataFrame columns to snake_case matching typical SQL column names.
     - Cleans and converts date/amount columns.
-    - Appends rows to the target table.
+    - Upserts rows into the target table by complaint_id.
     """
     # Local imports so the main script can run without these packages if DB saving is not used
-    from sqlalchemy import create_engine
-    from sqlalchemy.types import String, Date, DateTime, Text, DECIMAL
+    import mysql_sync
     import pandas as pd
 
     # 1) Rename columns from the DataFrame-friendly names to SQL-friendly names
@@ -488,34 +522,20 @@ def save_df_to_mysql(df, *, user, password, host="localhost", port=3306, db="ncr
         )
         df_db["total_amount_lost"] = pd.to_numeric(df_db["total_amount_lost"], errors="coerce")
 
-    # 3) Build SQLAlchemy engine
-    url = f"mysql+pymysql://{user}:{password}@{host}:{port}/{db}?charset=utf8mb4"
-    engine = create_engine(url, pool_recycle=3600)
-
-    # 4) Provide dtype mapping for to_sql
-    dtype_map = {
-        "source": String(32),
-        "complaint_id": String(128),
-        "complaint_date": Date(),
-        "incident_datetime": DateTime(),
-        "mobile": String(32),
-        "email": String(256),
-        "full_address": Text(),
-        "district": String(128),
-        "state": String(128),
-        "cybercrime_type": String(256),
-        "platform": String(64),
-        "total_amount_lost": DECIMAL(18, 2),
-        "current_status": String(64),
-    }
-
-    # 5) Write to DB
-    # NOTE: if the table does not exist, you can run a CREATE TABLE manually or use if_exists='replace' once.
-    df_db.to_sql(name=table, con=engine, if_exists='append', index=False, dtype=dtype_map, method='multi', chunksize=500)
+    # 3) Reuse the process-wide pooled engine for this server
+    engine = mysql_sync.get_engine(mysql_sync.mysql_url(user, password, host, port, db))
 
-    engine.dispose()
+    # 4) Upsert by complaint_id so reruns update rows instead of duplicating
+    # them (the table is created with the mysql_sync.MYSQL_DTYPES types if missing)
+    target = mysql_sync.target_table(engine, table)
+    df_db = df_db.astype(object).where(pd.notna(df_db), None)
+    records = df_db.to_dict(orient="records")
+    for i in range(0, len(records), 500):
+        mysql_sync.upsert_rows(engine, target, records[i:i + 500])
 
 if __name__ == "__main__":
+    # Processes the current folder serially into one Excel file.  For large
+    # folders use ncrp_batch.py (parallel, incremental output, resumable).
     files = [f for f in os.listdir() if f.lower().endswith((".pdf", ".jpg", ".jpeg", ".png", ".xlsx", ".xls"))]
 
     if not files:
@@ -527,27 +547,36 @@ if __name__ == "__main__":
         pdfs = [f for f in files if f.lower().endswith(".pdf")]
         images = [f for f in files if f.lower().endswith((".jpg", ".jpeg", ".png"))]
 
-        all_rows = []
-
-        # Process each PDF individually with AI
+        # Collect texts first, then send them to the model concurrently
+        # (AI_CONCURRENCY) with retries and a response cache (see ai_batch.py)
+        docs = []
         for pdf in pdfs:
             try:
-                print(f"🔍 AI Processing PDF: {pdf}")
-                text = read_pdf(pdf)
-                all_rows.append(ai_parse_complaint(text, source="PDF"))
+                print(f"🔍 Reading PDF: {pdf}")
+                docs.append((pdf, read_pdf(pdf), "PDF"))
             except Exception as e:
-                print(f"⚠ Failed AI parse on {pdf}: {e}")
+                print(f"⚠ Failed reading {pdf}: {e}")
 
         # Merge images (WhatsApp) into a single complaint and parse with AI
         if images:
             try:
-                print("🔍 AI Processing WhatsApp images (merged)")
+                print("🔍 Reading WhatsApp images (merged)")
                 merged_text = ""
                 for img in sorted(images):
                     merged_text += " " + read_image(img)
-                all_rows.append(ai_parse_complaint(merged_text, source="IMAGE"))
+                docs.append(("WhatsApp images", merged_text, "IMAGE"))
+            except Exception as e:
+                print(f"⚠ Failed reading images: {e}")
+
+        all_rows = []
+        if docs:
+            from ai_batch import BatchAIParser, print_report
+            print(f"🔍 AI Processing {len(docs)} document(s)")
+            try:
+                all_rows, reports = BatchAIParser().parse(docs)
+                print_report(reports)
             except Exception as e:
-                print(f"⚠ Failed AI parse on images: {e}")
+                print(f"⚠ AI parsing failed: {e}")
 
         if not all_rows:
             print("❌ No complaints extracted by AI")
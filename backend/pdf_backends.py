@@ -0,0 +1,160 @@
+import io
+import os
+import json
+import hashlib
+
+import metrics
+import text_store
+
+# PDF text extraction backends.  Two use cases pick their backend separately:
+#   fields - complaint field extraction on upload (ncrp_script.read_pdf);
+#            speed matters, the regexes run on whitespace-collapsed text
+#   layout - letter placeholders, in particular the multi-line
+#            "Complaint Additional Info" block; line structure matters
+# Selection order: NCRP_PDF_BACKEND_FIELDS / NCRP_PDF_BACKEND_LAYOUT env,
+# then NCRP_PDF_BACKEND, then the calibration file written by
+# benchmarks/calibrate_pdf_backends.py, then DEFAULTS.  Backends that are not
+# installed are skipped.
+_NCRP_BASE = os.environ.get('NCRP_DATA_PATH', r'C:\NCRP')
+CALIBRATION_FILE = os.environ.get('NCRP_PDF_CALIBRATION', os.path.join(_NCRP_BASE, 'pdf_backends.json'))
+
+USES = ('fields', 'layout')
+DEFAULTS = {'fields': 'PyPDF2', 'layout': 'pdfplumber'}
+
+
+class PdfBackend:
+    """Extracts the text of each page of a PDF."""
+    name = ''
+    module = ''
+
+    def available(self):
+        try:
+            __import__(self.module)
+            return True
+        except Exception:
+            return False
+
+    def version(self):
+        mod = __import__(self.module)
+        return str(getattr(mod, '__version__', ''))
+
+    def pages(self, path):
+        """Page texts of ``path`` (a file path or the PDF's bytes)."""
+        raise NotImplementedError
+
+
+class PyPDF2Backend(PdfBackend):
+    name = 'PyPDF2'
+    module = 'PyPDF2'
+
+    def pages(self, path):
+        from PyPDF2 import PdfReader
+        reader = PdfReader(io.BytesIO(path) if isinstance(path, bytes) else path)
+        return [page.extract_text() or '' for page in reader.pages]
+
+
+class PdfplumberBackend(PdfBackend):
+    name = 'pdfplumber'
+    module = 'pdfplumber'
+
+    def pages(self, path):
+        import pdfplumber
+        with pdfplumber.open(io.BytesIO(path) if isinstance(path, bytes) else path) as pdf:
+            return [page.extract_text() or '' for page in pdf.pages]
+
+
+class PdfiumBackend(PdfBackend):
+    name = 'pypdfium2'
+    module = 'pypdfium2'
+
+    def version(self):
+        import pypdfium2.version
+        return str(pypdfium2.version.PYPDFIUM_INFO)
+
+    def pages(self, path):
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(path)
+        try:
+            out = []
+            for i in range(len(pdf)):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                out.append(textpage.get_text_range().replace('\r\n', '\n'))
+                textpage.close()
+                page.close()
+            return out
+        finally:
+            pdf.close()
+
+
+BACKENDS = {b.name: b for b in (PyPDF2Backend(), PdfplumberBackend(), PdfiumBackend())}
+
+_selected = {}
+
+
+def _calibrated():
+    try:
+        with open(CALIBRATION_FILE, 'r', encoding='utf-8') as fh:
+            return json.load(fh) or {}
+    except Exception:
+        return {}
+
+
+def backend_for(use):
+    """Return the backend configured for ``use`` ('fields' or 'layout')."""
+    if use not in _selected:
+        calibrated = _calibrated()
+        candidates = [
+            os.environ.get(f'NCRP_PDF_BACKEND_{use.upper()}'),
+            os.environ.get('NCRP_PDF_BACKEND'),
+            calibrated.get(use),
+            DEFAULTS[use],
+        ] + list(BACKENDS)
+        for name in candidates:
+            backend = BACKENDS.get(name or '')
+            if backend and backend.available():
+                _selected[use] = backend
+                break
+        else:
+            raise RuntimeError('no PDF text backend installed')
+    return _selected[use]
+
+
+def equivalents(use):
+    """Names of other backends whose stored text may stand in for ``backend_for(use)``.
+
+    Only the calibration can vouch for that: when it picked the configured
+    backend for ``use``, backends it scored at least as high for ``use`` count
+    as equivalent.  Without a matching calibration there are none."""
+    backend = backend_for(use)
+    calibrated = _calibrated()
+    results = calibrated.get('results') or {}
+    score = f'{use}_score'
+    if calibrated.get(use) != backend.name or results.get(backend.name, {}).get(score) is None:
+        return []
+    best = results[backend.name][score]
+    return [name for name, r in results.items()
+            if name != backend.name and name in BACKENDS and (r.get(score) or 0) >= best]
+
+
+def page_texts(path, use, sha=None, data=None):
+    """Return the page texts of ``path`` for ``use``, via the shared text store.
+
+    For 'layout' a stored entry from a backend the calibration rates as good
+    as the configured one is also accepted (see ``equivalents``); text from
+    any other backend is not, so letters keep the configured backend's line
+    structure.  Callers holding the file in memory pass its ``data`` (and
+    ``sha`` when already known) so it is neither re-read nor re-hashed from
+    disk."""
+    backend = backend_for(use)
+    wanted = {backend.name: backend.version()}
+    if use == 'layout':
+        wanted.update((name, None) for name in equivalents(use))
+    if sha is None:
+        sha = hashlib.sha256(data).hexdigest() if data is not None else text_store.file_sha256(path)
+    pages, _ = text_store.get_pages(sha, wanted)
+    metrics.cache_result('pdf_text', pages is not None)
+    if pages is None:
+        pages = backend.pages(data if data is not None else path)
+        text_store.put_pages(sha, backend.name, backend.version(), pages)
+    return pages
@@ -0,0 +1,91 @@
+import os
+import time
+import logging
+import threading
+
+from blob_store import PENDING
+
+# Garbage collection of pending uploads.  Files uploaded for verification but
+# never saved or rejected (closed tab, crashed client) are evicted once they
+# are older than the TTL, and the oldest ones go first whenever pending files
+# add up to more than the quota.  Pending files are rows in the blob store;
+# eviction runs in one write transaction there and skips leased rows, and
+# /api/verify leases its files before moving them, so a sweep never removes a
+# file that a save is about to approve.  Files left in the old flat pending
+# folder are removed by modification time.
+
+log = logging.getLogger(__name__)
+
+
+class PendingSweeper:
+
+    def __init__(self, store, ttl_seconds, quota_bytes=None, interval=600, legacy_dir=None):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.quota_bytes = quota_bytes
+        self.interval = interval
+        self.legacy_dir = legacy_dir
+        self._lock = threading.Lock()
+        self._started = False
+        self._totals = {'runs': 0, 'evicted_ttl': 0, 'evicted_quota': 0, 'freed_bytes': 0, 'legacy_removed': 0}
+        self._last = None
+
+    def _sweep_legacy(self, cutoff):
+        removed = 0
+        if not self.legacy_dir or not os.path.isdir(self.legacy_dir):
+            return removed
+        for entry in os.scandir(self.legacy_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def run_once(self):
+        """Evict expired and over-quota pending files; returns this run's stats."""
+        with self._lock:
+            start = time.time()
+            cutoff = start - self.ttl_seconds if self.ttl_seconds else None
+            evicted = self.store.evict(PENDING, created_before=cutoff, max_bytes=self.quota_bytes)
+            legacy = self._sweep_legacy(cutoff) if cutoff else 0
+            run = {
+                'at': start,
+                'evicted_ttl': sum(1 for e in evicted if e[2] == 'ttl'),
+                'evicted_quota': sum(1 for e in evicted if e[2] == 'quota'),
+                'freed_bytes': sum(e[1] for e in evicted),
+                'legacy_removed': legacy,
+                'duration_s': round(time.time() - start, 3),
+            }
+            self._totals['runs'] += 1
+            for k in ('evicted_ttl', 'evicted_quota', 'freed_bytes', 'legacy_removed'):
+                self._totals[k] += run[k]
+            self._last = run
+            if evicted or legacy:
+                log.info('Pending sweep: %d expired, %d over quota, %d legacy files, %d bytes',
+                         run['evicted_ttl'], run['evicted_quota'], legacy, run['freed_bytes'])
+            return run
+
+    def stats(self):
+        out = self.store.area_summary(PENDING)
+        with self._lock:
+            out.update(ttl_s=self.ttl_seconds, quota_bytes=self.quota_bytes,
+                       last_run=self._last, totals=dict(self._totals))
+        return out
+
+    def start(self):
+        with self._lock:
+            if self._started or self.interval <= 0:
+                return
+            self._started = True
+
+        def _loop():
+            while True:
+                try:
+                    self.run_once()
+                except Exception:
+                    log.exception('Pending sweep failed')
+                time.sleep(self.interval)
+
+        threading.Thread(target=_loop, name='pending-gc', daemon=True).start()
@@ -0,0 +1,139 @@
+import io
+import os
+import time
+import sqlite3
+import threading
+
+import metrics
+
+# Downscaled WebP previews of stored uploads (images, or the first page of a
+# PDF), rendered on first request and kept on disk:
+#   <root>/<ab>/<sha256>_<px>.webp
+# Previews are keyed by the blob's content hash and size, so their URLs never
+# change meaning and can be served as immutable.  The cache is bounded by
+# total size; the least recently used previews are deleted first (usage is
+# tracked in the preview_cache table, at most once a minute per preview).
+
+PREVIEW_TABLE = 'preview_cache'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+_TOUCH_SECONDS = 60
+
+
+class PreviewCache:
+
+    def __init__(self, root, db_path, max_bytes, quality=80):
+        self.root = root
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._initialized:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {PREVIEW_TABLE} (
+                    key TEXT PRIMARY KEY,
+                    size INTEGER,
+                    created_at REAL,
+                    last_used REAL
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{PREVIEW_TABLE}_last_used ON {PREVIEW_TABLE}(last_used)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def path_for(self, key):
+        return os.path.join(self.root, key[:2], key + '.webp')
+
+    @staticmethod
+    def supported(ext):
+        return (ext or '').lower() in IMAGE_EXTENSIONS + ('.pdf',)
+
+    def render(self, source, ext, px):
+        """WebP bytes of ``source`` scaled to fit in ``px`` x ``px``."""
+        from PIL import Image, ImageOps
+        ext = ext.lower()
+        if ext == '.pdf':
+            import pypdfium2
+            pdf = pypdfium2.PdfDocument(source)
+            try:
+                page = pdf[0]
+                width, height = page.get_size()
+                img = page.render(scale=px / max(width, height, 1)).to_pil()
+                page.close()
+            finally:
+                pdf.close()
+        else:
+            img = ImageOps.exif_transpose(Image.open(source))
+            img.draft('RGB', (px, px))  # cheap JPEG downscale while decoding
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+        img.thumbnail((px, px))
+        out = io.BytesIO()
+        img.save(out, 'WEBP', quality=self.quality, method=4)
+        return out.getvalue()
+
+    def get(self, sha, ext, px, source):
+        """Path of the cached preview for blob ``sha``, rendering it from ``source`` if needed."""
+        key = f"{sha}_{px}"
+        path = self.path_for(key)
+        now = time.time()
+        hit = os.path.exists(path)
+        metrics.cache_result('preview', hit)
+        if hit:
+            conn = self._connect()
+            try:
+                conn.execute(f"UPDATE {PREVIEW_TABLE} SET last_used = ? WHERE key = ? AND last_used < ?",
+                             (now, key, now - _TOUCH_SECONDS))
+                conn.commit()
+            finally:
+                conn.close()
+            return path
+
+        with metrics.stage('preview_render'):
+            data = self.render(source, ext, px)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+        conn = self._connect()
+        try:
+            conn.execute(f"INSERT OR REPLACE INTO {PREVIEW_TABLE} (key, size, created_at, last_used) VALUES (?, ?, ?, ?)",
+                         (key, len(data), now, now))
+            conn.commit()
+            self._evict(conn, keep=key)
+        finally:
+            conn.close()
+        return path
+
+    def _evict(self, conn, keep=None):
+        with self._lock:
+            (total,) = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {PREVIEW_TABLE}").fetchone()
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for key, size in conn.execute(f"SELECT key, size FROM {PREVIEW_TABLE} WHERE key != ? ORDER BY last_used",
+                                      (keep or '',)):
+                if total <= self.max_bytes:
+                    break
+                victims.append(key)
+                total -= size
+            for key in victims:
+                try:
+                    os.remove(self.path_for(key))
+                except FileNotFoundError:
+                    pass
+            conn.executemany(f"DELETE FROM {PREVIEW_TABLE} WHERE key = ?", [(k,) for k in victims])
+            conn.commit()
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            entries, size = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {PREVIEW_TABLE}").fetchone()
+        finally:
+            conn.close()
+        return {'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes}
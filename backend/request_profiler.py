@@ -0,0 +1,175 @@
+import os
+import sys
+import hmac
+import json
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import collections
+
+# Opt-in profiling of single requests for diagnosing slow uploads or letter
+# runs in the field.  With PROFILE_REQUESTS=1 a request carrying
+#   X-Profile: <PROFILE_TOKEN>      (or ?_profile=<PROFILE_TOKEN>)
+# runs its view under cProfile while a sampler thread records the request
+# thread's stack every PROFILE_SAMPLE_MS.  Each run leaves three files under
+# <root> (BASE_DATA_PATH/profiles):
+#   <id>.pstats     - cProfile stats (python -m pstats, snakeviz)
+#   <id>.collapsed  - sampled stacks, one "a;b;c count" line per stack, for
+#                     flamegraph.pl / speedscope
+#   <id>.json       - route, method, status, wall time, sample count
+# PROFILE_TOKEN is required: without it profiling stays off (behind the
+# reverse proxy every client looks local).  Only one request is profiled at a time (cProfile is per process);
+# others run normally.  Old runs are deleted beyond PROFILE_KEEP runs or
+# PROFILE_MAX_MB on disk.
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '').lower() in ('1', 'true', 'yes')
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_SAMPLE_MS = float(os.environ.get('PROFILE_SAMPLE_MS', 5))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))
+PROFILE_MAX_MB = float(os.environ.get('PROFILE_MAX_MB', 100))
+PROFILE_EXTENSIONS = ('.pstats', '.collapsed', '.json')
+
+log = logging.getLogger(__name__)
+
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Sampler(threading.Thread):
+    """Samples the stack of one thread into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfiler:
+
+    def __init__(self, root, enabled=PROFILE_REQUESTS, token=PROFILE_TOKEN, keep=PROFILE_KEEP,
+                 max_bytes=int(PROFILE_MAX_MB * 1024 * 1024), sample_ms=PROFILE_SAMPLE_MS):
+        self.root = root
+        self.enabled = enabled
+        self.token = token
+        if enabled and not token:
+            log.warning('PROFILE_REQUESTS is set but PROFILE_TOKEN is not; request profiling stays disabled')
+            self.enabled = False
+        self.keep = keep
+        self.max_bytes = max_bytes
+        self.sample_ms = sample_ms
+        self._busy = threading.Lock()
+
+    def authorized(self, req):
+        """True if ``req`` (a Flask request) may list or download profiles."""
+        if not self.enabled:
+            return False
+        supplied = req.headers.get('X-Profile') or req.args.get('_profile') or ''
+        return hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    def wanted(self, req):
+        """True if ``req`` asks to be profiled and is allowed to."""
+        asked = req.headers.get('X-Profile') or req.args.get('_profile')
+        return bool(asked) and self.authorized(req)
+
+    def start(self):
+        """Start profiling the current thread; returns a handle, or None if another run is active."""
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            sampler = _Sampler(threading.get_ident(), self.sample_ms / 1000.0)
+            prof = cProfile.Profile()
+            sampler.start()
+            prof.enable()
+        except Exception:
+            self._busy.release()
+            raise
+        return {'profile': prof, 'sampler': sampler, 'start': time.perf_counter(), 'started_at': time.time()}
+
+    def finish(self, handle, endpoint, method, path, status):
+        """Stop profiling and write the run to disk; returns the run id."""
+        try:
+            handle['profile'].disable()
+            elapsed = time.perf_counter() - handle['start']
+            handle['sampler'].stop()
+            os.makedirs(self.root, exist_ok=True)
+            stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(handle['started_at']))
+            run_id = f"{stamp}_{os.getpid()}_{endpoint or 'unmatched'}_{int(elapsed * 1000)}ms"
+            base = os.path.join(self.root, run_id)
+            handle['profile'].dump_stats(base + '.pstats')
+            stacks = handle['sampler'].stacks
+            with open(base + '.collapsed', 'w', encoding='utf-8') as fh:
+                for stack, count in stacks.most_common():
+                    fh.write(f"{stack} {count}\n")
+            stats = pstats.Stats(base + '.pstats')
+            meta = {
+                'id': run_id, 'endpoint': endpoint, 'method': method, 'path': path, 'status': status,
+                'started_at': handle['started_at'], 'wall_s': round(elapsed, 4),
+                'profiled_calls': stats.total_calls, 'samples': sum(stacks.values()),
+                'sample_ms': self.sample_ms, 'pid': os.getpid(),
+            }
+            with open(base + '.json', 'w', encoding='utf-8') as fh:
+                json.dump(meta, fh, indent=2)
+        finally:
+            self._busy.release()
+        try:
+            self.prune()
+        except Exception:
+            log.exception('Pruning profiles failed')
+        return run_id
+
+    def runs(self):
+        """Metadata of the saved runs, newest first."""
+        out = []
+        if not os.path.isdir(self.root):
+            return out
+        for entry in os.scandir(self.root):
+            if entry.name.endswith('.json'):
+                try:
+                    with open(entry.path, 'r', encoding='utf-8') as fh:
+                        out.append(json.load(fh))
+                except (OSError, ValueError):
+                    continue
+        out.sort(key=lambda m: m.get('started_at') or 0, reverse=True)
+        return out
+
+    def prune(self):
+        """Delete the oldest runs beyond ``keep`` runs or ``max_bytes`` on disk."""
+        runs = {}
+        for entry in os.scandir(self.root):
+            run_id, ext = os.path.splitext(entry.name)
+            if ext in PROFILE_EXTENSIONS:
+                size, mtime = runs.get(run_id, (0, 0))
+                st = entry.stat()
+                runs[run_id] = (size + st.st_size, max(mtime, st.st_mtime))
+        total = sum(size for size, _ in runs.values())
+        ordered = sorted(runs.items(), key=lambda kv: kv[1][1])
+        removed = 0
+        for i, (run_id, (size, _)) in enumerate(ordered):
+            if len(ordered) - i <= self.keep and total <= self.max_bytes:
+                break
+            for ext in PROFILE_EXTENSIONS:
+                try:
+                    os.remove(os.path.join(self.root, run_id + ext))
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed += 1
+        return removed
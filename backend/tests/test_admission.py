@@ -0,0 +1,44 @@
+import os
+import sys
+import sqlite3
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import admission  # noqa: E402
+
+
+@pytest.fixture
+def limiter(tmp_path):
+    return admission.Limiter(str(tmp_path / 'data.db'), 'letters', 2, wait=0.2)
+
+
+def test_slots_are_limited_and_released(limiter):
+    first, second = limiter.acquire(), limiter.acquire()
+    with pytest.raises(admission.Overloaded):
+        limiter.acquire()
+    first.release()
+    limiter.acquire().release()
+    second.release()
+    assert limiter.in_use() == 0
+
+
+def test_locked_database_error_is_not_hidden(limiter, monkeypatch):
+    limiter.in_use()  # creates the table
+    blocker = sqlite3.connect(limiter.db_path, isolation_level=None)
+    blocker.execute("BEGIN EXCLUSIVE")
+    connect = limiter._connect
+    monkeypatch.setattr(limiter, '_connect', lambda: _short_timeout(connect()))
+    try:
+        with pytest.raises(sqlite3.OperationalError, match='locked'):
+            limiter.acquire()
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+
+
+def _short_timeout(conn):
+    conn.execute("PRAGMA busy_timeout = 50")
+    return conn
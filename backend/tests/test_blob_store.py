@@ -0,0 +1,75 @@
+import io
+import os
+import sys
+import time
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from blob_store import BlobStore, PENDING, UPLOADS  # noqa: E402
+
+DATA = b'%PDF-1.4 acknowledgement'
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path / 'blobs'), str(tmp_path / 'data.db'))
+
+
+def _store(store, area, name, data=DATA, **kwargs):
+    return store.store(io.BytesIO(data), area, name, **kwargs)
+
+
+def test_identical_uploads_share_a_blob_until_the_last_name_goes(store):
+    first, sha, _ = _store(store, UPLOADS, 'ack.pdf')
+    second, _, _ = _store(store, UPLOADS, 'ack.pdf')
+    assert second == 'ack_1.pdf'
+    blob = store.blob_path(sha, '.pdf')
+
+    assert store.remove(UPLOADS, first)
+    assert os.path.exists(blob)
+    assert store.path_for(UPLOADS, second) == blob
+
+    assert store.remove(UPLOADS, second)
+    assert not os.path.exists(blob)
+    assert not store.remove(UPLOADS, second)
+
+
+def test_evict_keeps_blobs_still_referenced_and_leased_files(store):
+    _, sha, _ = _store(store, PENDING, 'old.pdf')
+    _store(store, UPLOADS, 'saved.pdf')
+    _store(store, PENDING, 'leased.pdf', data=b'other bytes', lease=60)
+
+    evicted = store.evict(PENDING, created_before=time.time() + 1)
+    assert [e[0] for e in evicted] == ['old.pdf']
+    # the approved copy still needs the bytes
+    assert store.path_for(UPLOADS, 'saved.pdf') == store.blob_path(sha, '.pdf')
+    assert store.path_for(PENDING, 'leased.pdf') is not None
+
+
+def test_evict_quota_removes_oldest_first(store):
+    for i in range(3):
+        _store(store, PENDING, f'p{i}.pdf', data=b'x' * 100 + bytes([i]))
+    evicted = store.evict(PENDING, max_bytes=150)
+    assert [e[0] for e in evicted] == ['p0.pdf', 'p1.pdf']
+    assert store.path_for(PENDING, 'p2.pdf') is not None
+
+
+def test_replace_blob_keeps_old_bytes_for_other_areas(store):
+    _, sha, _ = _store(store, PENDING, 'scan.png')
+    _store(store, UPLOADS, 'scan.png')
+    old_blob = store.blob_path(sha, '.png')
+
+    assert store.replace_blob(UPLOADS, sha, '.png', b'smaller') == 1
+    row = store.lookup(UPLOADS, 'scan.png')
+    assert (row['original_sha256'], row['original_size']) == (sha, len(DATA))
+    with open(store.path_for(UPLOADS, 'scan.png'), 'rb') as fh:
+        assert fh.read() == b'smaller'
+    # the pending name still points at the uploaded bytes
+    assert store.path_for(PENDING, 'scan.png') == old_blob
+
+    store.remove(PENDING, 'scan.png')
+    assert not os.path.exists(old_blob)
+    assert store.path_for(UPLOADS, 'scan.png') is not None
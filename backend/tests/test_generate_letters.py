@@ -0,0 +1,142 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+from docx import Document
+from docx.oxml.ns import qn
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'benchmarks'))
+
+import generate_letters  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def _positions(headers):
+    cols = generate_letters.resolve_txn_columns(headers)
+    return [cols[name] for name, _, _ in generate_letters.TXN_COLUMNS]
+
+
+def test_portal_header_row_keeps_portal_positions():
+    headers = ['S No.', 'Ack', 'Victim Bank', 'Victim A/c', 'Beneficiary Bank Name', 'Layer',
+               'Suspect A/c Number', 'Ifsc Code', 'Transaction Date', 'Transaction Id / UTR Number',
+               'Transaction Amount', 'Disputed Amount']
+    # layer, suspect account, IFSC, UTR, disputed amount, transaction amount
+    assert _positions(headers) == [5, 6, 7, 9, 11, 10]
+
+
+def test_portal_export_headers_resolved_by_name():
+    # the export written by benchmarks/synthetic.py has no column 11
+    assert _positions(synthetic.TXN_HEADERS) == [5, 6, 7, 8, 10, 9]
+
+
+def test_moved_columns_found_by_header():
+    headers = ['Disputed Amount', 'IFSC Code', 'Layer', 'Beneficiary Account No', 'UTR No',
+               'Txn Amount', 'Remarks']
+    assert _positions(headers) == [2, 3, 1, 4, 0, 5]
+
+
+def test_unrecognised_headers_fall_back_to_positions():
+    headers = ['c%d' % i for i in range(12)]
+    assert _positions(headers) == [5, 6, 7, 9, 11, 10]
+    assert generate_letters.resolve_txn_columns(headers[:8]) is None
+
+
+def test_numeric_cells_read_like_pandas(tmp_path):
+    from openpyxl import Workbook
+    headers = ['S No.', 'Ack', 'Victim Bank', 'Victim A/c', 'Beneficiary Bank Name', 'Layer',
+               'Suspect A/c Number', 'Ifsc Code', 'Transaction Date', 'Transaction Id / UTR Number',
+               'Transaction Amount', 'Disputed Amount']
+    wb = Workbook()
+    ws = wb.active
+    ws.append(headers)
+    ws.append([1, 'A1', 'SBI', 1, 'HDFC', 1, 12345678901234567.0, 'HDFC0000001', '01-01-2024',
+               998877665544.0, 1250.5, 1000.0])
+    path = str(tmp_path / 'txns.xlsx')
+    wb.save(path)
+    row = generate_letters.read_transactions(path).iloc[0]
+    expected = pd.read_excel(path, dtype=str).iloc[0]
+    assert row['SUSPECT/BENEFICIARY DETAILS'] == expected['Suspect A/c Number'] == '12345678901234570'
+    assert row['TXN_ID / UTR_NO'] == '998877665544'
+    assert row['TXN AMOUNT'] == '1250.5'
+    assert row['DISPUTED AMOUNT'] == '1000'
+
+
+def _letter_jobs(out_dir, banks):
+    return [(code, rows, {'{{CSRNO}}': '123'}, str(out_dir / f'{code}.docx')) for code, rows in banks.items()]
+
+
+def _rows(account):
+    return [(1, '1', account, 'HDFC0000001', 'UTR1', '100', '100')]
+
+
+def _letter_text(path):
+    doc = Document(path)
+    return ' '.join(cell.text for table in doc.tables for row in table.rows for cell in row.cells)
+
+
+def _incremental(tpl, jobs, out_dir):
+    failures, stats = [], {}
+    generated = generate_letters._render_incremental(tpl, jobs, str(out_dir), 1, None, failures, stats)
+    return generated, failures, stats
+
+
+@pytest.fixture
+def letters(tmp_path):
+    tpl = str(tmp_path / 'template.docx')
+    synthetic.docx_template(tpl)
+    out_dir = tmp_path / 'letters'
+    out_dir.mkdir()
+    return tpl, out_dir
+
+
+def test_incremental_rebuilds_only_changed_letters(letters):
+    tpl, out_dir = letters
+    banks = {'HDFC': _rows('111'), 'SBIN': _rows('222')}
+    generated, _, stats = _incremental(tpl, _letter_jobs(out_dir, banks), out_dir)
+    assert len(generated) == 2 and stats['rebuilt'] == 2
+
+    banks['HDFC'] = _rows('333')
+    generated, _, stats = _incremental(tpl, _letter_jobs(out_dir, banks), out_dir)
+    assert (stats['rebuilt'], stats['reused'], stats['deleted']) == (1, 1, 0)
+    assert '333' in _letter_text(out_dir / 'HDFC.docx')
+    assert '111' not in _letter_text(out_dir / 'HDFC.docx')
+
+
+def test_incremental_deletes_letters_of_vanished_banks(letters):
+    tpl, out_dir = letters
+    _incremental(tpl, _letter_jobs(out_dir, {'HDFC': _rows('111'), 'SBIN': _rows('222')}), out_dir)
+    generated, _, stats = _incremental(tpl, _letter_jobs(out_dir, {'HDFC': _rows('111')}), out_dir)
+    assert stats['deleted'] == 1
+    assert not (out_dir / 'SBIN.docx').exists()
+    assert generated == [str(out_dir / 'HDFC.docx')]
+
+
+def test_failed_rebuild_leaves_no_outdated_letter(letters, monkeypatch):
+    tpl, out_dir = letters
+    _incremental(tpl, _letter_jobs(out_dir, {'HDFC': _rows('111')}), out_dir)
+
+    def broken(*args):
+        raise RuntimeError('render failed')
+
+    monkeypatch.setattr(generate_letters, '_render_letter', broken)
+    generated, failures, _ = _incremental(tpl, _letter_jobs(out_dir, {'HDFC': _rows('333')}), out_dir)
+    assert generated == [] and failures[0]['bank_code'] == 'HDFC'
+    assert not (out_dir / 'HDFC.docx').exists()
+    # retried on the next run
+    monkeypatch.undo()
+    generated, _, stats = _incremental(tpl, _letter_jobs(out_dir, {'HDFC': _rows('333')}), out_dir)
+    assert stats['rebuilt'] == 1 and '333' in _letter_text(out_dir / 'HDFC.docx')
+
+
+def test_inserted_cells_keep_tabs_and_line_breaks(letters):
+    tpl, _ = letters
+    doc = Document(tpl)
+    assert generate_letters.insert_rows(doc, [(1, '1', 'A/c 111\nWallet 222', 'HDFC0000001', 'UTR\t1', '5', '5')])
+    table = next(t for t in doc.tables if 'S.NO' in t.rows[0].cells[0].text.upper())
+    run = table.rows[-1].cells[2]._tc.find(qn('w:p')).find(qn('w:r'))
+    assert run.find(qn('w:br')) is not None
+    assert table.rows[-1].cells[2].text == 'A/c 111\nWallet 222'
+    assert table.rows[-1].cells[4].text == 'UTR\t1'
@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import mitigation_cache  # noqa: E402
+from mitigation_cache import MitigationCache  # noqa: E402
+
+DATA = {'Cybercrime Type': 'UPI Fraud', 'Platform': 'PhonePe', 'Total Amount Lost': '12000',
+        'State': 'Kerala', 'District': 'Ernakulam'}
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / 'data.db')
+
+
+class _Slots:
+    def __init__(self):
+        self.taken = 0
+
+    def acquire(self):
+        self.taken += 1
+        return self
+
+    def release(self):
+        pass
+
+
+def _slow_tokens(release):
+    def tokens():
+        release.wait(5)
+        yield 'call the '
+        yield 'bank'
+    return tokens
+
+
+def test_only_the_generating_stream_takes_a_slot(db):
+    cache, slots, release = MitigationCache(db), _Slots(), threading.Event()
+    leader = cache.stream(DATA, _slow_tokens(release), acquire=slots.acquire)
+    answers = []
+    follower = threading.Thread(target=lambda: answers.append(
+        ''.join(cache.stream(DATA, _slow_tokens(release), acquire=slots.acquire))))
+    follower.start()
+    time.sleep(0.2)
+    release.set()
+    assert ''.join(leader) == 'call the bank'
+    follower.join(5)
+    assert answers == ['call the bank']
+    assert slots.taken == 1
+    # now cached: no slot at all
+    assert ''.join(cache.stream(DATA, _slow_tokens(release), acquire=slots.acquire)) == 'call the bank'
+    assert slots.taken == 1
+
+
+def test_identical_requests_in_two_processes_share_one_generation(db):
+    # two caches on one data.db stand in for two gunicorn workers
+    first, second = MitigationCache(db), MitigationCache(db)
+    calls, release = [], threading.Event()
+
+    def generate():
+        calls.append(1)
+        release.wait(5)
+        return 'freeze the account'
+
+    answers = []
+    threads = [threading.Thread(target=lambda c=c: answers.append(c.get_or_generate(DATA, generate)))
+               for c in (first, second)]
+    for t in threads:
+        t.start()
+        time.sleep(0.2)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert answers == ['freeze the account'] * 2
+    assert len(calls) == 1
+    assert second.stats()['coalesced'] == 1
+
+
+def test_claim_of_a_dead_process_expires(db, monkeypatch):
+    cache = MitigationCache(db, lease=0.3)
+    assert cache._claim(cache.key_for(DATA))
+    # the claiming process died: nothing renews or releases the claim
+    cache._claimed.clear()
+    monkeypatch.setattr(mitigation_cache, 'INFLIGHT_POLL', 0.05)
+    other = MitigationCache(db, lease=0.3)
+    start = time.monotonic()
+    assert other.get_or_generate(DATA, lambda: 'report to 1930') == 'report to 1930'
+    assert time.monotonic() - start < 3
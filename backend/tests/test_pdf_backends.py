@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+import random
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'benchmarks'))
+
+import pdf_backends  # noqa: E402
+import text_store  # noqa: E402
+import synthetic  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(text_store, 'STORE_DIR', str(tmp_path / 'text'))
+    monkeypatch.setattr(pdf_backends, 'CALIBRATION_FILE', str(tmp_path / 'pdf_backends.json'))
+    for var in ('NCRP_PDF_BACKEND', 'NCRP_PDF_BACKEND_FIELDS', 'NCRP_PDF_BACKEND_LAYOUT'):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setattr(pdf_backends, '_selected', {})
+    pdf = str(tmp_path / 'ack.pdf')
+    synthetic.ack_pdf(pdf, random.Random(1), txn_rows=5)
+    return pdf
+
+
+def _stored(pdf):
+    return set(text_store._load(text_store.file_sha256(pdf)).get('extractors', {}))
+
+
+def test_layout_text_comes_from_layout_backend(store):
+    fields = pdf_backends.backend_for('fields')
+    layout = pdf_backends.backend_for('layout')
+    if fields.name == layout.name:
+        pytest.skip('needs two PDF backends installed')
+    pdf_backends.page_texts(store, 'fields')
+    assert _stored(store) == {fields.name}
+
+    pages = pdf_backends.page_texts(store, 'layout')
+    assert pages == layout.pages(store)
+    assert _stored(store) == {fields.name, layout.name}
+
+
+def test_layout_reuses_backend_calibrated_as_equivalent(store):
+    fields = pdf_backends.backend_for('fields')
+    layout = pdf_backends.backend_for('layout')
+    if fields.name == layout.name:
+        pytest.skip('needs two PDF backends installed')
+    with open(pdf_backends.CALIBRATION_FILE, 'w', encoding='utf-8') as fh:
+        json.dump({'fields': fields.name, 'layout': layout.name, 'results': {
+            fields.name: {'layout_score': 0.9}, layout.name: {'layout_score': 0.9}}}, fh)
+    pdf_backends._selected.clear()
+
+    pdf_backends.page_texts(store, 'fields')
+    assert pdf_backends.page_texts(store, 'layout') == fields.pages(store)
+    assert _stored(store) == {fields.name}
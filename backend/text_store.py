@@ -0,0 +1,67 @@
+import os
+import json
+import hashlib
+import threading
+
+# Extracted PDF page text, shared by upload extraction (ncrp_script.read_pdf)
+# and letter generation so an acknowledgement PDF is only parsed once.
+# Entries live next to the uploads, keyed by the SHA-256 of the file content:
+#   $NCRP_DATA_PATH/uploads/.text/<ab>/<sha256>.json
+#   {"sha256": ..., "extractors": {"PyPDF2": {"version": "3.0.1", "pages": [...]}}}
+# Keying by content means the entry written while a file sits in pending/
+# stays valid after it is approved and renamed into uploads/.
+_NCRP_BASE = os.environ.get('NCRP_DATA_PATH', r'C:\NCRP')
+STORE_DIR = os.environ.get('NCRP_TEXT_STORE', os.path.join(_NCRP_BASE, 'uploads', '.text'))
+
+_LOCK = threading.Lock()
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _entry_path(sha):
+    return os.path.join(STORE_DIR, sha[:2], sha + '.json')
+
+
+def _load(sha):
+    try:
+        with open(_entry_path(sha), 'r', encoding='utf-8') as fh:
+            return json.load(fh) or {}
+    except Exception:
+        return {}
+
+
+def get_pages(sha, extractors):
+    """Return ``(pages, extractor_name)`` for the first stored match, or ``(None, None)``.
+
+    ``extractors`` is an ordered mapping of extractor name -> required version;
+    a version of None accepts whatever version produced the entry."""
+    stored = _load(sha).get('extractors', {})
+    for name, version in extractors.items():
+        entry = stored.get(name)
+        if entry and (version is None or entry.get('version') == version):
+            return entry.get('pages') or [], name
+    return None, None
+
+
+def put_pages(sha, extractor, version, pages):
+    """Record the page texts produced by ``extractor`` for the file ``sha``."""
+    path = _entry_path(sha)
+    with _LOCK:
+        data = _load(sha)
+        data['sha256'] = sha
+        data.setdefault('extractors', {})[extractor] = {'version': version, 'pages': list(pages)}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as fh:
+                json.dump(data, fh)
+            os.replace(tmp, path)
+        except OSError:
+            # the store is only a cache; extraction still succeeded
+            pass
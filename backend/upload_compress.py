@@ -0,0 +1,219 @@
+import io
+import os
+import time
+import queue
+import logging
+import argparse
+import threading
+
+from blob_store import BlobStore, UPLOADS
+
+# Lossless re-encoding of approved screenshots.  WhatsApp/phone screenshots
+# are PNGs saved with fast zlib settings; re-saving them with optimize=True
+# and the highest compression level typically shrinks them without touching
+# a pixel.  Every candidate is decoded again and compared with the original
+# pixels before it replaces the blob, and the blob store keeps the hash and
+# size of the uploaded bytes (original_sha256/original_size) for evidence.
+# Files are queued right after approval; a background pass also works through
+# the existing archive, adopting PNGs from the old flat uploads folder.
+COMPRESS_EXTENSIONS = ('.png',)
+# re-encodes that save less than this fraction are not worth a new blob
+UPLOAD_COMPRESS_MIN_SAVING = float(os.environ.get('UPLOAD_COMPRESS_MIN_SAVING', 0.02))
+
+log = logging.getLogger(__name__)
+
+
+def _same_pixels(a, b):
+    if a.size != b.size:
+        return False
+    if a.mode == b.mode and a.mode != 'P':
+        return a.tobytes() == b.tobytes()
+    # optimize may drop unused palette entries, so compare palette images by colour
+    if a.mode not in ('P', 'RGB', 'RGBA', 'L', 'LA') or b.mode not in ('P', 'RGB', 'RGBA', 'L', 'LA'):
+        return False
+    return a.convert('RGBA').tobytes() == b.convert('RGBA').tobytes()
+
+
+def optimize_png(data):
+    """Losslessly re-encoded PNG bytes for ``data``, or None if not smaller or not safe."""
+    from PIL import Image, PngImagePlugin
+    img = Image.open(io.BytesIO(data))
+    if img.format != 'PNG' or getattr(img, 'is_animated', False):
+        return None
+    img.load()
+    params = {'optimize': True, 'compress_level': 9}
+    for key in ('transparency', 'dpi', 'icc_profile', 'exif', 'gamma'):
+        if img.info.get(key) is not None:
+            params[key] = img.info[key]
+    if getattr(img, 'text', None):
+        info = PngImagePlugin.PngInfo()
+        for k, v in img.text.items():
+            info.add_text(k, v)
+        params['pnginfo'] = info
+    out = io.BytesIO()
+    img.save(out, 'PNG', **params)
+    candidate = out.getvalue()
+    if len(candidate) >= len(data) * (1 - UPLOAD_COMPRESS_MIN_SAVING):
+        return None
+    check = Image.open(io.BytesIO(candidate))
+    check.load()
+    if not _same_pixels(img, check):
+        log.warning('Re-encoded PNG differs from the original; keeping the original')
+        return None
+    return candidate
+
+
+class UploadCompressor:
+
+    def __init__(self, store, interval=3600, legacy_dir=None, batch=200):
+        self.store = store
+        self.interval = interval
+        self.legacy_dir = legacy_dir
+        self.batch = batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._totals = {'files': 0, 'compressed': 0, 'saved_bytes': 0, 'legacy_adopted': 0, 'errors': 0}
+        self._last = None
+
+    def _compress_blob(self, sha, ext):
+        """Re-encode one blob in the uploads area; returns the bytes saved."""
+        path = self.store.blob_path(sha, ext)
+        try:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+            smaller = optimize_png(data)
+        except FileNotFoundError:
+            data, smaller = b'', None
+        except Exception:
+            # unreadable image: leave the bytes alone and do not try again
+            log.exception('Could not re-encode %s', path)
+            self._totals['errors'] += 1
+            data, smaller = b'', None
+        self.store.replace_blob(UPLOADS, sha, ext, smaller)
+        self._totals['files'] += 1
+        if smaller is None:
+            return 0
+        self._totals['compressed'] += 1
+        self._totals['saved_bytes'] += len(data) - len(smaller)
+        return len(data) - len(smaller)
+
+    def compress(self, name):
+        """Re-encode the approved file ``name`` now; returns the bytes saved."""
+        row = self.store.lookup(UPLOADS, name)
+        if row is None or row['optimized_at'] or row['ext'] not in COMPRESS_EXTENSIONS:
+            return 0
+        with self._lock:
+            return self._compress_blob(row['sha256'], row['ext'])
+
+    def enqueue(self, name):
+        """Compress ``name`` on the background thread (no-op when it is not running)."""
+        if self._started and name:
+            self._queue.put(name)
+
+    def _adopt_legacy(self, limit):
+        """Move up to ``limit`` PNGs from the old flat uploads folder into the
+        blob store; returns ``(adopted, more_left)``."""
+        adopted = 0
+        if not self.legacy_dir or not os.path.isdir(self.legacy_dir):
+            return adopted, False
+        for entry in os.scandir(self.legacy_dir):
+            if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in COMPRESS_EXTENSIONS:
+                continue
+            if self.store.lookup(UPLOADS, entry.name) is not None:
+                continue
+            if adopted >= limit:
+                return adopted, True
+            with open(entry.path, 'rb') as fh:
+                self.store.store(fh, UPLOADS, entry.name)
+            # served from the blob store from here on
+            os.remove(entry.path)
+            adopted += 1
+        return adopted, False
+
+    def run_once(self, limit=None):
+        """Compress up to ``limit`` (default: batch) archived files; returns this run's stats."""
+        limit = limit or self.batch
+        with self._lock:
+            start = time.time()
+            before = dict(self._totals)
+            adopted, more_legacy = self._adopt_legacy(limit)
+            for sha, ext in self.store.unoptimized(UPLOADS, COMPRESS_EXTENSIONS, limit):
+                self._compress_blob(sha, ext)
+            self._totals['legacy_adopted'] += adopted
+            run = {k: self._totals[k] - before[k] for k in self._totals}
+            run.update(at=start, duration_s=round(time.time() - start, 3),
+                       remaining=more_legacy or len(self.store.unoptimized(UPLOADS, COMPRESS_EXTENSIONS, 1)) > 0)
+            self._last = run
+            if run['files']:
+                log.info('Compressed %d of %d archived files, %d bytes saved',
+                         run['compressed'], run['files'], run['saved_bytes'])
+            return run
+
+    def stats(self):
+        # not under the lock: a pass can hold it for a while
+        out = self.store.optimized_summary(UPLOADS)
+        out.update(running=self._started, queued=self.queued(),
+                   last_run=self._last, totals=dict(self._totals))
+        return out
+
+    def queued(self):
+        """Approved files waiting to be re-encoded (cheap, unlike stats())."""
+        return self._queue.qsize()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        def _loop():
+            next_pass = time.time()
+            while True:
+                if self.interval > 0 and time.time() >= next_pass:
+                    try:
+                        # keep going while a pass fills its batch, then wait
+                        if not self.run_once()['remaining']:
+                            next_pass = time.time() + self.interval
+                    except Exception:
+                        log.exception('Archive compression failed')
+                        next_pass = time.time() + self.interval
+                    continue
+                try:
+                    name = self._queue.get(timeout=max(1.0, next_pass - time.time()) if self.interval > 0 else None)
+                except queue.Empty:
+                    continue
+                try:
+                    self.compress(name)
+                except Exception:
+                    log.exception('Compressing %s failed', name)
+
+        threading.Thread(target=_loop, name='upload-compress', daemon=True).start()
+
+
+def main(argv=None):
+    data_path = os.environ.get('NCRP_DATA_PATH', r'C:\NCRP')
+    ap = argparse.ArgumentParser(description='Losslessly re-encode approved PNG uploads.')
+    ap.add_argument('--sqlite', default=os.path.join(data_path, 'data.db'))
+    ap.add_argument('--blobs', default=os.environ.get('NCRP_BLOB_STORE', os.path.join(data_path, 'blobs')))
+    ap.add_argument('--uploads', default=os.path.join(data_path, 'uploads'),
+                    help='old flat uploads folder whose PNGs are adopted first')
+    ap.add_argument('--batch', type=int, default=200)
+    args = ap.parse_args(argv)
+
+    compressor = UploadCompressor(BlobStore(args.blobs, args.sqlite), legacy_dir=args.uploads, batch=args.batch)
+    while True:
+        run = compressor.run_once()
+        print(f"✔ {run['compressed']}/{run['files']} file(s) re-encoded, "
+              f"{run['saved_bytes'] / 1048576:.1f} MB saved ({run['legacy_adopted']} adopted)")
+        if not run['remaining']:
+            break
+    total = compressor.stats()
+    print(f"Archive: {total['blobs']} re-encoded file(s), "
+          f"{total['saved_bytes'] / 1048576:.1f} MB saved of {total['original_bytes'] / 1048576:.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(main())
@@ -0,0 +1,126 @@
+import os
+import hashlib
+import tempfile
+
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# Streaming handling of multipart uploads.  Werkzeug writes each file part
+# into an UploadSpool as it parses the request body: the bytes are hashed and
+# the file type is sniffed on the fly, parts over UPLOAD_MAX_FILE_MB abort the
+# request with 413, and small files stay in memory (up to UPLOAD_SPOOL_MB) so
+# they can be handed straight to the PDF/image readers.  The whole request is
+# capped separately through Flask's MAX_CONTENT_LENGTH (UPLOAD_MAX_REQUEST_MB).
+_MB = 1024 * 1024
+UPLOAD_MAX_FILE_BYTES = int(float(os.environ.get('UPLOAD_MAX_FILE_MB', 50)) * _MB)
+UPLOAD_MAX_REQUEST_BYTES = int(float(os.environ.get('UPLOAD_MAX_REQUEST_MB', 200)) * _MB)
+UPLOAD_SPOOL_BYTES = int(float(os.environ.get('UPLOAD_SPOOL_MB', 8)) * _MB)
+
+# Leading bytes -> file kind, and the extensions each kind may carry
+MAGIC = [
+    (b'%PDF-', 'pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'PK\x03\x04', 'xlsx'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'xls'),
+]
+KIND_EXTENSIONS = {
+    'pdf': ('.pdf',),
+    'png': ('.png',),
+    'jpg': ('.jpg', '.jpeg'),
+    'xlsx': ('.xlsx',),
+    'xls': ('.xls',),
+}
+_SNIFF_BYTES = max(len(m) for m, _ in MAGIC)
+
+
+def sniff_type(head):
+    """Return the kind ('pdf', 'png', ...) for the first bytes of a file, or None."""
+    for magic, kind in MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def fix_extension(filename, kind):
+    """``filename`` with an extension matching ``kind`` (unchanged if it already does)."""
+    base, ext = os.path.splitext(filename)
+    allowed = KIND_EXTENSIONS.get(kind)
+    if not allowed or ext.lower() in allowed:
+        return filename
+    return filename + allowed[0] if not ext else base + allowed[0]
+
+
+class UploadSpool:
+    """Writable/readable file for one upload part that hashes and sniffs as it fills."""
+
+    def __init__(self, max_bytes=UPLOAD_MAX_FILE_BYTES, spool_bytes=UPLOAD_SPOOL_BYTES):
+        self._file = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+        self._hash = hashlib.sha256()
+        self._head = b''
+        self.max_bytes = max_bytes
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise RequestEntityTooLarge(f'file larger than {self.max_bytes // _MB} MB')
+        if len(self._head) < _SNIFF_BYTES:
+            self._head += data[:_SNIFF_BYTES - len(self._head)]
+        self._hash.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    @property
+    def kind(self):
+        return sniff_type(self._head)
+
+    def in_memory(self):
+        """The whole upload as bytes if it never spilled to disk, else None."""
+        if getattr(self._file, '_rolled', True):
+            return None
+        return self._file._file.getvalue()
+
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def readline(self, *args):
+        return self._file.readline(*args)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class UploadRequest(Request):
+    """Flask request class that streams file parts into UploadSpool."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return UploadSpool()
@@ -119,6 +119,9 @@ function appendRowsToTable(rows) {
         const base = window.HARDCODED_API_BASE || 'http://127.0.0.1:5000';
         const saved = complaint.savedFilename || complaint.savedFilename || null;
         const fileLink = saved ? (base + '/uploads/' + encodeURIComponent(saved)) : null;
+        const preview = complaint.previewUrl
+            ? `<img src="${base + complaint.previewUrl}" loading="lazy" alt="" style="display:block;max-width:80px;max-height:80px;margin-bottom:4px;">`
+            : '';
 
         row.innerHTML = `
             <td>${complaint.id || ''}</td>
@@ -133,7 +136,7 @@ function appendRowsToTable(rows) {
             <td>${complaint.totalAmountLoss || ''}</td>
             <td>${complaint.currentStatus || ''}</td>
             <td>${complaint.processedDateTime || ''}</td>
-            <td>${fileLink ? `<a href="${fileLink}" target="_blank" rel="noopener" class="view-details-link">Open File</a>` : '<span class="text-muted">N/A</span>'}</td>
+            <td>${fileLink ? `<a href="${fileLink}" target="_blank" rel="noopener" class="view-details-link">${preview}Open File</a>` : '<span class="text-muted">N/A</span>'}</td>
             <td><a href="#" class="preliminary-action-link">Click Here</a></td>
             <td><a href="#" class="generate-letters-link">Generate Letters</a></td>
         `;
@@ -230,33 +233,109 @@ function complaintToMitigationPayload(complaint) {
 }
 
 async function handlePreliminaryAction(complaint) {
+    // Advice pre-generated in the background for saved complaints
+    if (complaint.mitigation) {
+        Swal.fire({
+            title: 'Preliminary Action',
+            html: `<div class="text-start" style="white-space: pre-wrap;">${escapeHtml(complaint.mitigation)}</div>`,
+            width: '560px',
+            confirmButtonText: 'Close'
+        });
+        return;
+    }
     const base = window.HARDCODED_API_BASE || 'http://127.0.0.1:5000';
     const payload = complaintToMitigationPayload(complaint);
     Swal.fire({ title: 'Loading...', allowOutsideClick: false, didOpen: () => Swal.showLoading() });
     try {
-        const res = await fetch(base + '/api/mitigation', {
+        // Stream tokens as the model generates them; fall back to the plain
+        // JSON endpoint if streaming is unavailable.
+        const res = await fetch(base + '/api/mitigation/stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify(payload)
         });
-        const data = await res.json().catch(() => ({}));
-        Swal.close();
-        if (res.ok && data.mitigation_measures) {
-            Swal.fire({
-                title: 'Preliminary Action',
-                html: `<div class="text-start" style="white-space: pre-wrap;">${escapeHtml(data.mitigation_measures)}</div>`,
-                width: '560px',
-                confirmButtonText: 'Close'
-            });
-        } else {
-            Swal.fire({ icon: 'error', title: 'Error', text: data.error || 'Failed to get mitigation suggestions' });
+        if (res.ok && res.body && window.TextDecoder) {
+            await showMitigationStream(res);
+            return;
         }
+        await showMitigationJson(base, payload);
     } catch (e) {
         Swal.close();
         Swal.fire({ icon: 'error', title: 'Error', text: String(e) });
     }
 }
 
+async function showMitigationStream(res) {
+    let text = '';
+    let started = false;
+    let error = null;
+    const render = () => {
+        const el = document.getElementById('mitigationText');
+        if (el) el.textContent = text;
+    };
+    const open = () => {
+        started = true;
+        Swal.fire({
+            title: 'Preliminary Action',
+            html: '<div id="mitigationText" class="text-start" style="white-space: pre-wrap;"></div>',
+            width: '560px',
+            confirmButtonText: 'Close'
+        });
+    };
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf('\n\n')) >= 0) {
+            const block = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            let event = 'message';
+            let data = '';
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            const msg = data ? JSON.parse(data) : {};
+            if (event === 'error') {
+                error = msg.error || 'Failed to get mitigation suggestions';
+            } else if (event === 'message' && msg.token) {
+                if (!started) open();
+                text += msg.token;
+                render();
+            }
+        }
+    }
+    if (!started) {
+        Swal.close();
+        Swal.fire({ icon: 'error', title: 'Error', text: error || 'Failed to get mitigation suggestions' });
+    }
+}
+
+async function showMitigationJson(base, payload) {
+    const res = await fetch(base + '/api/mitigation', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(payload)
+    });
+    const data = await res.json().catch(() => ({}));
+    Swal.close();
+    if (res.ok && data.mitigation_measures) {
+        Swal.fire({
+            title: 'Preliminary Action',
+            html: `<div class="text-start" style="white-space: pre-wrap;">${escapeHtml(data.mitigation_measures)}</div>`,
+            width: '560px',
+            confirmButtonText: 'Close'
+        });
+    } else {
+        Swal.fire({ icon: 'error', title: 'Error', text: data.error || 'Failed to get mitigation suggestions' });
+    }
+}
+
 function escapeHtml(s) {
     if (s == null) return '';
     return String(s)